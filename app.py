@@ -1,33 +1,157 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date as date_type
 from decimal import Decimal
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
-from functools import wraps
+from functools import wraps, lru_cache
+from contextlib import contextmanager
 from flask import g
+from flask.ctx import _AppCtxGlobals
+from werkzeug.local import LocalProxy
 import requests
 import json
 import re
+import sqlite3
+import hashlib
+from collections import OrderedDict
+import base64
+import zlib
+import csv
+import smtplib
+from email.message import EmailMessage
+import calendar
+import io
+import time
+import threading
+import random
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, BrokenExecutor, TimeoutError as FutureTimeoutError
 from typing import Dict, List, Optional
+from collections import namedtuple
+import click
+from sqlalchemy import event, exc, inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.dialects import sqlite as sqlite_dialect, postgresql as postgresql_dialect
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', uuid.uuid4().hex)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///family_finance.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///family_finance.db').replace('postgres://', 'postgresql://', 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# SQLite connection settings, applied to every new connection
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')  # WAL lets readers run alongside the writer
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # Durable across app crashes; fsync at checkpoints only
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 10000))  # Milliseconds a writer waits for the lock
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes
+app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -32768))  # Pages, or KiB when negative
+app.config['DB_MAINTENANCE_INTERVAL'] = int(os.environ.get('DB_MAINTENANCE_INTERVAL', 86400))  # Seconds
+app.config['DB_ANALYSIS_LIMIT'] = int(os.environ.get('DB_ANALYSIS_LIMIT', 1000))  # Rows sampled per index by ANALYZE
+app.config['DB_VACUUM_PAGES'] = int(os.environ.get('DB_VACUUM_PAGES', 2000))  # Free pages released per maintenance run
+
 # Session configuration
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Sessions last 7 days
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))  # Seconds a worker reuses a loaded user row
+
+# Response cache configuration
+app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')  # 'memory', 'sqlite' or 'none'
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+app.config['RESPONSE_CACHE_PATH'] = os.environ.get('RESPONSE_CACHE_PATH')  # Defaults to the instance folder
+
+# Report configuration
+app.config['REPORT_SERIES_MAX_BUCKETS'] = int(os.environ.get('REPORT_SERIES_MAX_BUCKETS', 1000))  # Larger ranges are rejected with 400
+
+# AI advice cache configuration; the sqlite backend keeps answers across restarts
+app.config['ADVICE_CACHE_BACKEND'] = os.environ.get('ADVICE_CACHE_BACKEND', 'memory')  # 'memory', 'sqlite' or 'none'
+app.config['ADVICE_CACHE_MAX_ENTRIES'] = int(os.environ.get('ADVICE_CACHE_MAX_ENTRIES', 512))
+app.config['ADVICE_CACHE_MAX_BYTES'] = int(os.environ.get('ADVICE_CACHE_MAX_BYTES', 8192))  # Larger answers are not cached
+app.config['ADVICE_CACHE_TTL'] = int(os.environ.get('ADVICE_CACHE_TTL', 6 * 3600))  # Seconds
+app.config['ADVICE_CACHE_PATH'] = os.environ.get('ADVICE_CACHE_PATH')  # Defaults to the instance folder
+
+# Chat job queue configuration
+app.config['CHAT_WORKERS'] = int(os.environ.get('CHAT_WORKERS', 2))  # Inference threads per process
+app.config['CHAT_QUEUE_SIZE'] = int(os.environ.get('CHAT_QUEUE_SIZE', 32))  # Jobs waiting beyond this are rejected with 503
+app.config['CHAT_POLL_MAX_WAIT'] = float(os.environ.get('CHAT_POLL_MAX_WAIT', 20))  # Upper bound for long-poll ?wait= seconds
+app.config['CHAT_JOB_REQUEUE_AFTER'] = int(os.environ.get('CHAT_JOB_REQUEUE_AFTER', 60))  # Seconds queued before recovery resubmits a job
+app.config['CHAT_JOB_TIMEOUT'] = int(os.environ.get('CHAT_JOB_TIMEOUT', 300))  # Seconds queued or running before recovery fails a job
+app.config['CHAT_RECOVERY_INTERVAL'] = int(os.environ.get('CHAT_RECOVERY_INTERVAL', 60))  # Seconds between recovery sweeps
+
+# Chat prompt configuration
+app.config['CHAT_PROMPT_MAX_CHARS'] = int(os.environ.get('CHAT_PROMPT_MAX_CHARS', 3000))  # Hard cap on the whole prompt
+app.config['CHAT_PROMPT_RECENT_TURNS'] = int(os.environ.get('CHAT_PROMPT_RECENT_TURNS', 4))  # Turns quoted verbatim; older ones are summarized
+
+# Chat retention configuration
+app.config['CHAT_RETENTION_DAYS'] = int(os.environ.get('CHAT_RETENTION_DAYS', 90))  # Older turns are archived; 0 keeps everything live
+app.config['CHAT_COMPACTION_BATCH'] = int(os.environ.get('CHAT_COMPACTION_BATCH', 500))
+app.config['CHAT_COMPACTION_INTERVAL'] = int(os.environ.get('CHAT_COMPACTION_INTERVAL', 3600))  # Seconds
+
+# Chat classifier configuration
+app.config['CLASSIFIER_VOCABULARY_PATH'] = os.environ.get('CLASSIFIER_VOCABULARY_PATH')  # JSON file whose 'sentiment'/'categories' sections replace the built-in word lists
+
+# Recurring transaction configuration
+app.config['RECURRING_INTERVAL'] = int(os.environ.get('RECURRING_INTERVAL', 3600))  # Seconds between materialization passes
+app.config['RECURRING_BATCH'] = int(os.environ.get('RECURRING_BATCH', 1000))  # Rules per transaction
+app.config['RECURRING_MAX_CATCHUP'] = int(os.environ.get('RECURRING_MAX_CATCHUP', 400))  # Occurrences per rule per batch; the pass returns for the rest
+
+# Savings auto-save configuration
+app.config['AUTO_SAVE_INTERVAL'] = int(os.environ.get('AUTO_SAVE_INTERVAL', 3600))  # Seconds between auto-save passes
+app.config['AUTO_SAVE_BATCH'] = int(os.environ.get('AUTO_SAVE_BATCH', 500))  # Goals per transaction
+
+# Notification dispatch configuration
+app.config['NOTIFICATION_DISPATCH_INTERVAL'] = int(os.environ.get('NOTIFICATION_DISPATCH_INTERVAL', 60))  # Seconds
+app.config['NOTIFICATION_BATCH'] = int(os.environ.get('NOTIFICATION_BATCH', 500))  # Notifications claimed at a time
+app.config['NOTIFICATION_LEASE'] = int(os.environ.get('NOTIFICATION_LEASE', 300))  # Seconds before a crashed dispatcher's claim lapses
+app.config['NOTIFICATION_MAX_ATTEMPTS'] = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+app.config['NOTIFICATION_RETRY_BACKOFF'] = int(os.environ.get('NOTIFICATION_RETRY_BACKOFF', 60))  # Seconds, doubled per attempt
+app.config['NOTIFICATION_TRANSPORTS'] = os.environ.get('NOTIFICATION_TRANSPORTS', 'email=log,sms=log,push=log')  # channel=transport pairs; 'log' only prints, use email=smtp to deliver
+app.config['NOTIFICATION_OUTBOX_PATH'] = os.environ.get('NOTIFICATION_OUTBOX_PATH')  # File transport; defaults to the instance folder
+app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST', 'localhost')
+app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 25))
+app.config['SMTP_SENDER'] = os.environ.get('SMTP_SENDER', 'notifications@familyfinance.com')
+app.config['SMTP_USERNAME'] = os.environ.get('SMTP_USERNAME')
+app.config['SMTP_PASSWORD'] = os.environ.get('SMTP_PASSWORD')
+app.config['SMTP_STARTTLS'] = os.environ.get('SMTP_STARTTLS', '').lower() in ('1', 'true', 'yes')
+
+# Budget alert configuration
+app.config['BUDGET_ALERT_THRESHOLDS'] = tuple(sorted(  # Percent of the limit; each fires once per budget period
+    int(value) for value in os.environ.get('BUDGET_ALERT_THRESHOLDS', '80,100').split(',') if value.strip()
+))
+
+# Periodic job configuration
+app.config['JOB_SCHEDULER'] = os.environ.get('JOB_SCHEDULER', 'thread')  # 'thread' runs due jobs inside each worker, 'off' leaves them to `flask run-jobs`
+app.config['JOB_SCHEDULER_TICK'] = float(os.environ.get('JOB_SCHEDULER_TICK', 30))  # Seconds between checks for due jobs
+app.config['JOB_LEASE_SECONDS'] = int(os.environ.get('JOB_LEASE_SECONDS', 600))  # A crashed run is retried after this
+
+# Password hashing and login throttling
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')  # Older hashes are upgraded on login
+app.config['PASSWORD_HASH_EXECUTOR'] = os.environ.get('PASSWORD_HASH_EXECUTOR', 'process')  # 'process', 'thread' or 'inline'
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # Hashing processes per worker
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))  # Hashes in flight beyond this are rejected with 503
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # Seconds
+app.config['LOGIN_IP_LIMIT'] = int(os.environ.get('LOGIN_IP_LIMIT', 30))  # Login attempts per address per window
+app.config['LOGIN_IP_WINDOW'] = int(os.environ.get('LOGIN_IP_WINDOW', 300))  # Seconds
+app.config['LOGIN_ACCOUNT_LIMIT'] = int(os.environ.get('LOGIN_ACCOUNT_LIMIT', 5))  # Failed logins per email per window
+app.config['LOGIN_ACCOUNT_WINDOW'] = int(os.environ.get('LOGIN_ACCOUNT_WINDOW', 900))  # Seconds
 
 # Hugging Face API Configuration
-HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/facebook/blenderbot-400M-distill"
+HUGGINGFACE_API_URL = os.environ.get('HUGGINGFACE_API_URL', "https://api-inference.huggingface.co/models/facebook/blenderbot-400M-distill")
 HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY', 'hf_demo_key')  # Replace with your actual API key
 
+# Inference client configuration
+app.config['INFERENCE_CONNECT_TIMEOUT'] = float(os.environ.get('INFERENCE_CONNECT_TIMEOUT', 3.05))
+app.config['INFERENCE_READ_TIMEOUT'] = float(os.environ.get('INFERENCE_READ_TIMEOUT', 30))
+app.config['INFERENCE_MAX_RETRIES'] = int(os.environ.get('INFERENCE_MAX_RETRIES', 2))
+app.config['INFERENCE_RETRY_BACKOFF'] = float(os.environ.get('INFERENCE_RETRY_BACKOFF', 0.5))  # Base delay, doubled per attempt, full jitter
+app.config['INFERENCE_BREAKER_THRESHOLD'] = int(os.environ.get('INFERENCE_BREAKER_THRESHOLD', 5))  # Consecutive failures before opening
+app.config['INFERENCE_BREAKER_RESET'] = float(os.environ.get('INFERENCE_BREAKER_RESET', 30))  # Seconds open before a trial call
+
 # Financial Advisor AI Configuration
 FINANCIAL_ADVISOR_PROMPT = """You are a professional financial advisor AI assistant. Your role is to help users with:
 1. Budget planning and management
@@ -43,6 +167,9 @@ Always provide helpful, accurate, and safe financial advice. If you're unsure ab
 
 Current conversation context: {context}
 
+Conversation so far:
+{history}
+
 User message: {message}
 
 Please provide a helpful financial advisory response:"""
@@ -66,10 +193,10 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def to_dict(self):
         return {
@@ -138,6 +265,14 @@ class UserPreference(db.Model):
         }
 
 class Transaction(db.Model):
+    __table_args__ = (
+        db.Index('ix_transaction_user_type_date', 'user_id', 'type', 'date', 'amount'),
+        db.Index('ix_transaction_user_category_type_date', 'user_id', 'category', 'type', 'date', 'amount'),
+        db.Index('ix_transaction_user_date_created', 'user_id', 'date', 'created_at'),
+        db.Index('ix_transaction_user_reference', 'user_id', 'reference_number'),
+        db.Index('ix_transaction_recurring_date', 'recurring_id', 'date', unique=True),  # One posting per rule per due date
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(20), nullable=False)  # 'income', 'expense', 'transfer', 'investment', 'debt_payment'
@@ -184,6 +319,10 @@ class Transaction(db.Model):
         }
 
 class Budget(db.Model):
+    __table_args__ = (
+        db.Index('ix_budget_user_category', 'user_id', 'category'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category = db.Column(db.String(50), nullable=False)
@@ -191,9 +330,10 @@ class Budget(db.Model):
     period = db.Column(db.String(20), default='monthly')  # 'monthly', 'weekly', 'yearly'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        # Calculate spent amount for current period
-        spent = self.get_spent_amount()
+    def to_dict(self, spent: Optional[float] = None):
+        # Calculate spent amount for current period unless precomputed
+        if spent is None:
+            spent = self.get_spent_amount()
         return {
             'id': self.id,
             'category': self.category,
@@ -204,25 +344,14 @@ class Budget(db.Model):
         }
     
     def get_spent_amount(self):
-        # Get current period start date
-        now = datetime.now()
-        if self.period == 'monthly':
-            start_date = now.replace(day=1).date()
-        elif self.period == 'weekly':
-            start_date = (now - timedelta(days=now.weekday())).date()
-        else:  # yearly
-            start_date = now.replace(month=1, day=1).date()
-        
-        total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == self.user_id,
-            Transaction.category == self.category,
-            Transaction.type == 'expense',
-            Transaction.date >= start_date
-        ).scalar()
-        
-        return float(total) if total else 0.0
+        return compute_budget_spent([self]).get(self.id, 0.0)
 
 class SavingsGoal(db.Model):
+    __table_args__ = (
+        db.Index('ix_savings_goal_user_priority', 'user_id', 'priority'),
+        db.Index('ix_savings_goal_auto_save_due', 'auto_save', 'auto_save_frequency', 'last_auto_save'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -343,6 +472,10 @@ class Debt(db.Model):
         }
 
 class RecurringTransaction(db.Model):
+    __table_args__ = (
+        db.Index('ix_recurring_transaction_due', 'is_active', 'next_due_date', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -383,6 +516,11 @@ class RecurringTransaction(db.Model):
         }
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_dispatch', 'is_sent', 'scheduled_for'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -393,6 +531,10 @@ class Notification(db.Model):
     is_sent = db.Column(db.Boolean, default=False)
     scheduled_for = db.Column(db.DateTime)
     sent_at = db.Column(db.DateTime)
+    lease_until = db.Column(db.DateTime)  # Claimed by a dispatcher until then; after a failed delivery, the retry time
+    lease_owner = db.Column(db.String(40))
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -411,6 +553,11 @@ class Notification(db.Model):
         }
 
 class ChatHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_history_user_created', 'user_id', 'created_at'),
+        db.Index('ix_chat_history_created', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.Text, nullable=False)
@@ -498,294 +645,3050 @@ class Bill(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
-# AI Chatbot Functions
-def get_financial_context(user_id: int) -> str:
-    """Get financial context for the user to provide better AI responses"""
-    try:
-        # Get recent transactions
-        recent_transactions = Transaction.query.filter_by(user_id=user_id)\
-            .order_by(Transaction.date.desc()).limit(5).all()
-        
-        # Get current budgets
-        budgets = Budget.query.filter_by(user_id=user_id).all()
-        
-        # Get savings goals
-        savings_goals = SavingsGoal.query.filter_by(user_id=user_id).all()
-        
-        # Get current balance
-        income_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income'
-        ).scalar() or 0
-        
-        expense_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense'
-        ).scalar() or 0
-        
-        balance = float(income_total - expense_total)
-        
-        context = f"""
-        User Financial Summary:
-        - Current Balance: ${balance:,.2f}
-        - Recent Transactions: {len(recent_transactions)} transactions
-        - Active Budgets: {len(budgets)} budgets
-        - Savings Goals: {len(savings_goals)} active goals
-        """
-        
-        if recent_transactions:
-            context += "\nRecent Transaction Categories: " + ", ".join([t.category for t in recent_transactions[:3]])
-        
-        if budgets:
-            context += f"\nBudget Categories: {', '.join([b.category for b in budgets[:3]])}"
-        
-        return context.strip()
-        
-    except Exception as e:
-        return f"Error getting financial context: {str(e)}"
+class ChatSummary(db.Model):
+    """Rolling summary of a user's older chat turns, extended as turns age out"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    state = db.Column(db.Text, nullable=False, default='{}')  # JSON: turn count, topic counts, last questions
+    summary = db.Column(db.Text, nullable=False, default='')
+    through_created_at = db.Column(db.DateTime)  # Position of the newest turn folded in
+    through_id = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-def call_huggingface_api(message: str, context: str = "") -> str:
-    """Call Hugging Face API for AI response"""
-    try:
-        # Prepare the prompt with financial context
-        prompt = FINANCIAL_ADVISOR_PROMPT.format(context=context, message=message)
-        
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json"
+class ChatArchive(db.Model):
+    """A batch of one user's retired chat turns, stored as compressed JSON"""
+    __table_args__ = (
+        db.Index('ix_chat_archive_user_last', 'user_id', 'last_created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list of turns
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def turns(self) -> List[Dict]:
+        return json.loads(zlib.decompress(self.payload))
+
+    def to_dict(self, include_turns=False):
+        data = {
+            'id': self.id,
+            'user_id': self.user_id,
+            'first_created_at': self.first_created_at.isoformat(),
+            'last_created_at': self.last_created_at.isoformat(),
+            'message_count': self.message_count,
+            'compressed_bytes': len(self.payload),
+            'created_at': self.created_at.isoformat()
         }
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_length": 500,
-                "temperature": 0.7,
-                "do_sample": True,
-                "top_p": 0.9
-            }
+        if include_turns:
+            data['turns'] = self.turns()
+        return data
+
+class JobRun(db.Model):
+    """Schedule and lease of one periodic job, shared by every worker process"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_run_at = db.Column(db.DateTime)
+    lease_until = db.Column(db.DateTime)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))  # 'ok', 'failed'
+    last_result = db.Column(db.Text)  # JSON
+    last_duration = db.Column(db.Float)
+    runs = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'lease_until': self.lease_until.isoformat() if self.lease_until else None,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_status': self.last_status,
+            'last_result': json.loads(self.last_result) if self.last_result else None,
+            'last_duration': self.last_duration,
+            'runs': self.runs
         }
-        
-        response = requests.post(HUGGINGFACE_API_URL, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0].get('generated_text', 'I apologize, but I could not generate a response at this time.')
-            elif isinstance(result, dict):
-                return result.get('generated_text', 'I apologize, but I could not generate a response at this time.')
-            else:
-                return 'I apologize, but I could not generate a response at this time.'
-        else:
-            # Fallback response if API fails
-            return generate_fallback_response(message)
-            
-    except Exception as e:
-        print(f"Error calling Hugging Face API: {e}")
-        return generate_fallback_response(message)
 
-def generate_fallback_response(message: str) -> str:
-    """Generate a fallback response when AI API is unavailable"""
-    message_lower = message.lower()
-    
-    # Simple keyword-based responses
-    if any(word in message_lower for word in ['budget', 'spending', 'expense']):
-        return "I'd be happy to help you with budgeting! To get started, try tracking your expenses for a month to see where your money goes. You can then set realistic spending limits for different categories."
-    
-    elif any(word in message_lower for word in ['save', 'savings', 'goal']):
-        return "Great question about savings! Start by setting a specific goal with a target amount and date. Then break it down into smaller, manageable monthly or weekly amounts. Even small regular contributions add up over time!"
-    
-    elif any(word in message_lower for word in ['invest', 'investment', 'portfolio']):
-        return "Investment advice should be personalized to your goals and risk tolerance. Consider starting with diversified index funds and gradually learning about different investment options. Remember, it's important to do thorough research or consult with a financial advisor."
-    
-    elif any(word in message_lower for word in ['debt', 'loan', 'credit']):
-        return "Managing debt effectively is crucial for financial health. Focus on high-interest debt first, consider debt consolidation if it makes sense, and always pay at least the minimum payment on time. Creating a debt payoff plan can help you stay motivated."
-    
-    elif any(word in message_lower for word in ['income', 'salary', 'earn']):
-        return "Increasing your income can significantly impact your financial goals. Consider asking for a raise, developing new skills, taking on side projects, or exploring passive income opportunities. Remember to invest in yourself!"
-    
-    else:
-        return "I'm here to help with your financial questions! Feel free to ask about budgeting, saving, investing, debt management, or any other financial topics. I'll do my best to provide helpful guidance."
+class ChatJob(db.Model):
+    """A chat message waiting for, or answered by, the inference worker pool"""
+    __table_args__ = (
+        db.Index('ix_chat_job_user_created', 'user_id', 'created_at'),
+        db.Index('ix_chat_job_status_created', 'status', 'created_at'),
+    )
 
-def analyze_sentiment(message: str) -> str:
-    """Analyze the sentiment of a user message"""
-    message_lower = message.lower()
-    
-    positive_words = ['good', 'great', 'excellent', 'happy', 'excited', 'positive', 'improve', 'better', 'success', 'achieve']
-    negative_words = ['bad', 'terrible', 'worried', 'stressed', 'anxious', 'problem', 'issue', 'difficult', 'struggle', 'fail']
-    
-    positive_count = sum(1 for word in positive_words if word in message_lower)
-    negative_count = sum(1 for word in negative_words if word in message_lower)
-    
-    if positive_count > negative_count:
-        return 'positive'
-    elif negative_count > positive_count:
-        return 'negative'
-    else:
-        return 'neutral'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    category = db.Column(db.String(50))
+    sentiment = db.Column(db.String(20))
+    response = db.Column(db.Text)
+    context = db.Column(db.Text)
+    error = db.Column(db.Text)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat_history.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
 
-def categorize_message(message: str) -> str:
-    """Categorize the type of financial question"""
-    message_lower = message.lower()
-    
-    if any(word in message_lower for word in ['budget', 'spending', 'expense', 'cost']):
-        return 'budget_help'
-    elif any(word in message_lower for word in ['save', 'savings', 'goal', 'target']):
-        return 'savings_guidance'
-    elif any(word in message_lower for word in ['invest', 'investment', 'portfolio', 'stock', 'bond']):
-        return 'investment_advice'
-    elif any(word in message_lower for word in ['debt', 'loan', 'credit', 'payment']):
-        return 'debt_management'
-    elif any(word in message_lower for word in ['income', 'salary', 'earn', 'money']):
-        return 'income_optimization'
-    elif any(word in message_lower for word in ['retirement', 'future', 'planning']):
-        return 'retirement_planning'
-    elif any(word in message_lower for word in ['tax', 'taxes', 'deduction']):
-        return 'tax_optimization'
-    else:
-        return 'general_financial_advice'
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'message': self.message,
+            'response': self.response,
+            'category': self.category,
+            'sentiment': self.sentiment,
+            'context': self.context,
+            'error': self.error,
+            'chat_id': self.chat_id,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            # Return JSON for API requests; redirect to login for page requests
-            wants_json = request.path.startswith('/api') or \
-                (request.accept_mimetypes and request.accept_mimetypes.best == 'application/json')
-            if wants_json:
-                return jsonify({'error': 'Authentication required'}), 401
-            return redirect(url_for('login', next=request.path))
-        return f(*args, **kwargs)
-    return decorated_function
+# Aggregate Models
+class TransactionRollup(db.Model):
+    """Per-day transaction totals, maintained alongside every Transaction write"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    type = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-@app.before_request
-def load_logged_in_user():
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        if user:
-            g.user = user
-        else:
-            session.pop('user_id', None)
-            g.user = None
-    else:
-        g.user = None
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'date': self.date.isoformat(),
+            'type': self.type,
+            'category': self.category,
+            'total': float(self.total),
+            'count': self.count
+        }
 
-@app.context_processor
-def inject_user():
-    return dict(current_user=g.user)
+class UserDataVersion(db.Model):
+    """Counters bumped whenever a user's data changes
 
-# Routes
-@app.route('/')
-def index():
-    # Check if user is already logged in
-    if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    
-    theme = 'dark'
-    return render_template('landing.html', theme=theme)
+    `version` moves with financial data and `chat_version` with chat
+    history, so a chat turn leaves cached financial responses valid.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    chat_version = db.Column(db.Integer, default=0)  # NULL on rows written before the column existed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-@app.route('/test')
-def test():
-    return jsonify({'message': 'Backend is working!', 'timestamp': datetime.now().isoformat()})
+class ChatStat(db.Model):
+    """All-time chat message count per user for one category or sentiment"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)  # 'category', 'sentiment'
+    key = db.Column(db.String(50), primary_key=True)  # '' when the message had no label
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    theme = 'dark'
-    return render_template('dashboard.html', theme=theme)
+class ChatDailyStat(db.Model):
+    """Chat message count per user, day and category, for the recent-topics window"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-@app.route('/reports')
-@login_required
-def reports():
-    theme = 'dark'
-    return render_template('reports.html', theme=theme)
+class TransactionTotal(db.Model):
+    """All-time transaction total per user and type, for O(1) balance lookups"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    type = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-@app.route('/transactions')
-@login_required
-def transactions():
-    theme = 'dark'
-    return render_template('transactions.html', theme=theme)
+class BudgetAlertState(db.Model):
+    """Running spent total of one budget period and the highest alert threshold already sent"""
+    budget_id = db.Column(db.Integer, db.ForeignKey('budget.id'), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    spent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    alerted_percent = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-@app.route('/budgets')
-@login_required
-def budgets():
-    theme = 'dark'
-    return render_template('budgets.html', theme=theme)
+# Transaction Rollups
+def _dialect_insert(connection, table):
+    """Return an INSERT construct that supports ON CONFLICT for the active dialect"""
+    if connection.dialect.name == 'postgresql':
+        return postgresql_dialect.insert(table)
+    return sqlite_dialect.insert(table)
 
+def _committed_value(obj, attr):
+    """Value of an attribute as last loaded from the database"""
+    history = sa_inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
 
+def add_rollup_delta(deltas: Dict, user_id: int, day, txn_type: str, category: str, amount, count: int):
+    """Accumulate an amount/count change for one rollup key"""
+    key = (user_id, day, txn_type, category)
+    entry = deltas.setdefault(key, [Decimal('0'), 0])
+    entry[0] += Decimal(str(amount or 0))
+    entry[1] += count
 
-@app.route('/savings', methods=['GET'])
-@login_required
-def savings():
-    theme = 'dark'
-    return render_template('savings.html', theme=theme)
+def apply_rollup_deltas(connection, deltas: Dict):
+    """Upsert accumulated deltas into transaction_rollup and transaction_total, then check budget alerts"""
+    deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+    if not deltas:
+        return
 
-@app.route('/family_members')
-@login_required
-def family_members():
-    theme = 'dark'
-    return render_template('family_members.html', theme=theme)
+    table = TransactionRollup.__table__
+    rows = [
+        {'user_id': user_id, 'date': day, 'type': txn_type, 'category': category,
+         'total': amount, 'count': count}
+        for (user_id, day, txn_type, category), (amount, count) in deltas.items()
+    ]
+    stmt = _dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.date, table.c.type, table.c.category],
+        set_={
+            'total': table.c.total + stmt.excluded.total,
+            'count': table.c.count + stmt.excluded.count
+        }
+    )
+    connection.execute(stmt, rows)
 
-@app.route('/api/family_members')
-@login_required
-def api_family_members():
-    user_id = session['user_id']
-    # For now, return all users as family members
-    # In a real application, you'd have a more complex relationship model
-    members = User.query.all()
-    return jsonify([{'id': u.id, 'name': u.name, 'email': u.email} for u in members])
+    # Drop buckets whose last transaction was removed or moved elsewhere
+    emptied = [row for row in rows if row['count'] < 0]
+    if emptied:
+        connection.execute(
+            table.delete().where(
+                table.c.user_id == db.bindparam('b_user_id'),
+                table.c.date == db.bindparam('b_date'),
+                table.c.type == db.bindparam('b_type'),
+                table.c.category == db.bindparam('b_category'),
+                table.c.count <= 0
+            ),
+            [{'b_user_id': row['user_id'], 'b_date': row['date'],
+              'b_type': row['type'], 'b_category': row['category']} for row in emptied]
+        )
 
-@app.route('/settings')
-@login_required
-def settings():
-    theme = 'dark'
-    return render_template('settings.html', theme=theme)
+    totals = {}
+    for row in rows:
+        entry = totals.setdefault((row['user_id'], row['type']), [Decimal('0'), 0])
+        entry[0] += row['total']
+        entry[1] += row['count']
+    table = TransactionTotal.__table__
+    stmt = _dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.type],
+        set_={
+            'total': table.c.total + stmt.excluded.total,
+            'count': table.c.count + stmt.excluded.count
+        }
+    )
+    connection.execute(stmt, [
+        {'user_id': user_id, 'type': txn_type, 'total': amount, 'count': count}
+        for (user_id, txn_type), (amount, count) in totals.items()
+    ])
 
-@app.route('/profile')
-@login_required
-def profile():
-    theme = 'dark'
-    return render_template('profile.html', theme=theme)
+    apply_budget_alert_deltas(connection, deltas)
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        try:
-            data = request.json
-            if not data:
-                return jsonify({'success': False, 'message': 'No data provided'}), 400
-            
-            email = data.get('email')
-            password = data.get('password')
-            
-            if not email or not password:
-                return jsonify({'success': False, 'message': 'Email and password are required'}), 400
-            
-            # Find user by email
-            user = User.query.filter_by(email=email).first()
-            
-            if user and user.check_password(password):
-                # Update last login
-                user.last_login = datetime.utcnow()
-                db.session.commit()
-                
-                # Set session
-                session['user_id'] = user.id
-                session.permanent = True  # Make session persistent
-                
-                print(f"User {user.email} logged in successfully. Session: {session}")
-                
-                return jsonify({
-                    'success': True, 
-                    'message': 'Login successful',
-                    'user': {
-                        'id': user.id,
-                        'name': user.name,
-                        'email': user.email
-                    }
-                })
-            else:
-                print(f"Login failed for email: {email}")
-                return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
+ROLLUP_TRACKED_ATTRIBUTES = ('user_id', 'date', 'type', 'category', 'amount')
+
+def _load_replaced_value(target, value, oldvalue, initiator):
+    """No-op set listener; registering it with active_history is what matters"""
+
+def track_replaced_values(model, attributes):
+    """Make assignments load the value they replace, even on expired instances
+
+    Setting an expired attribute does not load the old value, which would
+    leave _committed_value without the old key in before_flush listeners.
+    """
+    for attribute in attributes:
+        event.listen(getattr(model, attribute), 'set', _load_replaced_value, active_history=True)
+
+track_replaced_values(Transaction, ROLLUP_TRACKED_ATTRIBUTES)
+
+@event.listens_for(Session, 'before_flush')
+def maintain_transaction_rollups(session, flush_context, instances):
+    """Mirror pending Transaction inserts, updates and deletes into the rollup table"""
+    deltas = {}
+    tracked = ROLLUP_TRACKED_ATTRIBUTES
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add_rollup_delta(deltas, obj.user_id, obj.date, obj.type, obj.category, obj.amount, 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction) or not session.is_modified(obj):
+            continue
+        old = [_committed_value(obj, attr) for attr in tracked]
+        new = [getattr(obj, attr) for attr in tracked]
+        if old == new:
+            continue
+        add_rollup_delta(deltas, old[0], old[1], old[2], old[3], -Decimal(str(old[4] or 0)), -1)
+        add_rollup_delta(deltas, new[0], new[1], new[2], new[3], new[4], 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            old = [_committed_value(obj, attr) for attr in tracked]
+            add_rollup_delta(deltas, old[0], old[1], old[2], old[3], -Decimal(str(old[4] or 0)), -1)
+
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
+
+# Data Versions
+DATA_VERSION_COLUMNS = {'financial': 'version', 'chat': 'chat_version'}
+VERSIONED_MODELS = {}  # Model classes per version kind, filled in below once every model is defined
+
+def bump_data_versions(connection, user_ids, kind: str = 'financial'):
+    """Increment one kind of data version for each user on the given connection"""
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return
+    table = UserDataVersion.__table__
+    column = table.c[DATA_VERSION_COLUMNS[kind]]
+    stmt = _dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={column.name: db.func.coalesce(column, 0) + 1, 'updated_at': stmt.excluded.updated_at}
+    )
+    now = datetime.utcnow()
+    connection.execute(stmt, [{'user_id': user_id, column.name: 1, 'updated_at': now} for user_id in user_ids])
+
+@event.listens_for(Session, 'before_flush')
+def bump_versions_on_write(session, flush_context, instances):
+    """Bump the data versions of every user whose versioned rows are being written"""
+    for kind, models in VERSIONED_MODELS.items():
+        user_ids = set()
+        for obj in list(session.new) + list(session.deleted):
+            if isinstance(obj, models):
+                user_ids.add(obj.user_id)
+        for obj in session.dirty:
+            if isinstance(obj, models) and session.is_modified(obj):
+                user_ids.add(obj.user_id)
+                user_ids.add(_committed_value(obj, 'user_id'))
+        if user_ids:
+            bump_data_versions(session.connection(), user_ids, kind)
+
+def get_data_version(user_id: int, kind: str = 'financial') -> int:
+    column = getattr(UserDataVersion, DATA_VERSION_COLUMNS[kind])
+    version = db.session.execute(
+        db.select(column).where(UserDataVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+def request_data_version(user_id: int, kind: str = 'financial') -> int:
+    """Data version for the current GET request, looked up at most once"""
+    versions = g.setdefault('data_versions', {})
+    if (user_id, kind) not in versions:
+        versions[(user_id, kind)] = get_data_version(user_id, kind)
+    return versions[(user_id, kind)]
+
+def rebuild_transaction_rollups(user_id: Optional[int] = None) -> int:
+    """Recompute transaction_rollup and transaction_total from the raw transaction table"""
+    totals = TransactionTotal.__table__
+    totals_source = db.select(
+        Transaction.user_id,
+        Transaction.type,
+        db.func.sum(Transaction.amount),
+        db.func.count(Transaction.id)
+    ).group_by(Transaction.user_id, Transaction.type)
+    totals_delete = totals.delete()
+    if user_id is not None:
+        totals_source = totals_source.where(Transaction.user_id == user_id)
+        totals_delete = totals_delete.where(totals.c.user_id == user_id)
+    db.session.execute(totals_delete)
+    db.session.execute(totals.insert().from_select(['user_id', 'type', 'total', 'count'], totals_source))
+
+    table = TransactionRollup.__table__
+    source = db.select(
+        Transaction.user_id,
+        Transaction.date,
+        Transaction.type,
+        Transaction.category,
+        db.func.sum(Transaction.amount),
+        db.func.count(Transaction.id)
+    ).group_by(Transaction.user_id, Transaction.date, Transaction.type, Transaction.category)
+
+    delete = table.delete()
+    if user_id is not None:
+        source = source.where(Transaction.user_id == user_id)
+        delete = delete.where(table.c.user_id == user_id)
+
+    db.session.execute(delete)
+    db.session.execute(table.insert().from_select(
+        ['user_id', 'date', 'type', 'category', 'total', 'count'], source
+    ))
+    db.session.commit()
+
+    query = db.session.query(db.func.count()).select_from(table)
+    if user_id is not None:
+        query = query.filter(table.c.user_id == user_id)
+    return query.scalar()
+
+def rollup_sum(user_id: int, txn_type: str, start_date=None, end_date=None):
+    """Sum of transaction amounts for a user and type, read from the rollup table"""
+    query = db.session.query(db.func.sum(TransactionRollup.total)).filter(
+        TransactionRollup.user_id == user_id,
+        TransactionRollup.type == txn_type
+    )
+    if start_date is not None:
+        query = query.filter(TransactionRollup.date >= start_date)
+    if end_date is not None:
+        query = query.filter(TransactionRollup.date <= end_date)
+    return query.scalar() or 0
+
+def rollups_need_backfill() -> bool:
+    """True for databases with transactions recorded before the aggregate tables existed"""
+    if not Transaction.query.first():
+        return False
+    return not TransactionRollup.query.first() or not TransactionTotal.query.first()
+
+def user_balance(user_id: int) -> Decimal:
+    """All-time income minus expenses, read from transaction_total"""
+    totals = dict(db.session.query(TransactionTotal.type, TransactionTotal.total)
+                  .filter(TransactionTotal.user_id == user_id).all())
+    return (totals.get('income') or 0) - (totals.get('expense') or 0)
+
+VERSIONED_MODELS.update({
+    'financial': (Transaction, Budget, SavingsGoal, RecurringTransaction),
+    'chat': (ChatHistory,)
+})
+
+# Chat Statistics
+CHAT_TOPIC_WINDOW_DAYS = 30
+
+def add_chat_stat_delta(deltas: Dict, user_id: int, created_at, category, sentiment, count: int):
+    """Accumulate a message count change for every counter the message touches"""
+    for key in (('category', user_id, category or ''), ('sentiment', user_id, sentiment or ''),
+                ('day', user_id, (created_at or datetime.utcnow()).date(), category or '')):
+        deltas[key] = deltas.get(key, 0) + count
+
+def apply_chat_stat_deltas(connection, deltas: Dict):
+    """Upsert accumulated deltas into chat_stat and chat_daily_stat"""
+    deltas = {key: count for key, count in deltas.items() if count}
+    totals = [{'user_id': key[1], 'kind': key[0], 'key': key[2], 'count': count}
+              for key, count in deltas.items() if key[0] != 'day']
+    daily = [{'user_id': key[1], 'date': key[2], 'category': key[3], 'count': count}
+             for key, count in deltas.items() if key[0] == 'day']
+
+    for model, rows, index_elements in ((ChatStat, totals, ['user_id', 'kind', 'key']),
+                                        (ChatDailyStat, daily, ['user_id', 'date', 'category'])):
+        if not rows:
+            continue
+        table = model.__table__
+        stmt = _dialect_insert(connection, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in index_elements],
+            set_={'count': table.c.count + stmt.excluded.count}
+        )
+        connection.execute(stmt, rows)
+        connection.execute(table.delete().where(table.c.count <= 0,
+                                                table.c.user_id.in_({row['user_id'] for row in rows})))
+
+CHAT_STAT_TRACKED_ATTRIBUTES = ('user_id', 'created_at', 'category', 'sentiment')
+track_replaced_values(ChatHistory, CHAT_STAT_TRACKED_ATTRIBUTES)
+
+@event.listens_for(Session, 'before_flush')
+def maintain_chat_stats(session, flush_context, instances):
+    """Mirror pending ChatHistory inserts, relabels and deletes into the chat counters"""
+    deltas = {}
+    tracked = CHAT_STAT_TRACKED_ATTRIBUTES
+
+    for obj in session.new:
+        if isinstance(obj, ChatHistory):
+            if obj.created_at is None:
+                obj.created_at = datetime.utcnow()
+            add_chat_stat_delta(deltas, obj.user_id, obj.created_at, obj.category, obj.sentiment, 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, ChatHistory) or not session.is_modified(obj):
+            continue
+        old = [_committed_value(obj, attr) for attr in tracked]
+        new = [getattr(obj, attr) for attr in tracked]
+        if old != new:
+            add_chat_stat_delta(deltas, *old, -1)
+            add_chat_stat_delta(deltas, *new, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, ChatHistory):
+            add_chat_stat_delta(deltas, *[_committed_value(obj, attr) for attr in tracked], -1)
+
+    if deltas:
+        apply_chat_stat_deltas(session.connection(), deltas)
+
+CHAT_STATS_ARCHIVE_BATCH = 100
+
+def rebuild_chat_stats(user_id: Optional[int] = None):
+    """Recompute chat_stat and chat_daily_stat from chat_history and chat_archive
+
+    The counters include archived turns (estimated_chat_total subtracts
+    them again), so archive payloads are folded back in after the live rows.
+    """
+    label = lambda column: db.func.coalesce(column, '')
+    sources = [
+        (ChatStat.__table__, ['user_id', 'kind', 'key', 'count'],
+         db.select(ChatHistory.user_id, db.literal('category'), label(ChatHistory.category), db.func.count())
+         .group_by(ChatHistory.user_id, label(ChatHistory.category))),
+        (ChatStat.__table__, ['user_id', 'kind', 'key', 'count'],
+         db.select(ChatHistory.user_id, db.literal('sentiment'), label(ChatHistory.sentiment), db.func.count())
+         .group_by(ChatHistory.user_id, label(ChatHistory.sentiment))),
+        (ChatDailyStat.__table__, ['user_id', 'date', 'category', 'count'],
+         db.select(ChatHistory.user_id, db.func.date(ChatHistory.created_at), label(ChatHistory.category),
+                   db.func.count())
+         .group_by(ChatHistory.user_id, db.func.date(ChatHistory.created_at), label(ChatHistory.category))),
+    ]
+    for table in (ChatStat.__table__, ChatDailyStat.__table__):
+        delete = table.delete()
+        if user_id is not None:
+            delete = delete.where(table.c.user_id == user_id)
+        db.session.execute(delete)
+    for table, columns, source in sources:
+        if user_id is not None:
+            source = source.where(ChatHistory.user_id == user_id)
+        db.session.execute(table.insert().from_select(columns, source))
+    
+    # Compaction drops day counters that have left the recent-topics window
+    window_start = (datetime.utcnow() - timedelta(days=CHAT_TOPIC_WINDOW_DAYS + 1)).date()
+    last_id = 0
+    while True:
+        query = ChatArchive.query.filter(ChatArchive.id > last_id)
+        if user_id is not None:
+            query = query.filter(ChatArchive.user_id == user_id)
+        archives = query.order_by(ChatArchive.id).limit(CHAT_STATS_ARCHIVE_BATCH).all()
+        if not archives:
+            break
+        deltas = {}
+        for archive in archives:
+            for turn in archive.turns():
+                add_chat_stat_delta(deltas, archive.user_id, datetime.fromisoformat(turn['created_at']),
+                                    turn['category'], turn['sentiment'], 1)
+        deltas = {key: count for key, count in deltas.items() if key[0] != 'day' or key[2] >= window_start}
+        apply_chat_stat_deltas(db.session.connection(), deltas)
+        last_id = archives[-1].id
+    db.session.commit()
+
+def chat_stats_need_backfill() -> bool:
+    """True for databases with chat history recorded before the counters existed"""
+    return bool(ChatHistory.query.first()) and not ChatStat.query.first()
+
+def read_chat_insights(user_id: int) -> Dict:
+    """Chat totals and recent topics from the counter tables, without touching chat_history"""
+    counts = db.session.query(ChatStat.kind, ChatStat.key, ChatStat.count)\
+        .filter(ChatStat.user_id == user_id).all()
+    categories = [{'category': key or None, 'count': count} for kind, key, count in counts if kind == 'category']
+    sentiments = [{'sentiment': key or None, 'count': count} for kind, key, count in counts if kind == 'sentiment']
+
+    window_start = (datetime.utcnow() - timedelta(days=CHAT_TOPIC_WINDOW_DAYS)).date()
+    recent_topics = db.session.query(ChatDailyStat.category, db.func.sum(ChatDailyStat.count).label('count'))\
+        .filter(ChatDailyStat.user_id == user_id, ChatDailyStat.date >= window_start)\
+        .group_by(ChatDailyStat.category)\
+        .order_by(db.func.sum(ChatDailyStat.count).desc())\
+        .limit(5).all()
+
+    return {
+        'total_chats': sum(item['count'] for item in categories),
+        'categories': categories,
+        'sentiments': sentiments,
+        'recent_topics': [{'category': t.category or None, 'count': int(t.count)} for t in recent_topics]
+    }
+
+# Time-series Aggregation
+SERIES_GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+SERIES_GROUPINGS = ('type', 'category')
+
+def shift_month_start(day, months: int):
+    """First day of the calendar month `months` away from `day`"""
+    month_index = day.year * 12 + day.month - 1 + months
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+def bucket_start(day, granularity: str):
+    """Start date of the bucket containing `day`"""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day.replace(month=1, day=1)
+
+def next_bucket_start(day, granularity: str):
+    """Start date of the bucket following the one starting at `day`"""
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    return shift_month_start(day, {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+def bucket_count(start_date, end_date, granularity: str) -> int:
+    """Number of buckets between two dates, inclusive, without building them"""
+    first, last = bucket_start(start_date, granularity), bucket_start(end_date, granularity)
+    if last < first:
+        return 0
+    if granularity == 'day':
+        return (last - first).days + 1
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // {'month': 1, 'quarter': 3, 'year': 12}[granularity] + 1
+
+def _bucket_expression(column, granularity: str, dialect_name: str):
+    """SQL expression mapping a date column to the start of its bucket"""
+    if dialect_name == 'postgresql':
+        return db.func.date_trunc(granularity, column)
+    if granularity == 'day':
+        return db.func.date(column)
+    if granularity == 'week':
+        # Weeks start on Monday, matching date.weekday()
+        return db.func.date(column, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return db.func.date(column, 'start of month')
+    if granularity == 'quarter':
+        months_into_quarter = (db.cast(db.func.strftime('%m', column), db.Integer) - 1) % 3
+        return db.func.date(column, 'start of month', db.func.printf('-%d months', months_into_quarter))
+    return db.func.date(column, 'start of year')
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return value
+
+def aggregate_series(user_id: int, start_date, end_date, granularity: str = 'month',
+                     group_by: str = 'type', txn_type: Optional[str] = None,
+                     keys: Optional[List[str]] = None, max_buckets: Optional[int] = None) -> Dict:
+    """Bucketed transaction totals for a date range from a single GROUP BY query
+
+    Returns {'buckets': [bucket start dates], 'series': {key: [totals]}} where
+    every series has one value per bucket and empty buckets are filled with 0.
+    Ranges spanning more than `max_buckets` buckets raise ValueError.
+    """
+    if granularity not in SERIES_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(SERIES_GRANULARITIES)}")
+    if group_by not in SERIES_GROUPINGS:
+        raise ValueError(f"group_by must be one of {', '.join(SERIES_GROUPINGS)}")
+    if max_buckets is not None and bucket_count(start_date, end_date, granularity) > max_buckets:
+        raise ValueError(f"date range spans more than {max_buckets} {granularity} buckets; "
+                         f"use a shorter range or a coarser granularity")
+
+    buckets = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        buckets.append(current)
+        current = next_bucket_start(current, granularity)
+    positions = {bucket: index for index, bucket in enumerate(buckets)}
+
+    key_column = getattr(TransactionRollup, group_by)
+    bucket = _bucket_expression(TransactionRollup.date, granularity, db.engine.dialect.name).label('bucket')
+    query = db.session.query(
+        bucket,
+        key_column,
+        db.func.sum(TransactionRollup.total)
+    ).filter(
+        TransactionRollup.user_id == user_id,
+        TransactionRollup.date >= start_date,
+        TransactionRollup.date <= end_date
+    )
+    if txn_type is not None:
+        query = query.filter(TransactionRollup.type == txn_type)
+
+    series = {key: [0.0] * len(buckets) for key in (keys or [])}
+    for bucket_value, key, total in query.group_by(bucket, key_column).all():
+        position = positions.get(_as_date(bucket_value))
+        if position is None:
+            continue
+        series.setdefault(key, [0.0] * len(buckets))[position] += float(total or 0)
+
+    return {'buckets': buckets, 'series': dict(sorted(series.items()))}
+
+# Budget Status
+BUDGET_PERIODS = ('weekly', 'monthly', 'yearly')
+
+def budget_period_start(period: str, today=None):
+    """First day of the current budget period"""
+    today = today or datetime.now().date()
+    if period == 'monthly':
+        return today.replace(day=1)
+    elif period == 'weekly':
+        return today - timedelta(days=today.weekday())
+    else:  # yearly
+        return today.replace(month=1, day=1)
+
+def compute_budget_spent(budgets: List['Budget']) -> Dict[int, float]:
+    """Spent amount for each budget's current period, from one grouped query
+
+    Weekly, monthly and yearly budgets are served by the same query through
+    one conditional sum per period, so the cost does not grow with the
+    number of budgets.
+    """
+    if not budgets:
+        return {}
+
+    today = datetime.now().date()
+    starts = {period: budget_period_start(period, today) for period in BUDGET_PERIODS}
+    period_of = lambda budget: budget.period if budget.period in BUDGET_PERIODS else 'yearly'
+
+    period_sums = [
+        db.func.sum(db.case((TransactionRollup.date >= starts[period], TransactionRollup.total), else_=0))
+        for period in BUDGET_PERIODS
+    ]
+    rows = db.session.query(
+        TransactionRollup.user_id,
+        TransactionRollup.category,
+        *period_sums
+    ).filter(
+        TransactionRollup.user_id.in_({b.user_id for b in budgets}),
+        TransactionRollup.category.in_({b.category for b in budgets}),
+        TransactionRollup.type == 'expense',
+        TransactionRollup.date >= min(starts[period_of(b)] for b in budgets)
+    ).group_by(TransactionRollup.user_id, TransactionRollup.category).all()
+
+    totals = {
+        (user_id, category): dict(zip(BUDGET_PERIODS, sums))
+        for user_id, category, *sums in rows
+    }
+    spent = {}
+    for budget in budgets:
+        total = totals.get((budget.user_id, budget.category), {}).get(period_of(budget))
+        spent[budget.id] = float(total) if total else 0.0
+    return spent
+
+# Budget Alerts
+def apply_budget_alert_deltas(connection, deltas: Dict):
+    """Add expense deltas to each matching budget's current period and send crossed-threshold alerts
+
+    A write costs one indexed budget lookup, plus one UPDATE per matching
+    budget; the period's running total is only seeded from the rollups
+    on its first write.
+    """
+    spending = {}
+    for (user_id, day, txn_type, category), (amount, count) in deltas.items():
+        if txn_type == 'expense' and amount:
+            spending.setdefault((user_id, category), []).append((day, amount))
+    if not spending:
+        return
+    
+    table = Budget.__table__
+    budgets = [budget for budget in connection.execute(
+        db.select(table.c.id, table.c.user_id, table.c.category, table.c.limit_amount, table.c.period)
+        .where(table.c.user_id.in_({user_id for user_id, _ in spending}),
+               table.c.category.in_({category for _, category in spending}))
+    ) if (budget.user_id, budget.category) in spending]
+    
+    today = datetime.now().date()
+    for budget in budgets:
+        period = budget.period if budget.period in BUDGET_PERIODS else 'yearly'
+        start = budget_period_start(period, today)
+        amount = sum((amount for day, amount in spending[(budget.user_id, budget.category)] if day >= start),
+                     Decimal('0'))
+        if amount:
+            state = _add_budget_spending(connection, budget, start, amount)
+            _send_budget_alert(connection, budget, period, start, state)
+
+def _add_budget_spending(connection, budget, start, amount: Decimal):
+    """Add `amount` to the budget's running total for the period starting `start`"""
+    table = BudgetAlertState.__table__
+    now = datetime.utcnow()
+    state = connection.execute(
+        table.update()
+        .where(table.c.budget_id == budget.id, table.c.period_start == start)
+        .values(spent=table.c.spent + amount, updated_at=now)
+        .returning(table.c.spent, table.c.alerted_percent)
+    ).first()
+    if state is not None:
+        return state
+    
+    # First write of the period: seed from the rollups, which already include this delta
+    rollup = TransactionRollup.__table__
+    seeded = connection.execute(
+        db.select(db.func.coalesce(db.func.sum(rollup.c.total), 0))
+        .where(rollup.c.user_id == budget.user_id, rollup.c.category == budget.category,
+               rollup.c.type == 'expense', rollup.c.date >= start)
+    ).scalar()
+    connection.execute(table.delete().where(table.c.budget_id == budget.id, table.c.period_start < start))
+    stmt = _dialect_insert(connection, table).values(
+        budget_id=budget.id, period_start=start, spent=seeded, alerted_percent=0, updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.budget_id, table.c.period_start],
+        set_={'spent': table.c.spent + amount, 'updated_at': now}
+    )
+    return connection.execute(stmt.returning(table.c.spent, table.c.alerted_percent)).first()
+
+def _send_budget_alert(connection, budget, period: str, start, state):
+    """Queue a notification for the highest threshold newly crossed, once per period"""
+    limit = Decimal(str(budget.limit_amount or 0))
+    if limit <= 0:
+        return
+    percent = Decimal(str(state.spent)) * 100 / limit
+    crossed = [threshold for threshold in app.config['BUDGET_ALERT_THRESHOLDS']
+               if percent >= threshold and threshold > (state.alerted_percent or 0)]
+    if not crossed:
+        return
+    threshold = crossed[-1]
+    
+    # Only the writer that moves alerted_percent up sends the alert
+    table = BudgetAlertState.__table__
+    claimed = connection.execute(
+        table.update()
+        .where(table.c.budget_id == budget.id, table.c.period_start == start,
+               table.c.alerted_percent < threshold)
+        .values(alerted_percent=threshold)
+    ).rowcount
+    if claimed != 1:
+        return
+    
+    enabled = connection.execute(
+        db.select(UserPreference.budget_alerts).where(UserPreference.user_id == budget.user_id)
+    ).scalar()
+    if enabled is False:
+        return
+    
+    title = (f"{budget.category} budget exceeded" if threshold >= 100
+             else f"{budget.category} budget at {threshold}%")
+    connection.execute(Notification.__table__.insert().values(
+        user_id=budget.user_id,
+        title=title,
+        message=f"You have spent ${Decimal(str(state.spent)):,.2f} of your {period} ${limit:,.2f} "
+                f"{budget.category} budget ({percent:.0f}%).",
+        type='budget_alert',
+        priority='high' if threshold >= 100 else 'normal'
+    ))
+
+def reset_budget_alert_state(budget_id: int):
+    """Forget running totals after a budget's category, period or limit changes; the next write reseeds them"""
+    db.session.execute(BudgetAlertState.__table__.delete().where(BudgetAlertState.budget_id == budget_id))
+
+def reevaluate_budget_alert(connection, budget):
+    """Reseed a reset budget's current period and alert on any threshold its spending already crosses"""
+    period = budget.period if budget.period in BUDGET_PERIODS else 'yearly'
+    start = budget_period_start(period, datetime.now().date())
+    state = _add_budget_spending(connection, budget, start, Decimal('0'))
+    _send_budget_alert(connection, budget, period, start, state)
+
+@app.cli.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rows for this user')
+def rebuild_rollups_command(user_id):
+    """Backfill the transaction rollup and total tables for existing databases"""
+    db.create_all()
+    rows = rebuild_transaction_rollups(user_id)
+    click.echo(f"Rebuilt transaction rollups: {rows} rows")
+
+@app.cli.command('rebuild-chat-stats')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rows for this user')
+def rebuild_chat_stats_command(user_id):
+    """Recompute the chat counter tables from chat_history"""
+    db.create_all()
+    rebuild_chat_stats(user_id)
+    click.echo('Rebuilt chat statistics')
+
+# Schema Maintenance
+def upgrade_schema(engine=None) -> List[str]:
+    """Bring an existing database up to date with the models
+
+    Creates missing tables, adds missing columns and creates missing
+    indexes. Returns a description of every change that was applied.
+    """
+    engine = engine or db.engine
+    changes = []
+    inspector = sa_inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                table.create(connection)
+                changes.append(f"created table {table.name}")
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                )
+                changes.append(f"added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(f"created index {index.name}")
+
+    return changes
+
+def hot_queries(user_id: int = 1) -> List[tuple]:
+    """Representative statements for every hot read path, keyed by name"""
+    today = datetime.now().date()
+    start_of_month = today.replace(day=1)
+    return [
+        ('transactions.recent', db.select(Transaction)
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.date.desc(), Transaction.created_at.desc()).limit(20)),
+        ('transactions.page', db.select(Transaction)
+            .where(Transaction.user_id == user_id,
+                   db.tuple_(Transaction.date, Transaction.created_at, Transaction.id)
+                   < db.tuple_(today, datetime.now(), 1000))
+            .order_by(Transaction.date.desc(), Transaction.created_at.desc(), Transaction.id.desc())
+            .limit(21)),
+        ('transactions.sum_by_type', db.select(db.func.sum(Transaction.amount))
+            .where(Transaction.user_id == user_id, Transaction.type == 'expense',
+                   Transaction.date >= start_of_month)),
+        ('transactions.sum_by_category', db.select(db.func.sum(Transaction.amount))
+            .where(Transaction.user_id == user_id, Transaction.category == 'groceries',
+                   Transaction.type == 'expense', Transaction.date >= start_of_month)),
+        ('rollup.sum_by_type', db.select(db.func.sum(TransactionRollup.total))
+            .where(TransactionRollup.user_id == user_id, TransactionRollup.type == 'income',
+                   TransactionRollup.date >= start_of_month, TransactionRollup.date <= today)),
+        ('rollup.series', db.select(TransactionRollup.date, TransactionRollup.type,
+                                    db.func.sum(TransactionRollup.total))
+            .where(TransactionRollup.user_id == user_id, TransactionRollup.date >= shift_month_start(today, -11),
+                   TransactionRollup.date <= today)
+            .group_by(TransactionRollup.date, TransactionRollup.type)),
+        ('rollup.budget_spent', db.select(TransactionRollup.category, db.func.sum(TransactionRollup.total))
+            .where(TransactionRollup.user_id.in_([user_id]), TransactionRollup.category.in_(['groceries']),
+                   TransactionRollup.type == 'expense', TransactionRollup.date >= today.replace(month=1, day=1))
+            .group_by(TransactionRollup.user_id, TransactionRollup.category)),
+        ('transaction_total.balance', db.select(TransactionTotal.type, TransactionTotal.total)
+            .where(TransactionTotal.user_id == user_id)),
+        ('transactions.by_reference', db.select(Transaction.reference_number)
+            .where(Transaction.user_id == user_id, Transaction.reference_number.in_(['ref-1', 'ref-2']))),
+        ('budgets.by_user', db.select(Budget).where(Budget.user_id == user_id)),
+        ('budgets.for_alerts', db.select(Budget.id, Budget.limit_amount, Budget.period)
+            .where(Budget.user_id.in_([user_id]), Budget.category.in_(['groceries']))),
+        ('savings_goals.by_user', db.select(SavingsGoal)
+            .where(SavingsGoal.user_id == user_id).order_by(SavingsGoal.priority)),
+        ('notifications.recent', db.select(Notification)
+            .where(Notification.user_id == user_id)
+            .order_by(Notification.created_at.desc()).limit(20)),
+        ('chat_history.recent', db.select(ChatHistory)
+            .where(ChatHistory.user_id == user_id)
+            .order_by(ChatHistory.created_at.desc()).limit(20)),
+        ('chat_history.page', db.select(ChatHistory)
+            .where(ChatHistory.user_id == user_id,
+                   db.tuple_(ChatHistory.created_at, ChatHistory.id) < db.tuple_(datetime.utcnow(), 1000))
+            .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc()).limit(21)),
+        ('chat_history.expired', db.select(ChatHistory)
+            .where(ChatHistory.created_at < datetime.utcnow() - timedelta(days=90))
+            .order_by(ChatHistory.created_at, ChatHistory.id).limit(500)),
+        ('chat_jobs.stale', db.select(ChatJob.id)
+            .where(ChatJob.status == 'queued', ChatJob.created_at < datetime.utcnow() - timedelta(minutes=1))
+            .order_by(ChatJob.created_at).limit(32)),
+        ('chat_stat.by_user', db.select(ChatStat.kind, ChatStat.key, ChatStat.count)
+            .where(ChatStat.user_id == user_id)),
+        ('recurring.due', db.select(RecurringTransaction)
+            .where(RecurringTransaction.is_active == True, RecurringTransaction.next_due_date <= today,
+                   db.tuple_(RecurringTransaction.next_due_date, RecurringTransaction.id) > db.tuple_(today, 1000))
+            .order_by(RecurringTransaction.next_due_date, RecurringTransaction.id).limit(1000)),
+        ('savings_goals.auto_save_due', db.select(SavingsGoal.id).where(auto_save_due_clause(datetime.utcnow()))
+            .limit(500)),
+        ('notifications.due', db.select(Notification.id).where(notification_due_clause(datetime.utcnow()))
+            .limit(500)),
+        ('chat_daily_stat.window', db.select(ChatDailyStat.category, db.func.sum(ChatDailyStat.count))
+            .where(ChatDailyStat.user_id == user_id, ChatDailyStat.date >= today - timedelta(days=30))
+            .group_by(ChatDailyStat.category)),
+    ]
+
+def explain_query_plans(engine, user_id: int = 1) -> List[tuple]:
+    """Run EXPLAIN QUERY PLAN for each hot query
+
+    Returns (name, plan lines, full-scan lines) for every statement; a
+    statement regresses when it reads a table without a usable index.
+    """
+    results = []
+    with engine.connect() as connection:
+        for name, statement in hot_queries(user_id):
+            compiled = statement.compile(dialect=connection.dialect,
+                                         compile_kwargs={'render_postcompile': True})
+            params = tuple(
+                value.isoformat(sep=' ') if isinstance(value, datetime)
+                else value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in (compiled.params[key] for key in compiled.positiontup)
+            )
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+            plan = [row[-1] for row in rows]
+            scans = [line for line in plan if re.match(r'^SCAN (?!CONSTANT ROW)\S+$', line)]
+            results.append((name, plan, scans))
+    return results
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables, columns and indexes in an existing database"""
+    changes = upgrade_schema()
+    if rollups_need_backfill():
+        rebuild_transaction_rollups()
+        changes.append('backfilled transaction_rollup and transaction_total')
+    if chat_stats_need_backfill():
+        rebuild_chat_stats()
+        changes.append('backfilled chat_stat and chat_daily_stat')
+    for change in changes:
+        click.echo(change)
+    click.echo(f"Schema up to date ({len(changes)} changes applied)")
+
+@app.cli.command('check-query-plans')
+@click.option('--live', is_flag=True, help='Check the configured database instead of a fresh schema')
+def check_query_plans_command(live):
+    """Fail if any hot query falls back to a full table scan"""
+    if live:
+        engine = db.engine
+    else:
+        engine = db.create_engine('sqlite://')
+        db.metadata.create_all(engine)
+
+    failures = 0
+    for name, plan, scans in explain_query_plans(engine):
+        status = 'FAIL' if scans else 'ok'
+        click.echo(f"[{status}] {name}: {' | '.join(plan)}")
+        failures += bool(scans)
+
+    if failures:
+        raise click.ClickException(f"{failures} hot queries fall back to a full table scan")
+    click.echo('All hot queries use an index')
+
+# AI Chatbot Functions
+def build_financial_context(user_id: int) -> str:
+    """Render the short financial summary that is prepended to chat prompts"""
+    # Get recent transactions
+    recent_categories = [row.category for row in db.session.query(Transaction.category)
+                         .filter_by(user_id=user_id)
+                         .order_by(Transaction.date.desc()).limit(5)]
+    
+    # Get current budgets and savings goals
+    budget_categories = [row.category for row in db.session.query(Budget.category).filter_by(user_id=user_id)]
+    goal_count = db.session.query(db.func.count(SavingsGoal.id)).filter_by(user_id=user_id).scalar()
+    
+    # Get current balance
+    balance = float(user_balance(user_id))
+    
+    context = f"""
+    User Financial Summary:
+    - Current Balance: ${balance:,.2f}
+    - Recent Transactions: {len(recent_categories)} transactions
+    - Active Budgets: {len(budget_categories)} budgets
+    - Savings Goals: {goal_count} active goals
+    """
+    
+    if recent_categories:
+        context += "\nRecent Transaction Categories: " + ", ".join(recent_categories[:3])
+    
+    if budget_categories:
+        context += f"\nBudget Categories: {', '.join(budget_categories[:3])}"
+    
+    return context.strip()
+
+def get_financial_context(user_id: int) -> str:
+    """Get financial context for the user to provide better AI responses
+
+    Cached per user until the financial data version moves, so a warm
+    lookup costs a single primary-key read and chat turns keep it warm.
+    """
+    try:
+        key = f"{user_id}:{get_data_version(user_id, 'financial')}"
+        context = financial_context_cache.get(key)
+        if context is None:
+            context = build_financial_context(user_id)
+            financial_context_cache.set(key, context)
+        return context
+        
+    except Exception as e:
+        return f"Error getting financial context: {str(e)}"
+
+# Prompt Construction
+ChatPrompt = namedtuple('ChatPrompt', ['text', 'history_turns', 'summarized'])
+CHAT_SUMMARY_QUESTIONS = 3
+CHAT_TURN_MESSAGE_CHARS = 300
+CHAT_TURN_RESPONSE_CHARS = 500
+
+def clip_text(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:max(limit - 3, 0)].rstrip() + '...'
+
+def render_advisor_prompt(message: str, context: str = "", history: str = "") -> str:
+    return FINANCIAL_ADVISOR_PROMPT.format(context=context, history=history or 'None yet.', message=message)
+
+def render_chat_summary(state: Dict) -> str:
+    if not state.get('turns'):
+        return ''
+    topics = sorted(state['topics'].items(), key=lambda item: (-item[1], item[0]))
+    summary = f"Earlier, over {state['turns']} messages, the user asked about " + \
+        ', '.join(f"{(topic or 'general').replace('_', ' ')} ({count})" for topic, count in topics) + '.'
+    if state['questions']:
+        summary += ' Latest of those questions: ' + ' | '.join(state['questions'])
+    return summary
+
+def rolling_chat_summary(user_id: int, before) -> str:
+    """Summary of every turn older than the `before` (created_at, id) position
+
+    The summary state is kept in chat_summary with the position of the
+    newest turn folded in, so each call only reads turns that aged out of
+    the recent window since the last one. The state is saved in its own
+    short transaction rather than the caller's session: prompt building
+    must not commit the caller's work, and must not hold a write lock
+    across the inference call that follows. Reads skip autoflush for the
+    same reason, so the caller's pending objects stay unwritten.
+    """
+    with db.session.no_autoflush:
+        record = db.session.get(ChatSummary, user_id)
+        state = json.loads(record.state) if record else {'turns': 0, 'topics': {}, 'questions': []}
+        
+        query = db.session.query(ChatHistory.id, ChatHistory.created_at, ChatHistory.category, ChatHistory.message)\
+            .filter(ChatHistory.user_id == user_id,
+                    db.tuple_(ChatHistory.created_at, ChatHistory.id) < db.tuple_(*before))
+        if record and record.through_id is not None:
+            query = query.filter(
+                db.tuple_(ChatHistory.created_at, ChatHistory.id) > db.tuple_(record.through_created_at, record.through_id)
+            )
+        rows = query.order_by(ChatHistory.created_at, ChatHistory.id).all()
+    if not rows:
+        return record.summary if record else ''
+    
+    for row in rows:
+        state['turns'] += 1
+        state['topics'][row.category or 'general'] = state['topics'].get(row.category or 'general', 0) + 1
+        state['questions'] = (state['questions'] + [clip_text(row.message, 120)])[-CHAT_SUMMARY_QUESTIONS:]
+    summary = render_chat_summary(state)
+    
+    save_chat_summary(user_id, state, summary, rows[-1].created_at, rows[-1].id)
+    return summary
+
+def save_chat_summary(user_id: int, state: Dict, summary: str, through_created_at, through_id: int):
+    """Upsert a user's summary state unless a newer one was saved meanwhile"""
+    table = ChatSummary.__table__
+    with db.engine.begin() as connection:
+        stmt = _dialect_insert(connection, table).values(
+            user_id=user_id, state=json.dumps(state), summary=summary,
+            through_created_at=through_created_at, through_id=through_id, updated_at=datetime.utcnow()
+        )
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={column: stmt.excluded[column]
+                  for column in ('state', 'summary', 'through_created_at', 'through_id', 'updated_at')},
+            where=db.or_(
+                table.c.through_id.is_(None),
+                db.tuple_(table.c.through_created_at, table.c.through_id)
+                < db.tuple_(stmt.excluded.through_created_at, stmt.excluded.through_id)
+            )
+        ))
+
+def build_chat_prompt(user_id: int, message: str, context: str) -> ChatPrompt:
+    """Advisor prompt with recent turns verbatim and older ones summarized
+
+    The whole prompt is held to CHAT_PROMPT_MAX_CHARS however long the
+    conversation runs: after the fixed template, half the room goes to the
+    message and a quarter to the financial context. A third of what is left
+    is kept for the rolling summary and the rest takes recent turns, newest
+    first.
+    """
+    budget = app.config['CHAT_PROMPT_MAX_CHARS']
+    room = max(budget - len(render_advisor_prompt('')), 0)
+    message = clip_text(message, room // 2)
+    context = clip_text(context, room // 4)
+    room -= len(message) + len(context)
+    
+    with db.session.no_autoflush:
+        recent = db.session.query(ChatHistory.id, ChatHistory.created_at, ChatHistory.message, ChatHistory.response)\
+            .filter(ChatHistory.user_id == user_id)\
+            .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())\
+            .limit(app.config['CHAT_PROMPT_RECENT_TURNS']).all()
+    
+    summary_room = room // 3
+    room -= summary_room
+    turns = []
+    for turn in recent:
+        text = f"User: {clip_text(turn.message, CHAT_TURN_MESSAGE_CHARS)}\n" \
+               f"Advisor: {clip_text(turn.response, CHAT_TURN_RESPONSE_CHARS)}"
+        if len(text) + 1 > room:
+            break
+        turns.append(text)
+        room -= len(text) + 1
+    
+    sections = []
+    summarized = False
+    if recent:
+        # Everything older than the oldest quoted turn goes into the summary
+        oldest = recent[len(turns) - 1] if turns else None
+        before = (oldest.created_at, oldest.id) if oldest else (recent[0].created_at, recent[0].id + 1)
+        summary = rolling_chat_summary(user_id, before)
+        if summary:
+            sections.append(clip_text(summary, summary_room - 1))
+            summarized = True
+    sections.extend(reversed(turns))
+    
+    return ChatPrompt(render_advisor_prompt(message, context, '\n'.join(sections)), len(turns), summarized)
+
+# Inference Client
+class InferenceUnavailable(Exception):
+    """The inference backend failed, or the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open trial -> closed"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 2))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'retry_in': retry_in
+            }
+
+class LatencyHistogram:
+    """Cumulative request latencies in fixed millisecond buckets"""
+    BOUNDS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, bounds_ms: Optional[tuple] = None):
+        if bounds_ms:
+            self.BOUNDS_MS = tuple(bounds_ms)
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(self.BOUNDS_MS) if ms <= bound), len(self.BOUNDS_MS))
+        with self._lock:
+            self.counts[index] += 1
+            self.total_ms += ms
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = sum(self.counts)
+            labels = [f'le_{bound}' for bound in self.BOUNDS_MS] + ['inf']
+            return {
+                'count': count,
+                'mean_ms': round(self.total_ms / count, 2) if count else None,
+                'buckets': dict(zip(labels, self.counts))
+            }
+
+class InferenceClient:
+    """Keep-alive HTTP client for the inference API with retries and a breaker
+
+    One pooled session is shared by all chat workers, so calls reuse warm
+    connections. Connection errors, timeouts, 429 and 5xx are retried with
+    jittered exponential backoff; once the breaker opens, calls fail fast.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, url: str, api_key: str, config):
+        self.url = url
+        self.timeout = (config['INFERENCE_CONNECT_TIMEOUT'], config['INFERENCE_READ_TIMEOUT'])
+        self.max_retries = config['INFERENCE_MAX_RETRIES']
+        self.backoff = config['INFERENCE_RETRY_BACKOFF']
+        self.breaker = CircuitBreaker(config['INFERENCE_BREAKER_THRESHOLD'], config['INFERENCE_BREAKER_RESET'])
+        self.latency = LatencyHistogram()
+        self.outcomes = {'success': 0, 'failure': 0, 'retry': 0, 'short_circuit': 0}
+        
+        self.session = requests.Session()
+        pool_size = max(config.get('CHAT_WORKERS', 1), 1) * 2
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def post(self, payload: dict):
+        """POST payload and return the decoded JSON body, or raise InferenceUnavailable"""
+        if not self.breaker.allow():
+            self.outcomes['short_circuit'] += 1
+            raise InferenceUnavailable('circuit breaker open')
+        
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.outcomes['retry'] += 1
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                continue
+            finally:
+                self.latency.observe(time.perf_counter() - started)
+            
+            if response.status_code == 200:
+                self.breaker.record_success()
+                self.outcomes['success'] += 1
+                return response.json()
+            error = InferenceUnavailable(f'HTTP {response.status_code}')
+            if response.status_code not in self.RETRY_STATUSES:
+                break
+        
+        self.breaker.record_failure()
+        self.outcomes['failure'] += 1
+        raise InferenceUnavailable(str(error))
+
+    def stream(self, payload: dict):
+        """Yield generated text pieces as the backend produces them
+
+        Raises InferenceUnavailable before the first piece when the call
+        fails. A backend that answers with a plain JSON body instead of an
+        event stream yields its whole text as one piece. Streams are not
+        retried, since a partial answer may already have been forwarded.
+        """
+        if not self.breaker.allow():
+            self.outcomes['short_circuit'] += 1
+            raise InferenceUnavailable('circuit breaker open')
+        
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json={**payload, 'stream': True},
+                                         timeout=self.timeout, stream=True)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            self.outcomes['failure'] += 1
+            raise InferenceUnavailable(str(e))
+        if response.status_code != 200:
+            response.close()
+            self.breaker.record_failure()
+            self.outcomes['failure'] += 1
+            raise InferenceUnavailable(f'HTTP {response.status_code}')
+        self.breaker.record_success()
+        self.outcomes['success'] += 1
+        
+        with response:
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                yield extract_generated_text(response.json())
+            else:
+                for line in self._event_lines(response):
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    token = json.loads(data).get('token') or {}
+                    if token.get('text') and not token.get('special'):
+                        yield token['text']
+        self.latency.observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _event_lines(response):
+        """Decoded lines of an event stream, as soon as each one arrives
+
+        iter_lines() waits to fill its read size on streams that are not
+        chunk-encoded; read1() returns whatever bytes are already available.
+        """
+        buffer = b''
+        for data in iter(lambda: response.raw.read1(8192), b''):
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                yield line.rstrip(b'\r').decode('utf-8')
+        if buffer:
+            yield buffer.decode('utf-8')
+
+    def stats(self) -> dict:
+        return {
+            'url': self.url,
+            'breaker': self.breaker.stats(),
+            'outcomes': dict(self.outcomes),
+            'latency': self.latency.stats()
+        }
+
+inference_client = InferenceClient(HUGGINGFACE_API_URL, HUGGINGFACE_API_KEY, app.config)
+chat_stream_ttft = LatencyHistogram()  # Request start to first streamed chunk
+
+def build_inference_payload(prompt: str) -> dict:
+    return {
+        "inputs": prompt,
+        "parameters": {
+            "max_length": 500,
+            "temperature": 0.7,
+            "do_sample": True,
+            "top_p": 0.9
+        }
+    }
+
+def request_ai_response(prompt: str) -> Optional[str]:
+    """Ask the inference backend for advice; None when it is unavailable"""
+    try:
+        result = inference_client.post(build_inference_payload(prompt))
+    except (InferenceUnavailable, ValueError) as e:
+        print(f"Error calling Hugging Face API: {e}")
+        return None
+    return extract_generated_text(result)
+
+def extract_generated_text(result) -> str:
+    if isinstance(result, list) and len(result) > 0:
+        return result[0].get('generated_text', 'I apologize, but I could not generate a response at this time.')
+    elif isinstance(result, dict):
+        return result.get('generated_text', 'I apologize, but I could not generate a response at this time.')
+    else:
+        return 'I apologize, but I could not generate a response at this time.'
+
+def advice_is_cacheable(prompt) -> bool:
+    """The advice cache is shared across users, so only answers to prompts
+    that quote none of the user's own conversation may be stored or served"""
+    return not prompt.history_turns and not prompt.summarized
+
+def get_ai_advice(user_id: int, message: str, category: str, context: str) -> str:
+    """AI response for a chat message, memoized across near-identical questions
+
+    Only real model answers are cached, so an outage never pins a fallback.
+    """
+    prompt = build_chat_prompt(user_id, message, context)
+    cacheable = advice_is_cacheable(prompt)
+    key = advice_cache_key(message, category, context)
+    cached = advice_cache.get(key) if cacheable else None
+    if cached is not None:
+        return cached.decode()
+    
+    response = request_ai_response(prompt.text)
+    if response is None:
+        return generate_fallback_response(message)
+    if cacheable:
+        advice_cache.set(key, response.encode())
+    return response
+
+def chunk_text(text: str, words_per_chunk: int = 3):
+    """Split text into small pieces for streaming, keeping its whitespace"""
+    words = re.findall(r'\S+\s*', text)
+    for i in range(0, len(words), words_per_chunk):
+        yield ''.join(words[i:i + words_per_chunk])
+
+def stream_ai_advice(user_id: int, message: str, category: str, context: str):
+    """Yield the AI response in pieces as it is generated
+
+    Cached answers and the keyword fallback are replayed in small chunks so
+    the client renders every reply the same way.
+    """
+    prompt = build_chat_prompt(user_id, message, context)
+    cacheable = advice_is_cacheable(prompt)
+    key = advice_cache_key(message, category, context)
+    cached = advice_cache.get(key) if cacheable else None
+    if cached is not None:
+        yield from chunk_text(cached.decode())
+        return
+    
+    pieces = []
+    try:
+        for piece in inference_client.stream(build_inference_payload(prompt.text)):
+            pieces.append(piece)
+            yield piece
+    except (InferenceUnavailable, requests.RequestException, ValueError) as e:
+        print(f"Error streaming from Hugging Face API: {e}")
+        if not pieces:
+            yield from chunk_text(generate_fallback_response(message))
+        return
+    if pieces and cacheable:
+        advice_cache.set(key, ''.join(pieces).encode())
+
+def generate_fallback_response(message: str) -> str:
+    """Generate a fallback response when AI API is unavailable"""
+    message_lower = message.lower()
+    
+    # Simple keyword-based responses
+    if any(word in message_lower for word in ['budget', 'spending', 'expense']):
+        return "I'd be happy to help you with budgeting! To get started, try tracking your expenses for a month to see where your money goes. You can then set realistic spending limits for different categories."
+    
+    elif any(word in message_lower for word in ['save', 'savings', 'goal']):
+        return "Great question about savings! Start by setting a specific goal with a target amount and date. Then break it down into smaller, manageable monthly or weekly amounts. Even small regular contributions add up over time!"
+    
+    elif any(word in message_lower for word in ['invest', 'investment', 'portfolio']):
+        return "Investment advice should be personalized to your goals and risk tolerance. Consider starting with diversified index funds and gradually learning about different investment options. Remember, it's important to do thorough research or consult with a financial advisor."
+    
+    elif any(word in message_lower for word in ['debt', 'loan', 'credit']):
+        return "Managing debt effectively is crucial for financial health. Focus on high-interest debt first, consider debt consolidation if it makes sense, and always pay at least the minimum payment on time. Creating a debt payoff plan can help you stay motivated."
+    
+    elif any(word in message_lower for word in ['income', 'salary', 'earn']):
+        return "Increasing your income can significantly impact your financial goals. Consider asking for a raise, developing new skills, taking on side projects, or exploring passive income opportunities. Remember to invest in yourself!"
+    
+    else:
+        return "I'm here to help with your financial questions! Feel free to ask about budgeting, saving, investing, debt management, or any other financial topics. I'll do my best to provide helpful guidance."
+
+# Message Classification
+# Labels are checked in order; the first category with a matching word wins
+DEFAULT_CLASSIFIER_VOCABULARY = {
+    'sentiment': {
+        'positive': ['good', 'great', 'excellent', 'happy', 'excited', 'positive', 'improve', 'improving',
+                     'better', 'success', 'successful', 'achieve', 'achieved'],
+        'negative': ['bad', 'terrible', 'worried', 'worry', 'stressed', 'stress', 'anxious', 'problem', 'problems',
+                     'issue', 'issues', 'difficult', 'struggle', 'struggling', 'fail', 'failed', 'failing']
+    },
+    'categories': {
+        'budget_help': ['budget', 'budgets', 'budgeting', 'spending', 'spend', 'spent', 'expense', 'expenses',
+                        'cost', 'costs'],
+        'savings_guidance': ['save', 'saving', 'savings', 'goal', 'goals', 'target', 'targets'],
+        'investment_advice': ['invest', 'investing', 'investment', 'investments', 'portfolio', 'stock', 'stocks',
+                              'bond', 'bonds'],
+        'debt_management': ['debt', 'debts', 'loan', 'loans', 'credit', 'payment', 'payments'],
+        'income_optimization': ['income', 'salary', 'earn', 'earning', 'earnings', 'money'],
+        'retirement_planning': ['retirement', 'retire', 'future', 'planning', 'plan'],
+        'tax_optimization': ['tax', 'taxes', 'deduction', 'deductions']
+    }
+}
+
+# Word lists of the substring checks the classifier replaced, frozen as the
+# benchmark baseline. Words added since (mostly inflections that substring
+# matching used to catch) are reported by benchmark-classifier.
+LEGACY_CLASSIFIER_VOCABULARY = {
+    'sentiment': {
+        'positive': ['good', 'great', 'excellent', 'happy', 'excited', 'positive', 'improve', 'better', 'success',
+                     'achieve'],
+        'negative': ['bad', 'terrible', 'worried', 'stressed', 'anxious', 'problem', 'issue', 'difficult', 'struggle',
+                     'fail']
+    },
+    'categories': {
+        'budget_help': ['budget', 'spending', 'expense', 'cost'],
+        'savings_guidance': ['save', 'savings', 'goal', 'target'],
+        'investment_advice': ['invest', 'investment', 'portfolio', 'stock', 'bond'],
+        'debt_management': ['debt', 'loan', 'credit', 'payment'],
+        'income_optimization': ['income', 'salary', 'earn', 'money'],
+        'retirement_planning': ['retirement', 'future', 'planning'],
+        'tax_optimization': ['tax', 'taxes', 'deduction']
+    }
+}
+
+class KeywordClassifier:
+    """Whole-word keyword matcher: one compiled tokenizer plus a hash lookup
+
+    Messages are split into words with a single regex and each word (or
+    run of words, for multi-word phrases) is looked up in a word -> label
+    table, so matching never fires inside longer words and the cost does
+    not grow with vocabulary size.
+    """
+    TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+    def __init__(self, vocabulary: Dict[str, List[str]]):
+        self.labels = list(vocabulary)
+        self.lookup = {}
+        for label, words in vocabulary.items():
+            for word in words:
+                # Earlier labels win when a word is listed twice
+                self.lookup.setdefault(' '.join(self.TOKEN_PATTERN.findall(word.lower())), label)
+        self.max_phrase = max((phrase.count(' ') + 1 for phrase in self.lookup), default=1)
+
+    def matches(self, text: str) -> Dict[str, set]:
+        """Distinct matched words per label"""
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        found = {}
+        lookup = self.lookup
+        for size in range(1, self.max_phrase + 1):
+            candidates = tokens if size == 1 else \
+                [' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+            for candidate in candidates:
+                label = lookup.get(candidate)
+                if label is not None:
+                    found.setdefault(label, set()).add(candidate)
+        return found
+
+    def first_label(self, text: str, default: str) -> str:
+        found = self.matches(text)
+        return next((label for label in self.labels if label in found), default)
+
+def load_classifier_vocabulary() -> Dict:
+    """Built-in vocabulary, with sections replaced by CLASSIFIER_VOCABULARY_PATH if set"""
+    vocabulary = dict(DEFAULT_CLASSIFIER_VOCABULARY)
+    path = app.config['CLASSIFIER_VOCABULARY_PATH']
+    if path:
+        with open(path) as f:
+            vocabulary.update(json.load(f))
+    return vocabulary
+
+classifier_vocabulary = load_classifier_vocabulary()
+sentiment_classifier = KeywordClassifier(classifier_vocabulary['sentiment'])
+category_classifier = KeywordClassifier(classifier_vocabulary['categories'])
+
+def analyze_sentiment(message: str) -> str:
+    """Analyze the sentiment of a user message"""
+    found = sentiment_classifier.matches(message)
+    positive_count = len(found.get('positive', ()))
+    negative_count = len(found.get('negative', ()))
+    
+    if positive_count > negative_count:
+        return 'positive'
+    elif negative_count > positive_count:
+        return 'negative'
+    else:
+        return 'neutral'
+
+def categorize_message(message: str) -> str:
+    """Categorize the type of financial question"""
+    return category_classifier.first_label(message, 'general_financial_advice')
+
+def reclassify_chat_history(batch_size: int = 1000, user_id: Optional[int] = None) -> Dict:
+    """Re-run sentiment and category classification over stored chat messages
+
+    Walks chat_history in primary-key order and writes only the rows whose
+    labels changed, committing once per batch.
+    """
+    table = ChatHistory.__table__
+    update = table.update().where(table.c.id == db.bindparam('b_id')).values(
+        category=db.bindparam('b_category'), sentiment=db.bindparam('b_sentiment')
+    )
+    scanned = updated = 0
+    last_id = 0
+    while True:
+        query = db.select(table.c.id, table.c.user_id, table.c.created_at, table.c.message,
+                          table.c.category, table.c.sentiment)\
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        
+        changes = []
+        deltas = {}
+        for row in rows:
+            category = categorize_message(row.message)
+            sentiment = analyze_sentiment(row.message)
+            if (category, sentiment) != (row.category, row.sentiment):
+                changes.append({'b_id': row.id, 'b_category': category, 'b_sentiment': sentiment,
+                                'user_id': row.user_id})
+                add_chat_stat_delta(deltas, row.user_id, row.created_at, row.category, row.sentiment, -1)
+                add_chat_stat_delta(deltas, row.user_id, row.created_at, category, sentiment, 1)
+        if changes:
+            connection = db.session.connection()
+            connection.execute(update, changes)
+            apply_chat_stat_deltas(connection, deltas)
+            bump_data_versions(connection, [change['user_id'] for change in changes], 'chat')
+        db.session.commit()
+        
+        scanned += len(rows)
+        updated += len(changes)
+        last_id = rows[-1].id
+    return {'scanned': scanned, 'updated': updated}
+
+def _substring_sentiment(message: str) -> str:
+    """Previous substring-matching sentiment check, kept as the benchmark baseline"""
+    message_lower = message.lower()
+    vocabulary = LEGACY_CLASSIFIER_VOCABULARY['sentiment']
+    positive_count = sum(1 for word in vocabulary['positive'] if word in message_lower)
+    negative_count = sum(1 for word in vocabulary['negative'] if word in message_lower)
+    if positive_count > negative_count:
+        return 'positive'
+    elif negative_count > positive_count:
+        return 'negative'
+    return 'neutral'
+
+def _substring_category(message: str) -> str:
+    """Previous substring-matching categorizer, kept as the benchmark baseline"""
+    message_lower = message.lower()
+    for label, words in LEGACY_CLASSIFIER_VOCABULARY['categories'].items():
+        if any(word in message_lower for word in words):
+            return label
+    return 'general_financial_advice'
+
+@app.cli.command('reclassify-chats')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@click.option('--user-id', type=int, default=None, help='Only reclassify this user\'s messages')
+def reclassify_chats_command(batch_size, user_id):
+    """Recompute category and sentiment for stored chat messages"""
+    result = reclassify_chat_history(batch_size, user_id)
+    click.echo(f"Scanned {result['scanned']} messages, updated {result['updated']}")
+
+BENCHMARK_MESSAGES = [
+    "How do I build a monthly budget for my family?",
+    "I'm worried about my credit card debt and loan payments",
+    "What is a good portfolio of stocks and bonds for a beginner?",
+    "Can I save enough for a vacation goal by next summer?",
+    "My budgetary failsafe keeps failing, any tips?",
+    "How should I plan for retirement in my thirties?",
+    "Which tax deductions can I claim as a freelancer?",
+    "Thanks, that was really helpful and I feel much better!",
+]
+
+def vocabulary_additions() -> Dict[str, Dict[str, List[str]]]:
+    """Words in the built-in vocabulary that the legacy word lists did not have"""
+    return {
+        section: {label: [word for word in words if word not in LEGACY_CLASSIFIER_VOCABULARY[section].get(label, [])]
+                  for label, words in labels.items()}
+        for section, labels in DEFAULT_CLASSIFIER_VOCABULARY.items()
+    }
+
+@app.cli.command('benchmark-classifier')
+@click.option('--iterations', type=int, default=20000, show_default=True)
+@click.option('--extra-words', type=int, default=0, show_default=True,
+              help='Synthetic words added to every label to show scaling with vocabulary size')
+def benchmark_classifier_command(iterations, extra_words):
+    """Compare the compiled classifier with the substring checks it replaced
+
+    The substring baseline runs on the legacy word lists. The compiled
+    matcher is timed on those same lists and on the current vocabulary.
+    Relabelled messages are split into those caused by whole-word matching
+    and those caused by vocabulary additions.
+    """
+    def padded(vocabulary):
+        return {label: words + [f'zz{label}{i}' for i in range(extra_words)] for label, words in vocabulary.items()}
+
+    legacy_sentiment = padded(LEGACY_CLASSIFIER_VOCABULARY['sentiment'])
+    legacy_category = padded(LEGACY_CLASSIFIER_VOCABULARY['categories'])
+
+    def substring(message):
+        message_lower = message.lower()
+        positive = sum(1 for word in legacy_sentiment['positive'] if word in message_lower)
+        negative = sum(1 for word in legacy_sentiment['negative'] if word in message_lower)
+        category = next((label for label, words in legacy_category.items()
+                         if any(word in message_lower for word in words)), None)
+        return positive, negative, category
+
+    def compiled_with(sentiment_vocabulary, category_vocabulary):
+        sentiment = KeywordClassifier(sentiment_vocabulary)
+        category = KeywordClassifier(category_vocabulary)
+        def classify(message):
+            found = sentiment.matches(message)
+            return (len(found.get('positive', ())), len(found.get('negative', ())),
+                    category.first_label(message, None))
+        return classify
+
+    runs = (
+        ('substring, legacy words', substring),
+        ('compiled, legacy words', compiled_with(legacy_sentiment, legacy_category)),
+        ('compiled, current words', compiled_with(padded(DEFAULT_CLASSIFIER_VOCABULARY['sentiment']),
+                                                   padded(DEFAULT_CLASSIFIER_VOCABULARY['categories']))),
+    )
+    for name, classify in runs:
+        started = time.perf_counter()
+        for i in range(iterations):
+            classify(BENCHMARK_MESSAGES[i % len(BENCHMARK_MESSAGES)])
+        elapsed = time.perf_counter() - started
+        click.echo(f"{name:>24}: {elapsed / iterations * 1e6:7.2f} us/message")
+
+    legacy_sentiment_classifier = KeywordClassifier(LEGACY_CLASSIFIER_VOCABULARY['sentiment'])
+    legacy_category_classifier = KeywordClassifier(LEGACY_CLASSIFIER_VOCABULARY['categories'])
+
+    def labels(message, sentiment_of, category_of):
+        return f"{category_of(message)}/{sentiment_of(message)}"
+
+    def whole_word_sentiment(message):
+        found = legacy_sentiment_classifier.matches(message)
+        positive, negative = len(found.get('positive', ())), len(found.get('negative', ()))
+        return 'positive' if positive > negative else 'negative' if negative > positive else 'neutral'
+
+    def whole_word_category(message):
+        return legacy_category_classifier.first_label(message, 'general_financial_advice')
+
+    stages = (
+        ('whole-word matching', (_substring_sentiment, _substring_category),
+         (whole_word_sentiment, whole_word_category)),
+        ('vocabulary additions', (whole_word_sentiment, whole_word_category),
+         (analyze_sentiment, categorize_message)),
+    )
+    for stage, before, after in stages:
+        for message in BENCHMARK_MESSAGES:
+            old, new = labels(message, *before), labels(message, *after)
+            if old != new:
+                click.echo(f"  relabelled by {stage}: {message!r} -> {new} (was {old})")
+
+    for section, additions in vocabulary_additions().items():
+        for label, words in additions.items():
+            if words:
+                click.echo(f"  added to {section}.{label}: {', '.join(words)}")
+
+# Chat Job Queue
+class ChatJobQueue:
+    """Bounded queue of chat jobs drained by a pool of daemon worker threads
+
+    Inference calls run here instead of on the request worker, so slow model
+    responses never hold up page traffic. Threads start on first submit, which
+    keeps them out of a pre-fork master process.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._threads = []
+        self._pid = None
+        self._serving_pid = None
+        self._lock = threading.Lock()
+        self._pending = {}  # job id -> Event set when the job finishes, for long-polls
+
+    def mark_serving(self):
+        """Record that this process answers web requests and so may run chat jobs"""
+        self._serving_pid = os.getpid()
+
+    @property
+    def serving(self) -> bool:
+        """False in processes such as `flask run-jobs` whose worker threads die when the command exits"""
+        return self._serving_pid == os.getpid()
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'chat-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, job_id: str) -> bool:
+        """Queue a committed job; False when the queue is full"""
+        self._ensure_workers()
+        with self._lock:
+            self._pending[job_id] = threading.Event()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            return False
+        return True
+
+    def wait(self, job_id: str, timeout: float):
+        """Block until the job finishes here or the timeout passes
+
+        Jobs owned by another process have no local event, so this degrades
+        to a sleep and the caller re-reads the row.
+        """
+        with self._lock:
+            done = self._pending.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_queued': self.max_queued,
+            'queued': self._queue.qsize(),
+            'in_flight': len(self._pending)
+        }
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with app.app_context():
+                    process_chat_job(job_id)
+            except Exception as e:
+                print(f"Error processing chat job {job_id}: {e}")
+            finally:
+                with self._lock:
+                    done = self._pending.pop(job_id, None)
+                if done is not None:
+                    done.set()
+                self._queue.task_done()
+
+def process_chat_job(job_id: str):
+    """Answer a queued chat job and save the exchange to ChatHistory
+
+    The guarded UPDATE claims the job, so a job submitted twice (say by the
+    recovery sweep while its first worker is still alive) runs only once.
+    """
+    table = ChatJob.__table__
+    claimed = db.session.execute(table.update().where(
+        table.c.id == job_id, table.c.status == 'queued'
+    ).values(status='running', started_at=datetime.utcnow())).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return
+    job = db.session.get(ChatJob, job_id)
+    
+    try:
+        financial_context = get_financial_context(job.user_id)
+        ai_response = get_ai_advice(job.user_id, job.message, job.category, financial_context)
+        
+        chat_entry = ChatHistory(
+            user_id=job.user_id,
+            message=job.message,
+            response=ai_response,
+            message_type='user',
+            category=job.category,
+            sentiment=job.sentiment
+        )
+        db.session.add(chat_entry)
+        db.session.flush()
+        
+        job.status = 'done'
+        job.response = ai_response
+        job.context = financial_context
+        job.chat_id = chat_entry.id
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ChatJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+chat_jobs = ChatJobQueue(app.config['CHAT_WORKERS'], app.config['CHAT_QUEUE_SIZE'])
+
+# Periodic Jobs
+PeriodicJob = namedtuple('PeriodicJob', ['name', 'func', 'interval_key'])
+PERIODIC_JOBS: Dict[str, PeriodicJob] = {}
+
+def periodic_job(name: str, interval_key: str):
+    """Register a function to run every app.config[interval_key] seconds"""
+    def register(func):
+        PERIODIC_JOBS[name] = PeriodicJob(name, func, interval_key)
+        return func
+    return register
+
+def claim_job(name: str, now: datetime, force: bool = False) -> bool:
+    """Take the job's lease if it is due and nobody else holds it
+
+    The guarded UPDATE lets any number of workers race for a run while
+    exactly one of them wins it.
+    """
+    table = JobRun.__table__
+    connection = db.session.connection()
+    connection.execute(
+        _dialect_insert(connection, table).values(name=name, runs=0)
+        .on_conflict_do_nothing(index_elements=[table.c.name])
+    )
+    conditions = [table.c.name == name,
+                  db.or_(table.c.lease_until.is_(None), table.c.lease_until < now)]
+    if not force:
+        conditions.append(db.or_(table.c.next_run_at.is_(None), table.c.next_run_at <= now))
+    result = connection.execute(table.update().where(*conditions).values(
+        lease_until=now + timedelta(seconds=app.config['JOB_LEASE_SECONDS']),
+        last_started_at=now
+    ))
+    db.session.commit()
+    return result.rowcount == 1
+
+def run_periodic_job(job: PeriodicJob, force: bool = False) -> Optional[Dict]:
+    """Run one job if this worker wins its lease; None when it was not due or taken"""
+    now = datetime.utcnow()
+    if not claim_job(job.name, now, force):
+        return None
+    
+    started = time.perf_counter()
+    try:
+        result = job.func() or {}
+        status = 'ok'
+    except Exception as e:
+        print(f"Error running periodic job {job.name}: {e}")
+        db.session.rollback()
+        result = {'error': str(e)}
+        status = 'failed'
+    
+    table = JobRun.__table__
+    db.session.execute(table.update().where(table.c.name == job.name).values(
+        next_run_at=now + timedelta(seconds=app.config[job.interval_key]),
+        lease_until=None,
+        last_finished_at=datetime.utcnow(),
+        last_status=status,
+        last_result=json.dumps(result, default=str),
+        last_duration=round(time.perf_counter() - started, 3),
+        runs=table.c.runs + 1
+    ))
+    db.session.commit()
+    return {'status': status, **result}
+
+def run_due_jobs(force: bool = False) -> Dict[str, Dict]:
+    results = {}
+    for job in PERIODIC_JOBS.values():
+        result = run_periodic_job(job, force)
+        if result is not None:
+            results[job.name] = result
+    return results
+
+class JobScheduler:
+    """Daemon thread that runs due periodic jobs every JOB_SCHEDULER_TICK seconds
+
+    Started on the first request of each worker process; the database lease
+    keeps a job from running in two workers at once.
+    """
+
+    def __init__(self, tick: float):
+        self.tick = tick
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='job-scheduler', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                with app.app_context():
+                    run_due_jobs()
+            except Exception as e:
+                print(f"Error in job scheduler: {e}")
+            time.sleep(self.tick)
+
+job_scheduler = JobScheduler(app.config['JOB_SCHEDULER_TICK'])
+
+@app.cli.command('run-jobs')
+@click.option('--job', 'names', multiple=True, help='Only run these jobs (repeatable)')
+@click.option('--force', is_flag=True, help='Run even if the job is not due yet')
+@click.option('--loop', is_flag=True, help='Keep running due jobs every JOB_SCHEDULER_TICK seconds')
+def run_jobs_command(names, force, loop):
+    """Run due periodic jobs, e.g. from cron or a dedicated worker with JOB_SCHEDULER=off"""
+    unknown = set(names) - set(PERIODIC_JOBS)
+    if unknown:
+        raise click.ClickException(f"Unknown jobs: {', '.join(sorted(unknown))}")
+    jobs = [PERIODIC_JOBS[name] for name in names] if names else list(PERIODIC_JOBS.values())
+    while True:
+        for job in jobs:
+            result = run_periodic_job(job, force)
+            if result is not None:
+                click.echo(f"{job.name}: {json.dumps(result, default=str)}")
+        if not loop:
+            break
+        time.sleep(app.config['JOB_SCHEDULER_TICK'])
+
+@app.cli.command('list-jobs')
+def list_jobs_command():
+    """Show the schedule and last outcome of every periodic job"""
+    runs = {run.name: run for run in JobRun.query.all()}
+    for name in PERIODIC_JOBS:
+        run = runs.get(name)
+        if run is None:
+            click.echo(f"{name}: never run")
+        else:
+            click.echo(f"{name}: {run.last_status} at {run.last_finished_at}, next {run.next_run_at}, "
+                       f"{run.runs} runs, last {run.last_result}")
+
+# Chat Job Recovery
+@periodic_job('chat-job-recovery', 'CHAT_RECOVERY_INTERVAL')
+def recover_chat_jobs() -> Dict:
+    """Resubmit or fail chat jobs stranded by a restart or a dead worker
+
+    Queued jobs only live in the memory of the worker that accepted them.
+    Jobs still queued after CHAT_JOB_REQUEUE_AFTER are resubmitted to this
+    worker's queue, but only in a process that serves web requests. Under
+    `flask run-jobs` the command's threads would die with it, so there they
+    are left queued until a serving worker's own sweep (JOB_SCHEDULER=thread)
+    resubmits them or the timeout fails them. Jobs queued or running for
+    longer than CHAT_JOB_TIMEOUT are marked failed, so polling clients stop
+    waiting.
+    """
+    now = datetime.utcnow()
+    table = ChatJob.__table__
+    timeout_cutoff = now - timedelta(seconds=app.config['CHAT_JOB_TIMEOUT'])
+    
+    timed_out = db.session.execute(table.update().where(
+        table.c.status == 'running', table.c.started_at < timeout_cutoff
+    ).values(status='failed', error='Timed out waiting for a response', finished_at=now)).rowcount
+    expired = db.session.execute(table.update().where(
+        table.c.status == 'queued', table.c.created_at < timeout_cutoff
+    ).values(status='failed', error='No worker picked up the message in time', finished_at=now)).rowcount
+    
+    stale = db.session.execute(
+        db.select(table.c.id).where(
+            table.c.status == 'queued',
+            table.c.created_at < now - timedelta(seconds=app.config['CHAT_JOB_REQUEUE_AFTER'])
+        ).order_by(table.c.created_at).limit(app.config['CHAT_QUEUE_SIZE'])
+    ).scalars().all()
+    db.session.commit()
+    
+    requeued = sum(chat_jobs.submit(job_id) for job_id in stale) if chat_jobs.serving else 0
+    return {'timed_out': timed_out, 'expired': expired, 'requeued': requeued, 'left_queued': len(stale) - requeued}
+
+# Chat Retention
+@periodic_job('chat-compaction', 'CHAT_COMPACTION_INTERVAL')
+def compact_chat_history(retention_days: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+    """Move chat turns older than the retention window into per-user archives
+
+    Works through the expired turns oldest first, one committed batch at a
+    time. Each batch becomes one zlib-compressed chat_archive row per user.
+    The chat counters keep counting archived turns.
+    """
+    retention_days = app.config['CHAT_RETENTION_DAYS'] if retention_days is None else retention_days
+    batch_size = batch_size or app.config['CHAT_COMPACTION_BATCH']
+    if retention_days <= 0:
+        return {'archived': 0, 'archives': 0}
+    
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    table = ChatHistory.__table__
+    archived = archives = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table).where(table.c.created_at < cutoff)
+            .order_by(table.c.created_at, table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row)
+        connection = db.session.connection()
+        connection.execute(ChatArchive.__table__.insert(), [
+            {
+                'user_id': user_id,
+                'first_created_at': turns[0].created_at,
+                'last_created_at': turns[-1].created_at,
+                'message_count': len(turns),
+                'payload': zlib.compress(json.dumps([
+                    {'id': turn.id, 'message': turn.message, 'response': turn.response,
+                     'message_type': turn.message_type, 'category': turn.category,
+                     'sentiment': turn.sentiment, 'created_at': turn.created_at.isoformat()}
+                    for turn in turns
+                ]).encode(), 9),
+                'created_at': datetime.utcnow()
+            }
+            for user_id, turns in by_user.items()
+        ])
+        ids = [row.id for row in rows]
+        connection.execute(ChatJob.__table__.update().where(ChatJob.chat_id.in_(ids)).values(chat_id=None))
+        connection.execute(table.delete().where(table.c.id.in_(ids)))
+        bump_data_versions(connection, by_user, 'chat')
+        db.session.commit()
+        
+        archived += len(rows)
+        archives += len(by_user)
+    
+    # Day counters outside the recent-topics window and finished jobs are no longer read
+    window_start = (datetime.utcnow() - timedelta(days=CHAT_TOPIC_WINDOW_DAYS + 1)).date()
+    db.session.execute(ChatDailyStat.__table__.delete().where(ChatDailyStat.date < window_start))
+    db.session.execute(ChatJob.__table__.delete().where(
+        ChatJob.status.in_(['done', 'failed']), ChatJob.created_at < cutoff
+    ))
+    db.session.commit()
+    return {'archived': archived, 'archives': archives}
+
+# Benchmark Support
+@contextmanager
+def preserved_config(*keys):
+    """Restore the given app.config values on exit, however the block ends
+
+    Benchmarks run in the app's own process and may change settings for
+    their run; this keeps those changes from outliving the command.
+    """
+    saved = {key: app.config[key] for key in keys}
+    try:
+        yield
+    finally:
+        app.config.update(saved)
+
+# SQLite Tuning
+def sqlite_pragmas(config) -> List[str]:
+    return [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        'PRAGMA auto_vacuum=INCREMENTAL',  # Only takes effect on a new database or after `flask vacuum-db`
+    ]
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas(app.config):
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+@periodic_job('sqlite-maintenance', 'DB_MAINTENANCE_INTERVAL')
+def maintain_sqlite(engine=None) -> Dict:
+    """Refresh planner statistics and hand free pages back to the filesystem
+
+    ANALYZE is bounded by DB_ANALYSIS_LIMIT so it stays quick on large
+    tables; PRAGMA optimize then catches anything the sample missed.
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != 'sqlite':
+        return {'skipped': engine.dialect.name}
+    
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        connection.exec_driver_sql(f"PRAGMA analysis_limit={app.config['DB_ANALYSIS_LIMIT']}")
+        connection.exec_driver_sql('ANALYZE')
+        connection.exec_driver_sql('PRAGMA optimize')
+        analyze_seconds = round(time.perf_counter() - started, 3)
+        
+        auto_vacuum = connection.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+        free_before = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        if auto_vacuum == 2 and free_before:
+            # Each result row is one page; the statement only finishes once they are all fetched
+            connection.exec_driver_sql(f"PRAGMA incremental_vacuum({app.config['DB_VACUUM_PAGES']})").fetchall()
+        free_after = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+        connection.commit()
+    
+    return {
+        'analyze_seconds': analyze_seconds,
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, auto_vacuum),
+        'pages_freed': free_before - free_after,
+        'free_pages': free_after
+    }
+
+@app.cli.command('vacuum-db')
+def vacuum_db_command():
+    """Rebuild the SQLite file with incremental auto-vacuum enabled (takes an exclusive lock)"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('vacuum-db only applies to SQLite')
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+        mode = connection.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+        pages = connection.exec_driver_sql('PRAGMA page_count').scalar()
+    click.echo(f"Vacuumed: {pages} pages, auto_vacuum={mode}")
+
+def _contention_writer(url: str, user_id: int, writes: int, results):
+    """One benchmark process: commit transactions and chat turns as the API does"""
+    engine = db.create_engine(url)
+    locked = errors = 0
+    latencies = []
+    for i in range(writes):
+        started = time.perf_counter()
+        try:
+            with Session(engine) as session:
+                # Read-then-write, like api_transactions checking the balance before adding
+                session.execute(db.select(db.func.count()).select_from(TransactionTotal)
+                                .where(TransactionTotal.user_id == user_id)).scalar()
+                session.add(Transaction(user_id=user_id, type='expense', amount=Decimal('12.50'),
+                                        category='Food & Dining', description=f'benchmark {i}',
+                                        date=date_type.today()))
+                if i % 2:
+                    session.add(ChatHistory(user_id=user_id, message='How is my budget?', response='Fine.',
+                                            category='budget_help', sentiment='neutral'))
+                session.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except exc.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                locked += 1
+            else:
+                errors += 1
+    engine.dispose()
+    results.put({'locked': locked, 'errors': errors, 'latencies': latencies})
+
+def _contention_reader(url: str, stop, export_seconds: float):
+    """Stream the transaction table to a slow client, as the CSV export does
+
+    The read stays open for about `export_seconds`; under a rollback
+    journal that holds a shared lock which every commit has to wait out.
+    """
+    engine = db.create_engine(url)
+    while not stop.is_set():
+        try:
+            with engine.connect() as connection:
+                rows = connection.execute(db.select(Transaction.__table__)).partitions(100)
+                chunks = max(connection.execute(db.select(db.func.count()).select_from(Transaction)).scalar() // 100, 1)
+                for _ in rows:
+                    time.sleep(export_seconds / chunks)
+                    if stop.is_set():
+                        break
+        except exc.OperationalError:
+            pass
+    engine.dispose()
+
+@app.cli.command('benchmark-db-contention')
+@click.option('--processes', type=int, default=4, show_default=True)
+@click.option('--writes', type=int, default=200, show_default=True, help='Commits per process')
+@click.option('--readers', type=int, default=2, show_default=True, help='Concurrent streamed exports')
+@click.option('--export-seconds', type=float, default=6, show_default=True, help='How long each export keeps its read open')
+def benchmark_db_contention_command(processes, writes, readers, export_seconds):
+    """Compare lock errors from concurrent writer processes with the old and tuned pragmas
+
+    Runs against a throwaway database, never the configured one.
+    """
+    import tempfile
+    context = multiprocessing.get_context('fork')  # Children inherit the SQLITE_* settings of each phase
+    untuned = {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': 5000,
+               'SQLITE_MMAP_SIZE': 0, 'SQLITE_CACHE_SIZE': -2000}
+    tuned = {key: app.config[key] for key in untuned}
+    
+    with preserved_config(*untuned):
+        for label, settings in (('default pragmas', untuned), ('tuned pragmas', tuned)):
+            app.config.update(settings)
+            with tempfile.TemporaryDirectory() as directory:
+                url = f"sqlite:///{os.path.join(directory, 'contention.db')}"
+                engine = db.create_engine(url)
+                db.metadata.create_all(engine)
+                with Session(engine) as session:
+                    session.add_all([User(id=n + 1, email=f'bench{n}@example.com', name=f'Bench {n}')
+                                     for n in range(processes)])
+                    session.commit()
+                    session.execute(Transaction.__table__.insert(), [
+                        {'user_id': n % processes + 1, 'type': 'expense', 'amount': Decimal('9.99'),
+                         'category': 'Shopping', 'date': date_type.today()}
+                        for n in range(5000)
+                    ])
+                    session.commit()
+                engine.dispose()
+            
+                results = context.Queue()
+                stop = context.Event()
+                reader_processes = [context.Process(target=_contention_reader, args=(url, stop, export_seconds))
+                                    for _ in range(readers)]
+                writer_processes = [context.Process(target=_contention_writer, args=(url, n + 1, writes, results))
+                                    for n in range(processes)]
+                started = time.perf_counter()
+                for process in reader_processes + writer_processes:
+                    process.start()
+                outcomes = [results.get() for _ in writer_processes]
+                elapsed = time.perf_counter() - started
+                stop.set()
+                for process in reader_processes + writer_processes:
+                    process.join()
+        
+            latencies = sorted(latency for outcome in outcomes for latency in outcome['latencies'])
+            committed = len(latencies)
+            locked = sum(outcome['locked'] for outcome in outcomes)
+            p95 = latencies[int(committed * 0.95) - 1] if committed else 0
+            click.echo(f"{label:>16}: {committed} committed, {locked} locked, "
+                       f"{sum(outcome['errors'] for outcome in outcomes)} other errors, "
+                       f"{committed / elapsed:7.1f} commits/s, p95 {p95:.1f} ms")
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            # Return JSON for API requests; redirect to login for page requests
+            wants_json = request.path.startswith('/api') or \
+                (request.accept_mimetypes and request.accept_mimetypes.best == 'application/json')
+            if wants_json:
+                return jsonify({'error': 'Authentication required'}), 401
+            return redirect(url_for('login', next=request.path))
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Response Cache
+class MemoryCacheBackend:
+    """In-process LRU store, private to each worker"""
+    name = 'memory'
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """LRU store in an on-disk SQLite file shared by every gunicorn worker"""
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        connection = self._connect()
+        row = connection.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def set(self, key: str, value: bytes):
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, accessed) VALUES (?, ?, ?)',
+            (key, value, time.time())
+        )
+        # Trim the least recently used entries every few writes rather than on each one
+        self._writes += 1
+        if self._writes % max(1, min(64, self.max_entries // 8)) == 0:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str):
+        self._connect().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+class ResponseCache:
+    """Cache front-end counting hits and misses over a pluggable backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name if self.backend is not None else 'none',
+            'entries': len(self.backend) if self.backend is not None else 0,
+            'max_entries': self.backend.max_entries if self.backend is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def create_cache_backend(config, prefix: str = 'RESPONSE_CACHE'):
+    backend = (config.get(f'{prefix}_BACKEND') or 'none').lower()
+    max_entries = config.get(f'{prefix}_MAX_ENTRIES', 1024)
+    if backend == 'memory':
+        return MemoryCacheBackend(max_entries)
+    if backend == 'sqlite':
+        path = config.get(f'{prefix}_PATH') or os.path.join(app.instance_path, f'{prefix.lower()}.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteCacheBackend(path, max_entries)
+    return None
+
+response_cache = ResponseCache(create_cache_backend(app.config))
+
+# Chat prompt context per user, keyed on the data version
+financial_context_cache = MemoryCacheBackend(1024)
+
+def response_cache_key(user_id: int, version: int) -> str:
+    """Key for the current request: user, endpoint, query args, data version and day"""
+    args = json.dumps(sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(args.encode()).hexdigest()[:16]
+    # The day is part of the key because "this month"-style ranges move at midnight
+    return f"{user_id}:{request.endpoint}:{digest}:{version}:{datetime.now().date().isoformat()}"
+
+def cached_response(f=None, *, kind: str = 'financial'):
+    """Serve a JSON endpoint from the response cache until the user's data version changes
+
+    `kind` picks the data version the endpoint depends on; use
+    @cached_response(kind='chat') for endpoints built from chat history.
+    """
+    if f is None:
+        return lambda function: cached_response(function, kind=kind)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_id = session['user_id']
+        key = response_cache_key(user_id, request_data_version(user_id, kind))
+        cached = response_cache.get(key)
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+        
+        response = app.make_response(f(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            response_cache.set(key, response.get_data())
+        return response
+    return decorated_function
+
+# Conditional Requests
+def response_etag(user_id: int, version: int) -> str:
+    return hashlib.sha1(response_cache_key(user_id, version).encode()).hexdigest()[:20]
+
+def conditional_response(f):
+    """Answer GETs with 304 Not Modified while the user's data version is unchanged
+
+    The ETag is derived from the data version counter, so a revalidation
+    costs one primary-key lookup and never runs the endpoint's queries.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != 'GET':
+            return f(*args, **kwargs)
+        
+        user_id = session['user_id']
+        etag = response_etag(user_id, request_data_version(user_id))
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+# Advice Cache
+ADVICE_FILLER_WORDS = frozenset({'a', 'an', 'the', 'i', 'me', 'my', 'do', 'does', 'can', 'could', 'should',
+                                 'would', 'please', 'to', 'for', 'is', 'are', 'some', 'any'})
+
+class AdviceCache(ResponseCache):
+    """Response cache whose entries also expire after a fixed TTL"""
+
+    def __init__(self, backend=None, ttl: int = 3600, max_bytes: int = 8192):
+        super().__init__(backend)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key) if self.backend is not None else None
+        if value is not None:
+            expires, value = float(value[:20]), value[20:]
+            if expires < time.time():
+                self.backend.delete(key)
+                value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        if self.backend is not None and len(value) <= self.max_bytes:
+            self.backend.set(key, b'%020.3f' % (time.time() + self.ttl) + value)
+
+    def stats(self) -> Dict:
+        return {**super().stats(), 'ttl': self.ttl}
+
+advice_cache = AdviceCache(
+    create_cache_backend(app.config, 'ADVICE_CACHE'),
+    ttl=app.config['ADVICE_CACHE_TTL'],
+    max_bytes=app.config['ADVICE_CACHE_MAX_BYTES']
+)
+
+def normalize_chat_message(message: str) -> str:
+    """Lowercase, strip punctuation and filler words so rephrasings share a key"""
+    words = re.findall(r"[a-z0-9']+", message.lower())
+    return ' '.join(word for word in words if word not in ADVICE_FILLER_WORDS)
+
+def context_fingerprint(context: str) -> str:
+    """Financial context with every number reduced to one significant digit"""
+    def coarse(match):
+        return f"{float(match.group().replace(',', '')):.0e}"
+    return re.sub(r'\d[\d,]*(?:\.\d+)?', coarse, ' '.join(context.split()))
+
+def advice_cache_key(message: str, category: str, context: str) -> str:
+    raw = f"{category}|{normalize_chat_message(message)}|{context_fingerprint(context)}"
+    return 'advice:' + hashlib.sha1(raw.encode()).hexdigest()
+
+# Password Hashing
+class HashingBusy(Exception):
+    """Raised when the password hashing pool is saturated"""
+
+class PasswordHasher:
+    """Runs Werkzeug password hashing off the request thread, with admission control
+
+    PBKDF2 spends hundreds of milliseconds of CPU per call. Calls go to a
+    small executor and at most `max_pending` may be queued or running; the
+    rest fail fast with HashingBusy so a login burst cannot tie up every
+    request worker. The process executor uses spawn so children never
+    inherit the scheduler or chat worker threads, and is created on first
+    use in each process.
+    """
+
+    def __init__(self, method: str, executor: str, workers: int, max_pending: int, timeout: float):
+        self.method = method
+        self.executor_kind = executor
+        self.workers = max(workers, 1)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._method_prefix = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self.executor_kind == 'inline':
+            return None
+        with self._lock:
+            if self._pid != os.getpid():
+                if self.executor_kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            self._pid = None
+            self._executor = None
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            future = executor.submit(func, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise HashingBusy()
+            except BrokenExecutor:
+                self._reset_executor()
+                raise HashingBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash: Optional[str], password: str) -> bool:
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """True when the stored hash was made with other parameters than PASSWORD_HASH_METHOD
+
+        The expanded method string (defaults filled in) is taken from one
+        probe hash, so e.g. 'pbkdf2' compares equal to 'pbkdf2:sha256:600000'.
+        """
+        if self._method_prefix is None:
+            self._method_prefix = self.hash('probe').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+password_hasher = PasswordHasher(
+    method=app.config['PASSWORD_HASH_METHOD'],
+    executor=app.config['PASSWORD_HASH_EXECUTOR'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_QUEUE'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT']
+)
+
+# Login Throttling
+class RateLimiter:
+    """Fixed-window attempt counters, private to each worker
+
+    With several workers the effective limit is up to workers x limit,
+    which is still enough to stop a single client from hammering the
+    hashing pool.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._windows = {}  # key -> [window start, attempts]
+        self._lock = threading.Lock()
+
+    def _current(self, key, now):
+        entry = self._windows.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            if len(self._windows) >= self.max_keys:
+                self._windows = {k: v for k, v in self._windows.items() if now - v[0] < self.window}
+            entry = self._windows[key] = [now, 0]
+        return entry
+
+    def retry_after(self, key) -> Optional[int]:
+        """Seconds until `key` may try again, or None if it is under the limit"""
+        if self.limit <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            started, attempts = self._current(key, now)
+            if attempts < self.limit:
+                return None
+            return max(int(started + self.window - now) + 1, 1)
+
+    def hit(self, key):
+        if self.limit <= 0:
+            return
+        with self._lock:
+            self._current(key, time.monotonic())[1] += 1
+
+    def reset(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
+
+login_ip_limiter = RateLimiter(app.config['LOGIN_IP_LIMIT'], app.config['LOGIN_IP_WINDOW'])
+login_account_limiter = RateLimiter(app.config['LOGIN_ACCOUNT_LIMIT'], app.config['LOGIN_ACCOUNT_WINDOW'])
+
+def throttled_response(message: str, status: int, retry_after: int):
+    response = jsonify({'success': False, 'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.cli.command('benchmark-login-storm')
+@click.option('--email', default='admin@familyfinance.com', show_default=True)
+@click.option('--password', default='admin123', show_default=True)
+@click.option('--logins', type=int, default=200, show_default=True)
+@click.option('--concurrency', type=int, default=16, show_default=True)
+@click.option('--probes', type=int, default=40, show_default=True, help='Dashboard requests timed in each phase')
+@click.option('--spread-ips/--single-ip', default=True, show_default=True,
+              help='Give every login its own client address so the per-IP limit does not absorb the storm')
+def benchmark_login_storm_command(email, password, logins, concurrency, probes, spread_ips):
+    """Time /api/dashboard on its own and while a burst of logins runs alongside it"""
+    with preserved_config('JOB_SCHEDULER'):
+        app.config['JOB_SCHEDULER'] = 'off'
+        _run_login_storm(email, password, logins, concurrency, probes, spread_ips)
+
+def _run_login_storm(email, password, logins, concurrency, probes, spread_ips):
+    prober = app.test_client()
+    response = prober.post('/login', json={'email': email, 'password': password})
+    if response.status_code != 200:
+        raise click.ClickException(f"Probe login failed with HTTP {response.status_code}")
+    login_ip_limiter.reset('127.0.0.1')
+
+    def probe_dashboard():
+        timings = []
+        for _ in range(probes):
+            response_cache.clear()
+            started = time.perf_counter()
+            prober.get('/api/dashboard')
+            timings.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+        timings.sort()
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+    baseline = probe_dashboard()
+
+    statuses = {}
+    statuses_lock = threading.Lock()
+    remaining = iter(range(logins))
+    remaining_lock = threading.Lock()
+
+    def storm():
+        client = app.test_client()
+        while True:
+            with remaining_lock:
+                attempt = next(remaining, None)
+            if attempt is None:
+                return
+            address = f"10.{attempt // 65536 % 256}.{attempt // 256 % 256}.{attempt % 256}" if spread_ips else '10.0.0.1'
+            response = client.post('/login', json={'email': email, 'password': password},
+                                   environ_base={'REMOTE_ADDR': address})
+            with statuses_lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=storm, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    during = probe_dashboard()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    click.echo(f"hashing: {password_hasher.executor_kind} x{password_hasher.workers}, "
+               f"queue {password_hasher.max_pending}, method {password_hasher.method}")
+    click.echo(f"dashboard alone:       p50 {baseline[0]:7.1f} ms  p95 {baseline[1]:7.1f} ms")
+    click.echo(f"dashboard under storm: p50 {during[0]:7.1f} ms  p95 {during[1]:7.1f} ms")
+    click.echo(f"{logins} logins in {elapsed:.1f}s: "
+               + ', '.join(f"HTTP {status} x{count}" for status, count in sorted(statuses.items())))
+
+@app.before_request
+def start_background_jobs():
+    if request.endpoint == 'static':
+        return
+    chat_jobs.mark_serving()
+    if app.config['JOB_SCHEDULER'] == 'thread':
+        job_scheduler.ensure_started()
+
+# Current User
+class UserCache:
+    """Column values of recently loaded users, private to each worker
+
+    Entries expire after USER_CACHE_TTL seconds, which bounds how stale
+    another worker's copy can be after a profile change.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, values = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return values
+
+    def set(self, user_id: int, values: Dict):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+user_cache = UserCache(app.config['USER_CACHE_TTL'])
+
+def load_session_user() -> Optional[User]:
+    """The logged-in user, from this worker's cache when possible"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    
+    values = user_cache.get(user_id)
+    if values is not None:
+        # Attach a copy to this request's session without querying
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user is None:
+        session.pop('user_id', None)
+        return None
+    user_cache.set(user_id, {attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs})
+    return user
+
+class AppGlobals(_AppCtxGlobals):
+    """`g` that loads `g.user` on first access instead of in a before_request hook
+
+    Static files and API handlers that only read session['user_id'] never
+    pay for the user lookup.
+    """
+
+    def __getattr__(self, name):
+        if name == 'user':
+            self.user = load_session_user()
+            return self.user
+        return super().__getattr__(name)
+
+    def get(self, name, default=None):
+        if name == 'user':
+            return self.user
+        return super().get(name, default)
+
+app.app_ctx_globals_class = AppGlobals
+
+@app.context_processor
+def inject_user():
+    # Resolved only if the template actually renders current_user
+    return dict(current_user=LocalProxy(lambda: g.user))
+
+# Routes
+@app.route('/')
+def index():
+    # Check if user is already logged in
+    if 'user_id' in session:
+        return redirect(url_for('dashboard'))
+    
+    theme = 'dark'
+    return render_template('landing.html', theme=theme)
+
+@app.route('/test')
+def test():
+    return jsonify({'message': 'Backend is working!', 'timestamp': datetime.now().isoformat()})
+
+@app.route('/dashboard')
+@login_required
+def dashboard():
+    theme = 'dark'
+    return render_template('dashboard.html', theme=theme)
+
+@app.route('/reports')
+@login_required
+def reports():
+    theme = 'dark'
+    return render_template('reports.html', theme=theme)
+
+@app.route('/transactions')
+@login_required
+def transactions():
+    theme = 'dark'
+    return render_template('transactions.html', theme=theme)
+
+@app.route('/budgets')
+@login_required
+def budgets():
+    theme = 'dark'
+    return render_template('budgets.html', theme=theme)
+
+
+
+@app.route('/savings', methods=['GET'])
+@login_required
+def savings():
+    theme = 'dark'
+    return render_template('savings.html', theme=theme)
+
+@app.route('/family_members')
+@login_required
+def family_members():
+    theme = 'dark'
+    return render_template('family_members.html', theme=theme)
+
+@app.route('/api/family_members')
+@login_required
+def api_family_members():
+    user_id = session['user_id']
+    # For now, return all users as family members
+    # In a real application, you'd have a more complex relationship model
+    members = User.query.all()
+    return jsonify([{'id': u.id, 'name': u.name, 'email': u.email} for u in members])
+
+@app.route('/settings')
+@login_required
+def settings():
+    theme = 'dark'
+    return render_template('settings.html', theme=theme)
+
+@app.route('/profile')
+@login_required
+def profile():
+    theme = 'dark'
+    return render_template('profile.html', theme=theme)
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        try:
+            data = request.json
+            if not data:
+                return jsonify({'success': False, 'message': 'No data provided'}), 400
+            
+            email = data.get('email')
+            password = data.get('password')
+            
+            if not email or not password:
+                return jsonify({'success': False, 'message': 'Email and password are required'}), 400
+            
+            # Every attempt counts against the address; only failures count against the account
+            client_ip = request.remote_addr or 'unknown'
+            account_key = email.strip().lower()
+            retry_after = login_ip_limiter.retry_after(client_ip)
+            login_ip_limiter.hit(client_ip)
+            if retry_after is None:
+                retry_after = login_account_limiter.retry_after(account_key)
+            if retry_after is not None:
+                return throttled_response('Too many login attempts, please try again later', 429, retry_after)
+
+            # Find user by email
+            user = User.query.filter_by(email=email).first()
+            
+            try:
+                authenticated = user is not None and user.check_password(password)
+            except HashingBusy:
+                return throttled_response('The server is busy, please try again shortly', 503, 1)
+
+            if authenticated:
+                login_account_limiter.reset(account_key)
+
+                # Upgrade the stored hash when PASSWORD_HASH_METHOD has changed
+                try:
+                    if password_hasher.needs_rehash(user.password_hash):
+                        user.set_password(password)
+                except HashingBusy:
+                    pass  # Retried on a later login
+
+                # Update last login
+                user.last_login = datetime.utcnow()
+                db.session.commit()
+                user_cache.invalidate(user.id)
+                
+                # Set session
+                session['user_id'] = user.id
+                session.permanent = True  # Make session persistent
+                
+                print(f"User {user.email} logged in successfully. Session: {session}")
+                
+                return jsonify({
+                    'success': True, 
+                    'message': 'Login successful',
+                    'user': {
+                        'id': user.id,
+                        'name': user.name,
+                        'email': user.email
+                    }
+                })
+            else:
+                login_account_limiter.hit(account_key)
+                print(f"Login failed for email: {email}")
+                return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
                 
         except Exception as e:
             print(f"Login error: {str(e)}")
@@ -823,7 +3726,10 @@ def signup():
             
             # Create new user
             user = User(email=email, name=name)
-            user.set_password(password)
+            try:
+                user.set_password(password)
+            except HashingBusy:
+                return throttled_response('The server is busy, please try again shortly', 503, 1)
             
             try:
                 db.session.add(user)
@@ -872,7 +3778,7 @@ def signup():
 def check_auth():
     try:
         if 'user_id' in session:
-            user = User.query.get(session['user_id'])
+            user = g.user
             if user:
                 return jsonify({
                     'authenticated': True,
@@ -893,7 +3799,7 @@ def check_auth():
 @login_required
 def get_current_user():
     try:
-        user = User.query.get(session['user_id'])
+        user = g.user
         if user:
             return jsonify({
                 'success': True,
@@ -919,111 +3825,1088 @@ def logout():
 
 @app.route('/api/dashboard')
 @login_required
+@conditional_response
+@cached_response
 def get_dashboard_data():
     user_id = session['user_id']
     
-    try:
-        # Calculate current month totals
-        now = datetime.now()
-        start_of_month = now.replace(day=1).date()
-        
-        # Total balance (simplified calculation)
-        income_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income'
-        ).scalar() or 0
-        
-        expense_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense'
-        ).scalar() or 0
-        
-        # Monthly income
-        monthly_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income',
-            Transaction.date >= start_of_month
-        ).scalar() or 0
+    try:
+        # Calculate current month totals
+        now = datetime.now()
+        start_of_month = now.replace(day=1).date()
+        
+        # Total balance (simplified calculation)
+        income_total = rollup_sum(user_id, 'income')
+        expense_total = rollup_sum(user_id, 'expense')
+        
+        # Monthly income
+        monthly_income = rollup_sum(user_id, 'income', start_of_month)
+        
+        # Monthly expenses
+        monthly_expenses = rollup_sum(user_id, 'expense', start_of_month)
+        
+        # Savings goals total
+        savings_total = db.session.query(db.func.sum(SavingsGoal.current_amount)).filter(
+            SavingsGoal.user_id == user_id
+        ).scalar() or 0
+        
+        return jsonify({
+            'totalBalance': float(income_total - expense_total),
+            'monthlyIncome': float(monthly_income),
+            'monthlyExpenses': float(monthly_expenses),
+            'savingsGoal': float(savings_total)
+        })
+    except Exception as e:
+        return jsonify({'error': 'Failed to load dashboard data'}), 500
+
+@app.route('/api/dashboard/total-balance', methods=['POST'])
+@login_required
+def set_total_balance():
+    """Adjust total balance by creating an automatic adjustment transaction"""
+    user_id = session['user_id']
+    data = request.json or {}
+    try:
+        desired = Decimal(str(data.get('total_balance', '0')))
+        income_total = rollup_sum(user_id, 'income')
+        expense_total = rollup_sum(user_id, 'expense')
+        current = Decimal(str(income_total)) - Decimal(str(expense_total))
+        delta = desired - current
+        if abs(delta) < Decimal('0.005'):
+            return jsonify({'success': True, 'message': 'No change needed', 'totalBalance': float(current)})
+        adj_type = 'income' if delta > 0 else 'expense'
+        adj_amount = abs(delta)
+        adjustment = Transaction(
+            user_id=user_id,
+            type=adj_type,
+            amount=adj_amount,
+            category='adjustment',
+            description='Balance adjustment',
+            date=datetime.now().date()
+        )
+        db.session.add(adjustment)
+        db.session.commit()
+        new_balance = float(desired)
+        return jsonify({'success': True, 'message': 'Balance updated', 'totalBalance': new_balance})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Failed to update balance'}), 400
+
+@app.route('/api/notifications')
+@login_required
+def api_notifications():
+    user_id = session['user_id']
+    notes = Notification.query.filter_by(user_id=user_id).order_by(Notification.created_at.desc()).limit(20).all()
+    payload = []
+    for n in notes:
+        payload.append({
+            'id': n.id,
+            'title': n.title,
+            'message': n.message,
+            'type': n.type,
+            'priority': n.priority,
+            'is_read': n.is_read,
+            'created_at': n.created_at.isoformat()
+        })
+    return jsonify(payload)
+
+@app.route('/api/notifications/dispatch')
+@login_required
+def api_notification_dispatch_stats():
+    """Backlog, delivery lag and last dispatcher run, for operators"""
+    if not g.user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    last_run = db.session.get(JobRun, 'notification-dispatch')
+    return jsonify({
+        'success': True,
+        'backlog': notification_backlog(),
+        'lag': notification_lag.stats(),
+        'last_run': json.loads(last_run.last_result) if last_run and last_run.last_result else None,
+        'last_run_at': last_run.last_finished_at.isoformat() if last_run and last_run.last_finished_at else None
+    })
+
+# Transaction Listing
+TRANSACTION_PAGE_SIZE = 20
+TRANSACTION_MAX_PAGE_SIZE = 100
+
+def encode_transaction_cursor(transaction) -> str:
+    """Opaque cursor pointing just past a transaction in (date, created_at, id) order"""
+    position = [transaction.date.isoformat(), transaction.created_at.isoformat(), transaction.id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_transaction_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, created_at, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (
+            datetime.strptime(day, '%Y-%m-%d').date(),
+            datetime.fromisoformat(created_at),
+            int(transaction_id)
+        )
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+
+def filter_transactions(query, args):
+    """Apply the listing filters from request args to a Transaction query"""
+    if args.get('start_date'):
+        query = query.filter(Transaction.date >= datetime.strptime(args['start_date'], '%Y-%m-%d').date())
+    if args.get('end_date'):
+        query = query.filter(Transaction.date <= datetime.strptime(args['end_date'], '%Y-%m-%d').date())
+    if args.get('type'):
+        query = query.filter(Transaction.type == args['type'])
+    if args.get('category'):
+        query = query.filter(Transaction.category == args['category'])
+    if args.get('payment_method'):
+        query = query.filter(Transaction.payment_method == args['payment_method'])
+    if args.get('min_amount'):
+        query = query.filter(Transaction.amount >= Decimal(args['min_amount']))
+    if args.get('max_amount'):
+        query = query.filter(Transaction.amount <= Decimal(args['max_amount']))
+    return query
+
+def list_transactions(user_id: int, args) -> tuple:
+    """One page of a user's transactions, newest first, and the cursor for the next page
+
+    Paging seeks past the last row seen instead of using OFFSET, so page
+    500 costs the same index range read as page 1.
+    """
+    limit = min(max(int(args.get('limit', TRANSACTION_PAGE_SIZE)), 1), TRANSACTION_MAX_PAGE_SIZE)
+    query = filter_transactions(Transaction.query.filter_by(user_id=user_id), args)
+
+    if args.get('cursor'):
+        position = decode_transaction_cursor(args['cursor'])
+        query = query.filter(
+            db.tuple_(Transaction.date, Transaction.created_at, Transaction.id) < db.tuple_(*position)
+        )
+
+    rows = query.order_by(
+        Transaction.date.desc(), Transaction.created_at.desc(), Transaction.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = encode_transaction_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+# Transaction Import
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_FORMATS = ('csv', 'ofx')
+IMPORT_TYPES = ('income', 'expense', 'transfer')
+OFX_FIELDS = {'TRNTYPE', 'DTPOSTED', 'TRNAMT', 'FITID', 'NAME', 'MEMO', 'CHECKNUM'}
+
+def parse_csv_transactions(stream):
+    """Yield (line number, row) pairs from a CSV upload without buffering the file
+
+    Recognised columns: date, amount, type, category, subcategory,
+    description, payment_method, reference_number, notes.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = [name.strip().lower() for name in next(reader, [])]
+    for values in reader:
+        if values:
+            yield reader.line_num, dict(zip(header, values))
+
+def parse_ofx_transactions(stream):
+    """Yield (line number, row) pairs for each STMTTRN block of an OFX statement
+
+    Handles both SGML (unclosed leaf tags) and XML OFX, one line at a time.
+    """
+    current = None
+    start_line = 0
+    for line_num, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8', errors='replace'), 1):
+        for closing, tag, value in re.findall(r'<(/?)([A-Za-z0-9.]+)>([^<]*)', line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield start_line, {
+                        'date': current.get('DTPOSTED', '')[:8],
+                        'amount': current.get('TRNAMT', ''),
+                        'description': current.get('NAME') or current.get('MEMO', ''),
+                        'notes': current.get('MEMO', ''),
+                        'reference_number': current.get('FITID', ''),
+                        'payment_method': 'check' if current.get('CHECKNUM') else '',
+                        'category': '',
+                        'type': ''
+                    }
+                    current = None
+                elif not closing:
+                    current, start_line = {}, line_num
+            elif current is not None and not closing and tag in OFX_FIELDS:
+                current[tag] = value.strip()
+
+IMPORT_COLUMNS = ('user_id', 'type', 'amount', 'category', 'subcategory', 'description', 'date',
+                  'payment_method', 'reference_number', 'is_recurring', 'notes', 'is_verified',
+                  'created_at', 'updated_at')
+ImportRow = namedtuple('ImportRow', IMPORT_COLUMNS)
+
+def _parse_import_date(raw: str) -> str:
+    """ISO date string for YYYY-MM-DD, YYYYMMDD or ISO datetime input"""
+    raw = raw.strip()
+    if len(raw) >= 8 and raw[:8].isdigit():
+        raw = f"{raw[:4]}-{raw[4:6]}-{raw[6:8]}"
+    return date_type.fromisoformat(raw[:10]).isoformat()
+
+def normalize_import_row(row: Dict, user_id: int, now: str) -> ImportRow:
+    """Turn a parsed row into insert-ready column values, raising ValueError if invalid
+
+    Values are already in storage form (ISO date strings, and float amounts
+    as the Numeric columns are stored on SQLite) so batches can go straight
+    to the driver's executemany.
+    """
+    raw_date = row.get('date') or ''
+    if not raw_date.strip():
+        raise ValueError('date is required')
+    try:
+        day = _parse_import_date(raw_date)
+    except ValueError:
+        raise ValueError(f"invalid date '{raw_date}'")
+
+    raw_amount = row.get('amount') or ''
+    try:
+        amount = float(raw_amount.replace(',', '').replace('$', ''))
+    except ValueError:
+        raise ValueError(f"invalid amount '{raw_amount}'")
+    if amount != amount or amount in (float('inf'), float('-inf')):
+        raise ValueError(f"invalid amount '{raw_amount}'")
+
+    # Signed amounts (bank exports, OFX) decide the type when none is given
+    txn_type = (row.get('type') or '').strip().lower() or ('expense' if amount < 0 else 'income')
+    if txn_type not in IMPORT_TYPES:
+        raise ValueError(f"invalid type '{row.get('type')}', expected one of {', '.join(IMPORT_TYPES)}")
+    category = (row.get('category') or '').strip().lower()
+    return ImportRow(
+        user_id,
+        txn_type,
+        round(abs(amount), 2),
+        category[:50] or 'uncategorized',
+        row.get('subcategory') or None,
+        (row.get('description') or '')[:500],
+        day,
+        row.get('payment_method') or None,
+        (row.get('reference_number') or '').strip() or None,
+        False,
+        row.get('notes') or None,
+        False,
+        now,
+        now
+    )
+
+def executemany_rows(connection, table, columns, rows: List[tuple]):
+    """INSERT storage-ready tuples through the driver's executemany
+
+    Skips SQLAlchemy's per-row parameter processing, which otherwise
+    dominates bulk insert time on SQLite.
+    """
+    compiled = table.insert().compile(dialect=connection.dialect, column_keys=list(columns))
+    if not compiled.positional:
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+        return
+    order = [columns.index(key) for key in compiled.positiontup]
+    if order != list(range(len(columns))):
+        rows = [tuple(row[i] for i in order) for row in rows]
+    connection.exec_driver_sql(str(compiled), rows)
+
+def existing_references(user_id: int, references: set) -> List[str]:
+    """Reference numbers from `references` the user already has transactions for"""
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        # One JSON parameter instead of thousands of expanded IN binds
+        rows = connection.exec_driver_sql(
+            'SELECT reference_number FROM "transaction" WHERE user_id = ? '
+            'AND reference_number IN (SELECT value FROM json_each(?))',
+            (user_id, json.dumps(list(references)))
+        )
+    else:
+        rows = connection.execute(db.select(Transaction.reference_number).where(
+            Transaction.user_id == user_id,
+            Transaction.reference_number.in_(references)
+        ))
+    return [reference for (reference,) in rows]
+
+def _insert_import_batch(user_id: int, batch: List[ImportRow]) -> int:
+    """Insert one batch in a single executemany, skipping known references
+
+    Earlier batches are already committed, so checking the batch's references
+    against the table also covers repeats from earlier in the file.
+    """
+    references = {row.reference_number for row in batch if row.reference_number}
+    seen_references = set(existing_references(user_id, references)) if references else set()
+
+    rows = []
+    totals = {}
+    for row in batch:
+        if row.reference_number:
+            if row.reference_number in seen_references:
+                continue
+            seen_references.add(row.reference_number)
+        rows.append(row)
+        entry = totals.setdefault((row.date, row.type, row.category), [0, 0])
+        entry[0] += row.amount
+        entry[1] += 1
+
+    if rows:
+        connection = db.session.connection()
+        executemany_rows(connection, Transaction.__table__, IMPORT_COLUMNS, rows)
+        deltas = {}
+        for (day, txn_type, category), (amount, count) in totals.items():
+            add_rollup_delta(deltas, user_id, date_type.fromisoformat(day), txn_type, category,
+                             round(Decimal(amount), 2), count)
+        apply_rollup_deltas(connection, deltas)
+        bump_data_versions(connection, [user_id])
+    db.session.commit()
+    return len(rows)
+
+def import_transactions(user_id: int, stream, file_format: str = 'csv',
+                        batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Stream-parse an upload and bulk insert its rows in batches
+
+    Rows whose reference_number already exists for the user (or earlier in
+    the same file) are skipped as duplicates. Each batch commits on its own,
+    so a failure part-way keeps everything imported before it.
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    parser = parse_csv_transactions if file_format == 'csv' else parse_ofx_transactions
+
+    started = time.perf_counter()
+    now = datetime.utcnow().isoformat(sep=' ')
+    summary = {'rows': 0, 'imported': 0, 'duplicates': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        inserted = _insert_import_batch(user_id, batch)
+        summary['imported'] += inserted
+        summary['duplicates'] += len(batch) - inserted
+        batch.clear()
+
+    try:
+        for line_num, row in parser(stream):
+            summary['rows'] += 1
+            try:
+                batch.append(normalize_import_row(row, user_id, now))
+            except ValueError as e:
+                summary['failed'] += 1
+                if len(summary['errors']) < IMPORT_MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'line': line_num, 'error': str(e)})
+                continue
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    summary['seconds'] = round(elapsed, 3)
+    summary['rows_per_second'] = int(summary['rows'] / elapsed) if elapsed > 0 else summary['rows']
+    return summary
+
+def detect_import_format(filename: str, requested: Optional[str] = None) -> str:
+    if requested:
+        return requested.lower()
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return 'ofx' if extension in ('ofx', 'qfx') else 'csv'
+
+@app.cli.command('import-transactions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Owner of the imported transactions')
+@click.option('--format', 'file_format', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='File format (defaults to the file extension)')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+def import_transactions_command(path, user_id, file_format, batch_size):
+    """Bulk import transactions from a CSV or OFX file"""
+    with open(path, 'rb') as stream:
+        summary = import_transactions(user_id, stream, detect_import_format(path, file_format), batch_size)
+    for error in summary['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"Imported {summary['imported']} of {summary['rows']} rows "
+        f"({summary['duplicates']} duplicates, {summary['failed']} failed) "
+        f"in {summary['seconds']}s, {summary['rows_per_second']} rows/sec"
+    )
+
+# Transaction Export
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_COLUMNS = ('id', 'date', 'type', 'amount', 'category', 'subcategory', 'description',
+                  'payment_method', 'reference_number', 'notes', 'created_at')
+EXPORT_FETCH_SIZE = 1000
+EXPORT_CHUNK_ROWS = 500
+
+def _export_value(value):
+    if isinstance(value, (datetime, date_type)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def export_transactions(user_id: int, args, file_format: str = 'csv'):
+    """Generate a user's transactions as CSV or NDJSON text chunks
+
+    Rows are read through a streaming cursor EXPORT_FETCH_SIZE at a time as
+    plain tuples (no ORM identity map), so memory stays flat however long
+    the history is.
+    """
+    columns = [getattr(Transaction, name) for name in EXPORT_COLUMNS]
+    statement = filter_transactions(
+        db.select(*columns).where(Transaction.user_id == user_id), args
+    ).order_by(Transaction.date, Transaction.id).execution_options(yield_per=EXPORT_FETCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    pending = 0
+    for row in db.session.execute(statement):
+        values = [_export_value(value) for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))) + '\n')
+        pending += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Recurring Transactions
+RECURRING_FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+
+def next_occurrence(day, frequency: str, anchor_day: int):
+    """Due date after `day`; monthly and yearly rules keep the start date's day of month
+
+    A rule started on the 31st posts on the last day of shorter months and
+    returns to the 31st when the month allows it.
+    """
+    if frequency == 'daily':
+        return day + timedelta(days=1)
+    if frequency == 'weekly':
+        return day + timedelta(days=7)
+    if frequency == 'monthly':
+        first = shift_month_start(day, 1)
+    elif frequency == 'yearly':
+        first = day.replace(year=day.year + 1, day=1)
+    else:
+        raise ValueError(f"frequency must be one of {', '.join(RECURRING_FREQUENCIES)}")
+    return first.replace(day=min(anchor_day, calendar.monthrange(first.year, first.month)[1]))
+
+def due_occurrences(rule, through, limit: int):
+    """Due dates of `rule` up to `through` (at most `limit`) and the next due date after them"""
+    last_day = min(through, rule.end_date) if rule.end_date else through
+    dates = []
+    due = rule.next_due_date
+    while due <= last_day and len(dates) < limit:
+        dates.append(due)
+        due = next_occurrence(due, rule.frequency, rule.start_date.day)
+    return dates, due
+
+RECURRING_POST_COLUMNS = ('user_id', 'type', 'amount', 'category', 'subcategory', 'description', 'date',
+                          'payment_method', 'is_recurring', 'recurring_id', 'is_verified', 'created_at', 'updated_at')
+
+def _materialize_recurring_batch(connection, rules, through, limit: int) -> Dict:
+    """Post every due occurrence of `rules` and move their next_due_date forward
+
+    Occurrences an earlier run already posted are skipped up front; a
+    concurrent post of the same one trips the unique (recurring_id, date)
+    index and rolls the batch back rather than posting it twice.
+    """
+    occurrences = {}
+    advances = []
+    invalid = 0
+    for rule in rules:
+        try:
+            dates, next_due = due_occurrences(rule, through, limit)
+        except ValueError:
+            invalid += 1
+            continue
+        if dates:
+            occurrences[rule.id] = dates
+        advances.append({
+            'rule_id': rule.id, 'seen_due': rule.next_due_date, 'next_due_date': next_due,
+            'is_active': rule.end_date is None or next_due <= rule.end_date
+        })
+    
+    posted = set()
+    if occurrences:
+        posted = set(connection.execute(
+            db.select(Transaction.recurring_id, Transaction.date)
+            .where(Transaction.recurring_id.in_(list(occurrences)),
+                   Transaction.date >= min(dates[0] for dates in occurrences.values()))
+        ).all())
+    
+    now = datetime.utcnow().isoformat(sep=' ')
+    rows = []
+    deltas = {}
+    for rule in rules:
+        for day in occurrences.get(rule.id, ()):
+            if (rule.id, day) in posted:
+                continue
+            # Storage form, as for imports, so the batch goes straight to the driver
+            rows.append((rule.user_id, rule.type, float(rule.amount), rule.category, rule.subcategory,
+                         rule.description or rule.name, day.isoformat(), rule.payment_method, True,
+                         rule.id, False, now, now))
+            add_rollup_delta(deltas, rule.user_id, day, rule.type, rule.category, rule.amount, 1)
+    if rows:
+        executemany_rows(connection, Transaction.__table__, RECURRING_POST_COLUMNS, rows)
+        apply_rollup_deltas(connection, deltas)
+    
+    if advances:
+        # Skip rules whose schedule was edited since they were read; the next pass sees the new one
+        table = RecurringTransaction.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('rule_id'), table.c.next_due_date == db.bindparam('seen_due'))
+            .values(next_due_date=db.bindparam('next_due_date'), is_active=db.bindparam('is_active'),
+                    updated_at=datetime.utcnow()),
+            advances
+        )
+    bump_data_versions(connection, [rule.user_id for rule in rules])
+    return {'posted': len(rows), 'duplicates': sum(map(len, occurrences.values())) - len(rows), 'invalid': invalid}
+
+@periodic_job('recurring-transactions', 'RECURRING_INTERVAL')
+def materialize_recurring_transactions(through=None, batch_size: Optional[int] = None,
+                                       session=None) -> Dict:
+    """Turn every due recurring rule into Transaction rows in one keyset pass
+
+    Rules are read in (next_due_date, id) order through
+    ix_recurring_transaction_due and each batch commits on its own, so a
+    million rules never sit in memory at once. Missed periods after
+    downtime are posted RECURRING_MAX_CATCHUP per rule at a time; a rule
+    with more to post sorts after the cursor again, so the same pass
+    returns to it.
+    """
+    session = session or db.session
+    through = through or date_type.today()
+    batch_size = batch_size or app.config['RECURRING_BATCH']
+    limit = app.config['RECURRING_MAX_CATCHUP']
+    table = RecurringTransaction.__table__
+    columns = [table.c.id, table.c.user_id, table.c.name, table.c.type, table.c.amount, table.c.category,
+               table.c.subcategory, table.c.description, table.c.frequency, table.c.start_date,
+               table.c.end_date, table.c.next_due_date, table.c.payment_method]
+    
+    summary = {'rules': 0, 'posted': 0, 'duplicates': 0, 'invalid': 0}
+    cursor = None
+    started = time.perf_counter()
+    while True:
+        query = (db.select(*columns)
+                 .where(table.c.is_active == True, table.c.next_due_date <= through)
+                 .order_by(table.c.next_due_date, table.c.id).limit(batch_size))
+        if cursor:
+            query = query.where(db.tuple_(table.c.next_due_date, table.c.id) > db.tuple_(*cursor))
+        connection = session.connection()
+        rules = connection.execute(query).all()
+        if not rules:
+            session.commit()
+            break
+        cursor = (rules[-1].next_due_date, rules[-1].id)
+        
+        result = _materialize_recurring_batch(connection, rules, through, limit)
+        session.commit()
+        summary['rules'] += len(rules)
+        for key in ('posted', 'duplicates', 'invalid'):
+            summary[key] += result[key]
+    
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+@app.cli.command('benchmark-recurring')
+@click.option('--rules', type=int, default=100000, show_default=True)
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--days-behind', type=int, default=3, show_default=True, help='Downtime to catch up on')
+def benchmark_recurring_command(rules, users, days_behind):
+    """Time one materialization pass over many due rules in a throwaway database"""
+    import tempfile
+    frequencies = ('daily', 'weekly', 'monthly', 'yearly')
+    today = date_type.today()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = db.create_engine(f"sqlite:///{os.path.join(directory, 'recurring.db')}")
+        db.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.execute(User.__table__.insert(), [
+                {'id': n + 1, 'email': f'bench{n}@example.com', 'name': f'Bench {n}'} for n in range(users)
+            ])
+            now = datetime.utcnow()
+            for offset in range(0, rules, 50000):
+                session.execute(RecurringTransaction.__table__.insert(), [
+                    {'user_id': n % users + 1, 'name': f'Rule {n}', 'type': 'expense', 'amount': Decimal('19.99'),
+                     'category': 'Bills & Utilities', 'frequency': frequencies[n % 4],
+                     'start_date': today - timedelta(days=days_behind + n % 28),
+                     'next_due_date': today - timedelta(days=days_behind), 'is_active': True,
+                     'created_at': now, 'updated_at': now}
+                    for n in range(offset, min(offset + 50000, rules))
+                ])
+            session.commit()
+            
+            first = materialize_recurring_transactions(through=today, session=session)
+            second = materialize_recurring_transactions(through=today, session=session)
+            posted = session.execute(db.select(db.func.count()).select_from(Transaction)).scalar()
+            rolled_up = session.execute(db.select(db.func.sum(TransactionRollup.count))).scalar()
+        engine.dispose()
+    
+    click.echo(f"first pass:  {first['rules']} rules, {first['posted']} posted in {first['seconds']}s "
+               f"({first['rules'] / max(first['seconds'], 1e-9):,.0f} rules/s)")
+    click.echo(f"second pass: {second['rules']} rules due, {second['posted']} posted")
+    click.echo(f"transactions: {posted}, rollup count: {rolled_up}")
+
+# Savings Auto-save
+AUTO_SAVE_CATEGORY = 'Savings'
+
+def auto_save_cutoffs(now: datetime) -> Dict[str, datetime]:
+    """Per frequency, the moment a goal's last auto-save must be before for it to be due again
+
+    Cutoffs fall on midnight, so a goal saved at 09:00 is due again at the
+    first pass of the next day, week or month rather than drifting later
+    by one scheduler interval each time.
+    """
+    today = now.date()
+    month_ago = shift_month_start(today, -1)
+    month_ago = month_ago.replace(day=min(today.day, calendar.monthrange(month_ago.year, month_ago.month)[1]))
+    return {
+        'daily': datetime.combine(today, datetime.min.time()),
+        'weekly': datetime.combine(today - timedelta(days=6), datetime.min.time()),
+        'monthly': datetime.combine(month_ago + timedelta(days=1), datetime.min.time()),
+    }
+
+def auto_save_due_clause(now: datetime):
+    """Goals that should receive an auto-save contribution at `now`
+
+    Two OR branches per frequency (never saved, saved before the cutoff),
+    each a seek or range on ix_savings_goal_auto_save_due.
+    Goals that are inactive, already funded or have no amount set are never
+    due, so every goal this selects can be processed.
+    """
+    table = SavingsGoal.__table__
+    return db.and_(
+        db.or_(*[
+            db.and_(table.c.auto_save == True, table.c.auto_save_frequency == frequency, last_saved)
+            for frequency, cutoff in auto_save_cutoffs(now).items()
+            for last_saved in (table.c.last_auto_save.is_(None), table.c.last_auto_save < cutoff)
+        ]),
+        table.c.is_active == True,
+        table.c.auto_save_amount > 0,
+        db.func.coalesce(table.c.current_amount, 0) < table.c.target_amount
+    )
+
+def _apply_auto_save_batch(connection, goal_ids: List[int], now: datetime) -> List:
+    """Claim the still-due goals among `goal_ids` and add their contributions
+
+    The claim re-checks the due condition, so when two workers pick the
+    same goals only one UPDATE matches each row.
+    """
+    table = SavingsGoal.__table__
+    claimed = connection.execute(
+        table.update()
+        .where(table.c.id.in_(goal_ids), auto_save_due_clause(now))
+        .values(last_auto_save=now, updated_at=now)
+        .returning(table.c.id, table.c.user_id, table.c.name, table.c.auto_save_amount,
+                   table.c.current_amount, table.c.target_amount)
+    ).all()
+    if not claimed:
+        return []
+    
+    current = db.func.coalesce(table.c.current_amount, 0)
+    remaining = table.c.target_amount - current
+    connection.execute(
+        table.update()
+        .where(table.c.id.in_([goal.id for goal in claimed]))
+        .values(current_amount=current + db.case((remaining < table.c.auto_save_amount, remaining),
+                                                 else_=table.c.auto_save_amount))
+    )
+    return claimed
+
+@periodic_job('savings-auto-save', 'AUTO_SAVE_INTERVAL')
+def run_savings_auto_save(now: Optional[datetime] = None, batch_size: Optional[int] = None) -> Dict:
+    """Move each due goal's auto_save_amount into it and record a transfer transaction
+
+    Every batch claims, credits and records its goals in one commit, so an
+    interrupted run leaves the rest due for the next one.
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or app.config['AUTO_SAVE_BATCH']
+    table = SavingsGoal.__table__
+    summary = {'goals': 0, 'saved': Decimal('0'), 'skipped': 0}
+    
+    while True:
+        connection = db.session.connection()
+        goal_ids = connection.execute(
+            db.select(table.c.id).where(auto_save_due_clause(now)).limit(batch_size)
+        ).scalars().all()
+        if not goal_ids:
+            break
+        
+        claimed = _apply_auto_save_batch(connection, goal_ids, now)
+        stamp = now.isoformat(sep=' ')
+        rows = []
+        deltas = {}
+        for goal in claimed:
+            amount = min(Decimal(str(goal.auto_save_amount)),
+                         Decimal(str(goal.target_amount)) - Decimal(str(goal.current_amount or 0)))
+            rows.append(ImportRow(
+                user_id=goal.user_id, type='transfer', amount=float(amount), category=AUTO_SAVE_CATEGORY,
+                subcategory=None, description=f"Auto-save to {goal.name}", date=now.date().isoformat(),
+                payment_method=None, reference_number=None, is_recurring=False, notes=None,
+                is_verified=False, created_at=stamp, updated_at=stamp
+            ))
+            add_rollup_delta(deltas, goal.user_id, now.date(), 'transfer', AUTO_SAVE_CATEGORY, amount, 1)
+            summary['saved'] += amount
+        if rows:
+            executemany_rows(connection, Transaction.__table__, IMPORT_COLUMNS, rows)
+            apply_rollup_deltas(connection, deltas)
+            bump_data_versions(connection, [goal.user_id for goal in claimed])
+        db.session.commit()
+        
+        summary['goals'] += len(claimed)
+        summary['skipped'] += len(goal_ids) - len(claimed)
+        if not claimed:
+            break  # Another worker took all of them; it will finish the rest
+    
+    summary['saved'] = float(summary['saved'])
+    return summary
+
+# Notification Dispatch
+NOTIFICATION_CHANNELS = {'email': 'email_notifications', 'sms': 'sms_notifications', 'push': 'push_notifications'}
+NOTIFICATION_CHANNEL_DEFAULTS = {'email': True, 'sms': False, 'push': True}  # Users without a preference row
+NotificationGroup = namedtuple('NotificationGroup', ['channel', 'user_id', 'email', 'name', 'phone', 'notifications'])
+
+class NotificationTransport:
+    """Delivers notification groups for one channel
+
+    `deliver` receives every group of a claimed batch at once, so a
+    transport can reuse one connection, and returns the groups it could
+    not deliver.
+    """
+    name = 'base'
+
+    def deliver(self, groups: List[NotificationGroup]) -> List[NotificationGroup]:
+        raise NotImplementedError
+
+class LogTransport(NotificationTransport):
+    name = 'log'
+
+    def deliver(self, groups):
+        for group in groups:
+            titles = '; '.join(notification.title for notification in group.notifications)
+            print(f"[{group.channel}] user {group.user_id}: {titles}")
+        return []
+
+class FileTransport(NotificationTransport):
+    """Appends one JSON line per group to an outbox file; a stand-in for real delivery"""
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, groups):
+        lines = ''.join(json.dumps({
+            'channel': group.channel,
+            'user_id': group.user_id,
+            'to': group.phone if group.channel == 'sms' else group.email,
+            'notifications': [{'id': n.id, 'title': n.title, 'message': n.message, 'type': n.type}
+                              for n in group.notifications]
+        }) + '\n' for group in groups)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock, open(self.path, 'a') as outbox:
+            outbox.write(lines)
+        return []
+
+class SmtpTransport(NotificationTransport):
+    """One email per user per batch, all sent over a single SMTP connection"""
+    name = 'smtp'
+
+    def __init__(self, host: str, port: int, sender: str, username: Optional[str] = None,
+                 password: Optional[str] = None, starttls: bool = False, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _message(self, group: NotificationGroup) -> EmailMessage:
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = group.email
+        if len(group.notifications) == 1:
+            message['Subject'] = group.notifications[0].title
+        else:
+            message['Subject'] = f"{len(group.notifications)} new notifications"
+        message.set_content('\n\n'.join(f"{n.title}\n{n.message}" for n in group.notifications))
+        return message
+
+    def deliver(self, groups):
+        try:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except OSError as e:
+            print(f"SMTP connection to {self.host}:{self.port} failed: {e}")
+            return list(groups)
+        failed = []
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+            for index, group in enumerate(groups):
+                try:
+                    smtp.send_message(self._message(group))
+                except smtplib.SMTPServerDisconnected:
+                    failed.extend(groups[index:])
+                    break
+                except smtplib.SMTPException as e:
+                    print(f"SMTP delivery to user {group.user_id} failed: {e}")
+                    failed.append(group)
+        except (OSError, smtplib.SMTPException) as e:
+            print(f"SMTP session with {self.host}:{self.port} failed: {e}")
+            return list(groups)
+        finally:
+            try:
+                smtp.quit()
+            except (OSError, smtplib.SMTPException):
+                pass
+        return failed
+
+NOTIFICATION_TRANSPORT_FACTORIES = {
+    'log': lambda config: LogTransport(),
+    'file': lambda config: FileTransport(config['NOTIFICATION_OUTBOX_PATH']
+                                         or os.path.join(app.instance_path, 'notification_outbox.ndjson')),
+    'smtp': lambda config: SmtpTransport(config['SMTP_HOST'], config['SMTP_PORT'], config['SMTP_SENDER'],
+                                         config['SMTP_USERNAME'], config['SMTP_PASSWORD'], config['SMTP_STARTTLS']),
+}
+
+def register_notification_transport(name: str, factory):
+    """Make a transport available to NOTIFICATION_TRANSPORTS; `factory` takes app.config"""
+    NOTIFICATION_TRANSPORT_FACTORIES[name] = factory
+    notification_transports.cache_clear()
+
+@lru_cache(maxsize=None)
+def notification_transports() -> Dict[str, NotificationTransport]:
+    """Transport per channel, built from NOTIFICATION_TRANSPORTS such as 'email=smtp,sms=log'"""
+    transports = {}
+    for pair in app.config['NOTIFICATION_TRANSPORTS'].split(','):
+        if not pair.strip():
+            continue
+        channel, _, name = pair.partition('=')
+        channel, name = channel.strip(), name.strip()
+        if channel not in NOTIFICATION_CHANNELS or name not in NOTIFICATION_TRANSPORT_FACTORIES:
+            raise ValueError(f"Unknown notification transport '{pair.strip()}'")
+        transports[channel] = NOTIFICATION_TRANSPORT_FACTORIES[name](app.config)
+    return transports
+
+NOTIFICATION_LAG_BOUNDS_MS = (1000, 5000, 15000, 60000, 300000, 900000, 3600000)
+notification_lag = LatencyHistogram(NOTIFICATION_LAG_BOUNDS_MS)  # Due time to marked sent, in this process
+
+def notification_due_clause(now: datetime):
+    """Unsent notifications whose time has come and that no dispatcher holds
+
+    Two seeks on ix_notification_dispatch: unscheduled, and scheduled up to now.
+    """
+    table = Notification.__table__
+    return db.and_(
+        table.c.is_sent == False,
+        db.or_(table.c.scheduled_for.is_(None), table.c.scheduled_for <= now),
+        db.or_(table.c.lease_until.is_(None), table.c.lease_until < now),
+        db.func.coalesce(table.c.attempts, 0) < app.config['NOTIFICATION_MAX_ATTEMPTS']
+    )
+
+def claim_notifications(connection, now: datetime, owner: str, batch_size: int) -> List:
+    """Lease up to `batch_size` due notifications to `owner` and return them
+
+    On PostgreSQL the candidate SELECT skips rows other dispatchers have
+    locked; SQLite drops FOR UPDATE, serializes the UPDATEs and the
+    re-checked due clause leaves rows already leased to someone else.
+    """
+    table = Notification.__table__
+    candidates = (db.select(table.c.id).where(notification_due_clause(now))
+                  .limit(batch_size).with_for_update(skip_locked=True))
+    return connection.execute(
+        table.update()
+        .where(table.c.id.in_(candidates), notification_due_clause(now))
+        .values(lease_until=now + timedelta(seconds=app.config['NOTIFICATION_LEASE']), lease_owner=owner,
+                attempts=db.func.coalesce(table.c.attempts, 0) + 1)
+        .returning(table.c.id, table.c.user_id, table.c.title, table.c.message, table.c.type,
+                   table.c.priority, table.c.scheduled_for, table.c.created_at, table.c.attempts)
+    ).all()
+
+def group_notifications(connection, notifications) -> Dict[str, List[NotificationGroup]]:
+    """Bundle claimed notifications per channel and user, following each user's channel preferences"""
+    user_ids = sorted({notification.user_id for notification in notifications})
+    recipients = {row.id: row for row in connection.execute(
+        db.select(User.id, User.email, User.name, User.phone,
+                  *[getattr(UserPreference, column) for column in NOTIFICATION_CHANNELS.values()])
+        .outerjoin(UserPreference, UserPreference.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    )}
+    
+    by_user = {}
+    for notification in notifications:
+        by_user.setdefault(notification.user_id, []).append(notification)
+    
+    groups = {}
+    for user_id, user_notifications in by_user.items():
+        recipient = recipients.get(user_id)
+        if recipient is None:
+            continue
+        for channel, column in NOTIFICATION_CHANNELS.items():
+            enabled = getattr(recipient, column)
+            if not (NOTIFICATION_CHANNEL_DEFAULTS[channel] if enabled is None else enabled):
+                continue
+            if channel == 'sms' and not recipient.phone:
+                continue
+            groups.setdefault(channel, []).append(NotificationGroup(
+                channel, user_id, recipient.email, recipient.name, recipient.phone, user_notifications
+            ))
+    return groups
+
+@periodic_job('notification-dispatch', 'NOTIFICATION_DISPATCH_INTERVAL')
+def dispatch_notifications(batch_size: Optional[int] = None, session=None, max_batches: Optional[int] = None) -> Dict:
+    """Deliver every due notification, one claimed batch at a time
+
+    Claims commit before delivery so no write lock is held while a
+    transport talks to the outside world. Delivery is at least once: if a
+    dispatcher dies after sending, its lease lapses and the batch goes out
+    again. A notification is marked sent once all its channels accepted it;
+    failures are retried with backoff until NOTIFICATION_MAX_ATTEMPTS.
+    """
+    session = session or db.session
+    batch_size = batch_size or app.config['NOTIFICATION_BATCH']
+    transports = notification_transports()
+    table = Notification.__table__
+    owner = f"{os.getpid()}:{uuid.uuid4().hex[:12]}"
+    summary = {'claimed': 0, 'sent': 0, 'failed': 0, 'deliveries': {}, 'max_lag_seconds': 0.0}
+    started = time.perf_counter()
+    batches = 0
+    
+    while max_batches is None or batches < max_batches:
+        now = datetime.utcnow()
+        claimed = claim_notifications(session.connection(), now, owner, batch_size)
+        groups = group_notifications(session.connection(), claimed) if claimed else {}
+        session.commit()
+        if not claimed:
+            break
+        batches += 1
         
-        # Monthly expenses
-        monthly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense',
-            Transaction.date >= start_of_month
-        ).scalar() or 0
+        failed_ids = set()
+        errors = {}
+        for channel, channel_groups in groups.items():
+            transport = transports.get(channel)
+            if transport is None:
+                continue  # Channel not configured for delivery; in-app only
+            try:
+                failed_groups = transport.deliver(channel_groups)
+            except Exception as e:
+                print(f"Notification transport {transport.name} failed: {e}")
+                failed_groups = channel_groups
+            for group in failed_groups:
+                for notification in group.notifications:
+                    failed_ids.add(notification.id)
+                    errors[notification.id] = f"{channel} delivery via {transport.name} failed"
+            delivered = summary['deliveries'].setdefault(channel, 0)
+            summary['deliveries'][channel] = delivered + len(channel_groups) - len(failed_groups)
         
-        # Savings goals total
-        savings_total = db.session.query(db.func.sum(SavingsGoal.current_amount)).filter(
-            SavingsGoal.user_id == user_id
-        ).scalar() or 0
+        sent_at = datetime.utcnow()
+        sent = [notification for notification in claimed if notification.id not in failed_ids]
+        if sent:
+            session.execute(
+                table.update()
+                .where(table.c.id.in_([notification.id for notification in sent]), table.c.lease_owner == owner)
+                .values(is_sent=True, sent_at=sent_at, lease_until=None, lease_owner=None, last_error=None)
+            )
+        retries = [
+            {'notification_id': notification.id, 'retry_at': sent_at + timedelta(
+                seconds=app.config['NOTIFICATION_RETRY_BACKOFF'] * 2 ** (notification.attempts - 1)),
+             'error': errors[notification.id]}
+            for notification in claimed if notification.id in failed_ids
+        ]
+        if retries:
+            session.execute(
+                table.update()
+                .where(table.c.id == db.bindparam('notification_id'), table.c.lease_owner == owner)
+                .values(lease_until=db.bindparam('retry_at'), lease_owner=None, last_error=db.bindparam('error')),
+                retries
+            )
+        session.commit()
         
-        return jsonify({
-            'totalBalance': float(income_total - expense_total),
-            'monthlyIncome': float(monthly_income),
-            'monthlyExpenses': float(monthly_expenses),
-            'savingsGoal': float(savings_total)
-        })
-    except Exception as e:
-        return jsonify({'error': 'Failed to load dashboard data'}), 500
+        for notification in sent:
+            lag = (sent_at - (notification.scheduled_for or notification.created_at)).total_seconds()
+            notification_lag.observe(max(lag, 0))
+            summary['max_lag_seconds'] = max(summary['max_lag_seconds'], round(lag, 3))
+        summary['claimed'] += len(claimed)
+        summary['sent'] += len(sent)
+        summary['failed'] += len(retries)
+    
+    elapsed = time.perf_counter() - started
+    summary['seconds'] = round(elapsed, 3)
+    summary['per_second'] = round(summary['sent'] / elapsed, 1) if elapsed > 0 else 0
+    return summary
 
-@app.route('/api/dashboard/total-balance', methods=['POST'])
-@login_required
-def set_total_balance():
-    """Adjust total balance by creating an automatic adjustment transaction"""
-    user_id = session['user_id']
-    data = request.json or {}
+def notification_backlog(now: Optional[datetime] = None) -> Dict:
+    """How many notifications are due right now and how long the oldest has waited"""
+    now = now or datetime.utcnow()
+    table = Notification.__table__
+    count, oldest = db.session.execute(
+        db.select(db.func.count(), db.func.min(db.func.coalesce(table.c.scheduled_for, table.c.created_at)))
+        .where(notification_due_clause(now))
+    ).one()
+    return {
+        'due': count,
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else None
+    }
+
+@app.cli.command('benchmark-notifications')
+@click.option('--notifications', 'total', type=int, default=20000, show_default=True)
+@click.option('--users', type=int, default=500, show_default=True)
+@click.option('--batch-size', type=int, default=None, help='Defaults to NOTIFICATION_BATCH')
+def benchmark_notifications_command(total, users, batch_size):
+    """Dispatch a backlog through the file transport in a throwaway database"""
     try:
-        desired = Decimal(str(data.get('total_balance', '0')))
-        income_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income'
-        ).scalar() or 0
-        expense_total = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense'
-        ).scalar() or 0
-        current = Decimal(str(income_total)) - Decimal(str(expense_total))
-        delta = desired - current
-        if abs(delta) < Decimal('0.005'):
-            return jsonify({'success': True, 'message': 'No change needed', 'totalBalance': float(current)})
-        adj_type = 'income' if delta > 0 else 'expense'
-        adj_amount = abs(delta)
-        adjustment = Transaction(
-            user_id=user_id,
-            type=adj_type,
-            amount=adj_amount,
-            category='adjustment',
-            description='Balance adjustment',
-            date=datetime.now().date()
-        )
-        db.session.add(adjustment)
-        db.session.commit()
-        new_balance = float(desired)
-        return jsonify({'success': True, 'message': 'Balance updated', 'totalBalance': new_balance})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'message': 'Failed to update balance'}), 400
+        with preserved_config('NOTIFICATION_TRANSPORTS', 'NOTIFICATION_OUTBOX_PATH'):
+            _run_notification_benchmark(total, users, batch_size)
+    finally:
+        # Transports are cached, so drop the benchmark's file transport along with its settings
+        notification_transports.cache_clear()
 
-@app.route('/api/notifications')
-@login_required
-def api_notifications():
-    user_id = session['user_id']
-    notes = Notification.query.filter_by(user_id=user_id).order_by(Notification.created_at.desc()).limit(20).all()
-    payload = []
-    for n in notes:
-        payload.append({
-            'id': n.id,
-            'title': n.title,
-            'message': n.message,
-            'type': n.type,
-            'priority': n.priority,
-            'is_read': n.is_read,
-            'created_at': n.created_at.isoformat()
-        })
-    return jsonify(payload)
+def _run_notification_benchmark(total, users, batch_size):
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        engine = db.create_engine(f"sqlite:///{os.path.join(directory, 'notifications.db')}")
+        db.metadata.create_all(engine)
+        outbox = os.path.join(directory, 'outbox.ndjson')
+        app.config['NOTIFICATION_TRANSPORTS'] = 'email=file,push=file'
+        app.config['NOTIFICATION_OUTBOX_PATH'] = outbox
+        notification_transports.cache_clear()
+        
+        with Session(engine) as session:
+            session.execute(User.__table__.insert(), [
+                {'id': n + 1, 'email': f'bench{n}@example.com', 'name': f'Bench {n}'} for n in range(users)
+            ])
+            created = datetime.utcnow() - timedelta(minutes=5)
+            session.execute(Notification.__table__.insert(), [
+                {'user_id': n * users // total + 1, 'title': f'Notification {n}', 'message': 'Benchmark message',
+                 'type': 'general', 'priority': 'normal', 'is_read': False, 'is_sent': False,
+                 'attempts': 0, 'created_at': created}
+                for n in range(total)
+            ])
+            session.commit()
+            
+            summary = dispatch_notifications(batch_size=batch_size, session=session)
+            unsent = session.execute(db.select(db.func.count()).select_from(Notification)
+                                     .where(Notification.is_sent == False)).scalar()
+        with open(outbox) as lines:
+            groups = sum(1 for _ in lines)
+        engine.dispose()
+    
+    click.echo(f"{summary['sent']} of {total} sent in {summary['seconds']}s ({summary['per_second']}/s), "
+               f"{unsent} left unsent")
+    click.echo(f"{groups} grouped deliveries: {summary['deliveries']}")
+    click.echo(f"lag: max {summary['max_lag_seconds']}s, histogram {notification_lag.stats()['buckets']}")
 
 @app.route('/api/transactions', methods=['GET', 'POST'])
 @login_required
+@conditional_response
 def api_transactions():
     user_id = session['user_id']
     
@@ -1054,12 +4937,16 @@ def api_transactions():
             return jsonify({'success': False, 'message': str(e)}), 400
     
     else:
-        # GET - Return recent transactions
-        transactions = Transaction.query.filter_by(user_id=user_id)\
-            .order_by(Transaction.date.desc(), Transaction.created_at.desc())\
-            .limit(20).all()
+        # GET - Return a page of transactions, newest first
+        try:
+            transactions, next_cursor = list_transactions(user_id, request.args)
+        except (ValueError, ArithmeticError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        return jsonify([t.to_dict() for t in transactions])
+        response = jsonify([t.to_dict() for t in transactions])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
 
 @app.route('/api/transactions/<int:transaction_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -1094,8 +4981,51 @@ def transaction_detail(transaction_id):
             db.session.rollback()
             return jsonify({'success': False, 'message': str(e)}), 400
 
+@app.route('/api/transactions/import', methods=['POST'])
+@login_required
+def import_transactions_upload():
+    """Bulk import transactions from a CSV or OFX upload"""
+    user_id = session['user_id']
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'message': 'No file uploaded'}), 400
+    
+    upload = request.files['file']
+    try:
+        file_format = detect_import_format(upload.filename, request.form.get('format'))
+        summary = import_transactions(user_id, upload.stream, file_format)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Import error: {e}")
+        return jsonify({'success': False, 'message': 'An error occurred during import'}), 500
+    
+    return jsonify({'success': True, **summary})
+
+@app.route('/api/transactions/export')
+@login_required
+def export_transactions_download():
+    """Stream the user's transactions as CSV or NDJSON"""
+    user_id = session['user_id']
+    file_format = request.args.get('format', 'csv').lower()
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    try:
+        # Validate filters before the response starts streaming
+        filter_transactions(Transaction.query, request.args)
+    except (ValueError, ArithmeticError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    response = Response(
+        stream_with_context(export_transactions(user_id, request.args, file_format)),
+        mimetype=EXPORT_FORMATS[file_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=transactions.{file_format}'
+    return response
+
 @app.route('/api/budgets', methods=['GET', 'POST'])
 @login_required
+@conditional_response
 def api_budgets():
     user_id = session['user_id']
     
@@ -1113,10 +5043,11 @@ def api_budgets():
             db.session.add(budget)
             db.session.commit()
             
+            spent = compute_budget_spent([budget])
             return jsonify({
                 'success': True,
                 'message': 'Budget created successfully',
-                'budget': budget.to_dict()
+                'budget': budget.to_dict(spent=spent[budget.id])
             }), 201
             
         except Exception as e:
@@ -1125,7 +5056,8 @@ def api_budgets():
     
     else:
         budgets = Budget.query.filter_by(user_id=user_id).all()
-        return jsonify([b.to_dict() for b in budgets])
+        spent = compute_budget_spent(budgets)
+        return jsonify([b.to_dict(spent=spent[b.id]) for b in budgets])
 
 @app.route('/api/budgets/<int:budget_id>', methods=['PUT', 'DELETE'])
 @login_required
@@ -1136,12 +5068,22 @@ def budget_detail(budget_id):
     if request.method == 'PUT':
         data = request.json
         try:
+            limit_amount = Decimal(str(data.get('limit_amount', budget.limit_amount)))
+            changed = data.get('category', budget.category) != budget.category or \
+                data.get('period', budget.period) != budget.period or \
+                limit_amount != budget.limit_amount
+            if changed:
+                reset_budget_alert_state(budget.id)
             budget.category = data.get('category', budget.category)
-            budget.limit_amount = Decimal(str(data.get('limit_amount', budget.limit_amount)))
+            budget.limit_amount = limit_amount
             budget.period = data.get('period', budget.period)
+            if changed:
+                db.session.flush()
+                reevaluate_budget_alert(db.session.connection(), budget)
             
             db.session.commit()
-            return jsonify({'success': True, 'budget': budget.to_dict()})
+            spent = compute_budget_spent([budget])
+            return jsonify({'success': True, 'budget': budget.to_dict(spent=spent[budget.id])})
             
         except Exception as e:
             db.session.rollback()
@@ -1149,6 +5091,7 @@ def budget_detail(budget_id):
     
     elif request.method == 'DELETE':
         try:
+            reset_budget_alert_state(budget.id)
             db.session.delete(budget)
             db.session.commit()
             return jsonify({'success': True, 'message': 'Budget deleted'})
@@ -1157,8 +5100,13 @@ def budget_detail(budget_id):
             db.session.rollback()
             return jsonify({'success': False, 'message': str(e)}), 400
 
+def _validate_auto_save(goal: SavingsGoal):
+    if goal.auto_save and goal.auto_save_frequency not in auto_save_cutoffs(datetime.utcnow()):
+        raise ValueError('auto_save_frequency must be one of daily, weekly, monthly')
+
 @app.route('/api/savings-goals', methods=['GET', 'POST'])
 @login_required
+@conditional_response
 def savings_goals():
     user_id = session['user_id']
     
@@ -1172,8 +5120,12 @@ def savings_goals():
                 target_amount=Decimal(str(data['target_amount'])),
                 current_amount=Decimal(str(data.get('current_amount', 0))),
                 target_date=datetime.strptime(data['target_date'], '%Y-%m-%d').date() if data.get('target_date') else None,
-                priority=data.get('priority', 0)
+                priority=data.get('priority', 0),
+                auto_save=bool(data.get('auto_save', False)),
+                auto_save_amount=Decimal(str(data['auto_save_amount'])) if data.get('auto_save_amount') else None,
+                auto_save_frequency=data.get('auto_save_frequency')
             )
+            _validate_auto_save(goal)
             
             db.session.add(goal)
             db.session.commit()
@@ -1207,6 +5159,12 @@ def savings_goal_detail(goal_id):
             goal.priority = data.get('priority', goal.priority)
             if 'target_date' in data:
                 goal.target_date = datetime.strptime(data['target_date'], '%Y-%m-%d').date() if data['target_date'] else None
+            if 'auto_save' in data:
+                goal.auto_save = bool(data['auto_save'])
+            if 'auto_save_amount' in data:
+                goal.auto_save_amount = Decimal(str(data['auto_save_amount'])) if data['auto_save_amount'] else None
+            goal.auto_save_frequency = data.get('auto_save_frequency', goal.auto_save_frequency)
+            _validate_auto_save(goal)
             
             db.session.commit()
             return jsonify({'success': True, 'goal': goal.to_dict()})
@@ -1243,8 +5201,108 @@ def savings_goals_reorder():
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
 
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _validate_recurring(rule: RecurringTransaction):
+    if rule.frequency not in RECURRING_FREQUENCIES:
+        raise ValueError(f"frequency must be one of {', '.join(RECURRING_FREQUENCIES)}")
+    if rule.end_date and rule.end_date < rule.start_date:
+        raise ValueError('end_date must not be before start_date')
+
+@app.route('/api/recurring-transactions', methods=['GET', 'POST'])
+@login_required
+@conditional_response
+def api_recurring_transactions():
+    user_id = session['user_id']
+    
+    if request.method == 'POST':
+        data = request.json
+        
+        try:
+            start_date = _parse_date(data['start_date'])
+            rule = RecurringTransaction(
+                user_id=user_id,
+                name=data['name'],
+                type=data['type'],
+                amount=Decimal(str(data['amount'])),
+                category=data['category'],
+                subcategory=data.get('subcategory'),
+                description=data.get('description', ''),
+                frequency=data['frequency'],
+                start_date=start_date,
+                end_date=_parse_date(data.get('end_date')),
+                next_due_date=start_date,
+                payment_method=data.get('payment_method'),
+                notes=data.get('notes')
+            )
+            _validate_recurring(rule)
+            
+            db.session.add(rule)
+            db.session.commit()
+            return jsonify({
+                'success': True,
+                'message': 'Recurring transaction created successfully',
+                'recurring_transaction': rule.to_dict()
+            }), 201
+            
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
+    
+    else:
+        rules = RecurringTransaction.query.filter_by(user_id=user_id)\
+            .order_by(RecurringTransaction.next_due_date).all()
+        return jsonify([rule.to_dict() for rule in rules])
+
+@app.route('/api/recurring-transactions/<int:rule_id>', methods=['PUT', 'DELETE'])
+@login_required
+def recurring_transaction_detail(rule_id):
+    user_id = session['user_id']
+    rule = RecurringTransaction.query.filter_by(id=rule_id, user_id=user_id).first_or_404()
+    
+    if request.method == 'PUT':
+        data = request.json
+        try:
+            for field in ('name', 'type', 'category', 'subcategory', 'description', 'frequency',
+                          'payment_method', 'notes', 'is_active'):
+                if field in data:
+                    setattr(rule, field, data[field])
+            if 'amount' in data:
+                rule.amount = Decimal(str(data['amount']))
+            if 'end_date' in data:
+                rule.end_date = _parse_date(data['end_date'])
+            if 'start_date' in data:
+                # Restart the schedule; dates already posted are skipped by the unique index
+                rule.start_date = _parse_date(data['start_date'])
+                rule.next_due_date = rule.start_date
+            if 'next_due_date' in data:
+                rule.next_due_date = _parse_date(data['next_due_date'])
+            _validate_recurring(rule)
+            
+            db.session.commit()
+            return jsonify({'success': True, 'recurring_transaction': rule.to_dict()})
+            
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
+    
+    elif request.method == 'DELETE':
+        try:
+            # Posted transactions stay, detached from the rule
+            db.session.execute(Transaction.__table__.update()
+                               .where(Transaction.recurring_id == rule.id).values(recurring_id=None))
+            db.session.delete(rule)
+            db.session.commit()
+            return jsonify({'success': True, 'message': 'Recurring transaction deleted'})
+            
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 400
+
 @app.route('/api/analytics/spending-by-category')
 @login_required
+@cached_response
 def spending_by_category():
     user_id = session['user_id']
     
@@ -1252,20 +5310,14 @@ def spending_by_category():
     now = datetime.now()
     start_of_month = now.replace(day=1).date()
     
-    results = db.session.query(
-        Transaction.category,
-        db.func.sum(Transaction.amount).label('total')
-    ).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= start_of_month
-    ).group_by(Transaction.category).all()
+    results = aggregate_series(user_id, start_of_month, now.date(), 'month',
+                               group_by='category', txn_type='expense')
     
     categories = []
     amounts = []
-    for category, total in results:
+    for category, totals in results['series'].items():
         categories.append(category.title())
-        amounts.append(float(total))
+        amounts.append(sum(totals))
     
     return jsonify({
         'categories': categories,
@@ -1274,48 +5326,47 @@ def spending_by_category():
 
 @app.route('/api/analytics/monthly-trends')
 @login_required
+@cached_response
 def monthly_trends():
     user_id = session['user_id']
     
-    # Get last 6 months of income/expense data
-    months = []
-    income_data = []
-    expense_data = []
+    # Get last 6 calendar months of income/expense data
+    today = datetime.now().date()
+    start_date = shift_month_start(today, -5)
+    trends = aggregate_series(user_id, start_date, today, 'month',
+                              group_by='type', keys=['income', 'expense'])
     
-    for i in range(5, -1, -1):
-        date = datetime.now() - timedelta(days=30 * i)
-        start_date = date.replace(day=1).date()
-        
-        if i == 0:
-            end_date = datetime.now().date()
-        else:
-            next_month = start_date.replace(month=start_date.month + 1) if start_date.month < 12 else start_date.replace(year=start_date.year + 1, month=1)
-            end_date = next_month - timedelta(days=1)
-        
-        # Income for this month
-        income = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income',
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        ).scalar() or 0
-        
-        # Expenses for this month
-        expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense',
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        ).scalar() or 0
-        
-        months.append(start_date.strftime('%B'))
-        income_data.append(float(income))
-        expense_data.append(float(expenses))
+    return jsonify({
+        'months': [bucket.strftime('%B') for bucket in trends['buckets']],
+        'income': trends['series']['income'],
+        'expenses': trends['series']['expense']
+    })
+
+@app.route('/api/reports/series')
+@login_required
+@cached_response
+def report_series():
+    """Bucketed income/expense or category totals for an arbitrary date range"""
+    user_id = session['user_id']
+    today = datetime.now().date()
+    try:
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else shift_month_start(today, -11)
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
+        result = aggregate_series(
+            user_id, start_date, end_date,
+            granularity=request.args.get('granularity', 'month'),
+            group_by=request.args.get('group_by', 'type'),
+            txn_type=request.args.get('type'),
+            max_buckets=app.config['REPORT_SERIES_MAX_BUCKETS']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
-        'months': months,
-        'income': income_data,
-        'expenses': expense_data
+        'buckets': [bucket.isoformat() for bucket in result['buckets']],
+        'series': result['series']
     })
 
 @app.route('/api/settings/profile', methods=['GET', 'PUT'])
@@ -1329,6 +5380,7 @@ def api_settings_profile():
         user.name = data.get('name', user.name)
         user.email = data.get('email', user.email)
         db.session.commit()
+        user_cache.invalidate(user_id)
         return jsonify({'success': True, 'message': 'Profile updated successfully'})
 
     return jsonify({
@@ -1343,14 +5395,17 @@ def api_settings_password():
     user = User.query.get_or_404(user_id)
     data = request.json
 
-    if not check_password_hash(user.password_hash, data.get('current_password')):
-        return jsonify({'success': False, 'message': 'Invalid current password'}), 400
-
     if data.get('new_password') != data.get('confirm_password'):
         return jsonify({'success': False, 'message': 'New passwords do not match'}), 400
 
-    user.password_hash = generate_password_hash(data.get('new_password'))
+    try:
+        if not user.check_password(data.get('current_password') or ''):
+            return jsonify({'success': False, 'message': 'Invalid current password'}), 400
+        user.set_password(data.get('new_password'))
+    except HashingBusy:
+        return throttled_response('The server is busy, please try again shortly', 503, 1)
     db.session.commit()
+    user_cache.invalidate(user_id)
     return jsonify({'success': True, 'message': 'Password updated successfully'})
 
 @app.route('/api/settings/notifications', methods=['GET', 'PUT'])
@@ -1383,6 +5438,7 @@ def api_settings_notifications():
 
 @app.route('/api/reports/summary')
 @login_required
+@cached_response
 def reports_summary():
     user_id = session['user_id']
     now = datetime.now()
@@ -1397,44 +5453,21 @@ def reports_summary():
     last_month_start = (start_of_month - timedelta(days=1)).replace(day=1)
     last_month_end = start_of_month - timedelta(days=1)
     
-    # Calculate totals
-    yearly_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'income',
-        Transaction.date >= start_of_year
-    ).scalar() or 0
-    
-    yearly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= start_of_year
-    ).scalar() or 0
-    
-    monthly_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'income',
-        Transaction.date >= start_of_month
-    ).scalar() or 0
-    
-    monthly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= start_of_month
-    ).scalar() or 0
-    
-    last_month_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'income',
-        Transaction.date >= last_month_start,
-        Transaction.date <= last_month_end
-    ).scalar() or 0
-    
-    last_month_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= last_month_start,
-        Transaction.date <= last_month_end
-    ).scalar() or 0
+    # Calculate totals from one monthly series covering the year and last month
+    trends = aggregate_series(user_id, min(start_of_year, last_month_start), now.date(), 'month',
+                              group_by='type', keys=['income', 'expense'])
+    buckets = trends['buckets']
+    income_series = trends['series']['income']
+    expense_series = trends['series']['expense']
+    
+    yearly_income = sum(v for b, v in zip(buckets, income_series) if b >= start_of_year)
+    yearly_expenses = sum(v for b, v in zip(buckets, expense_series) if b >= start_of_year)
+    
+    monthly_income = income_series[-1]
+    monthly_expenses = expense_series[-1]
+    
+    last_month_income = income_series[buckets.index(last_month_start)]
+    last_month_expenses = expense_series[buckets.index(last_month_start)]
     
     return jsonify({
         'yearly': {
@@ -1456,6 +5489,8 @@ def reports_summary():
 
 @app.route('/api/reports/data')
 @login_required
+@conditional_response
+@cached_response
 def get_report_data():
     user_id = session['user_id']
     period = request.args.get('period', 'this_month')
@@ -1482,68 +5517,31 @@ def get_report_data():
         end_date = now.date()
 
     # --- Summary Calculations ---
-    total_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'income',
-        Transaction.date >= start_date,
-        Transaction.date <= end_date
-    ).scalar() or 0
-
-    total_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= start_date,
-        Transaction.date <= end_date
-    ).scalar() or 0
+    totals = aggregate_series(user_id, start_date, end_date, 'year',
+                              group_by='type', keys=['income', 'expense'])
+    total_income = sum(totals['series']['income'])
+    total_expenses = sum(totals['series']['expense'])
 
     total_savings = total_income - total_expenses
 
     # --- Chart Data ---
-    # Income vs Expenses Trend (monthly for the year)
-    income_expenses_chart = {'labels': [], 'income': [], 'expenses': []}
-    for i in range(11, -1, -1):
-        month_date = now - timedelta(days=30 * i)
-        month_start = month_date.replace(day=1)
-        
-        # Correctly calculate the end of the month
-        if month_start.month == 12:
-            month_end = month_start.replace(year=month_start.year + 1, month=1) - timedelta(days=1)
-        else:
-            month_end = month_start.replace(month=month_start.month + 1) - timedelta(days=1)
-
-        monthly_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'income',
-            Transaction.date >= month_start.date(),
-            Transaction.date <= month_end.date()
-        ).scalar() or 0
-
-        monthly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.type == 'expense',
-            Transaction.date >= month_start.date(),
-            Transaction.date <= month_end.date()
-        ).scalar() or 0
-        
-        income_expenses_chart['labels'].append(month_start.strftime('%b'))
-        income_expenses_chart['income'].append(float(monthly_income))
-        income_expenses_chart['expenses'].append(float(monthly_expenses))
+    # Income vs Expenses Trend (last 12 calendar months)
+    trends = aggregate_series(user_id, shift_month_start(now.date(), -11), now.date(), 'month',
+                              group_by='type', keys=['income', 'expense'])
+    income_expenses_chart = {
+        'labels': [bucket.strftime('%b') for bucket in trends['buckets']],
+        'income': trends['series']['income'],
+        'expenses': trends['series']['expense']
+    }
 
     # Spending by Category
     category_chart = {'labels': [], 'data': []}
-    category_spending = db.session.query(
-        Transaction.category,
-        db.func.sum(Transaction.amount)
-    ).filter(
-        Transaction.user_id == user_id,
-        Transaction.type == 'expense',
-        Transaction.date >= start_date,
-        Transaction.date <= end_date
-    ).group_by(Transaction.category).all()
+    category_spending = aggregate_series(user_id, start_date, end_date, 'year',
+                                         group_by='category', txn_type='expense')
 
-    for category, amount in category_spending:
+    for category, amounts in category_spending['series'].items():
         category_chart['labels'].append(category.title())
-        category_chart['data'].append(float(amount))
+        category_chart['data'].append(sum(amounts))
 
     data = {
         'summary': {
@@ -1562,7 +5560,10 @@ def get_report_data():
 @app.route('/api/chat', methods=['POST'])
 @login_required
 def chat_with_ai():
-    """Main chatbot endpoint for AI financial advice"""
+    """Queue a chat message for the AI financial advisor
+
+    Returns 202 with a job id; the answer is fetched from the job endpoint.
+    """
     try:
         user_id = session['user_id']
         data = request.json
@@ -1574,65 +5575,197 @@ def chat_with_ai():
         if not message:
             return jsonify({'error': 'Message cannot be empty'}), 400
         
-        # Get financial context for better AI responses
-        financial_context = get_financial_context(user_id)
-        
-        # Analyze message sentiment and category
-        sentiment = analyze_sentiment(message)
-        category = categorize_message(message)
-        
-        # Get AI response from Hugging Face API
-        ai_response = call_huggingface_api(message, financial_context)
-        
-        # Save chat history
-        chat_entry = ChatHistory(
+        job = ChatJob(
             user_id=user_id,
             message=message,
-            response=ai_response,
-            message_type='user',
-            category=category,
-            sentiment=sentiment
+            category=categorize_message(message),
+            sentiment=analyze_sentiment(message)
         )
-        
-        db.session.add(chat_entry)
+        db.session.add(job)
         db.session.commit()
         
-        return jsonify({
+        if not chat_jobs.submit(job.id):
+            db.session.delete(job)
+            db.session.commit()
+            response = jsonify({'error': 'The advisor is busy, please try again shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        status_url = url_for('get_chat_job', job_id=job.id)
+        response = jsonify({
             'success': True,
-            'response': ai_response,
-            'category': category,
-            'sentiment': sentiment,
-            'context': financial_context
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': status_url,
+            'category': job.category,
+            'sentiment': job.sentiment
         })
+        response.headers['Location'] = status_url
+        return response, 202
         
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
+        db.session.rollback()
         return jsonify({'error': 'An error occurred while processing your request'}), 500
 
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+@login_required
+def stream_chat():
+    """Stream the AI financial advice response as Server-Sent Events
+
+    Emits a `meta` event with the message labels, one unnamed event per text
+    chunk and a final `done` event once the exchange is saved to ChatHistory,
+    or an `error` event if it could not be saved.
+    """
+    user_id = session['user_id']
+    data = request.get_json(silent=True)
+    
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    message = data['message'].strip()
+    if not message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    started = time.perf_counter()
+    category = categorize_message(message)
+    sentiment = analyze_sentiment(message)
+    financial_context = get_financial_context(user_id)
+    
+    def events():
+        yield sse_event({'category': category, 'sentiment': sentiment}, 'meta')
+        
+        pieces = []
+        ttft = None
+        for piece in stream_ai_advice(user_id, message, category, financial_context):
+            if ttft is None:
+                ttft = time.perf_counter() - started
+                chat_stream_ttft.observe(ttft)
+            pieces.append(piece)
+            yield sse_event({'text': piece})
+        
+        try:
+            chat_entry = ChatHistory(
+                user_id=user_id,
+                message=message,
+                response=''.join(pieces),
+                message_type='user',
+                category=category,
+                sentiment=sentiment
+            )
+            db.session.add(chat_entry)
+            db.session.commit()
+        except Exception as e:
+            print(f"Error saving streamed chat: {e}")
+            db.session.rollback()
+            yield sse_event({'error': 'Could not save this conversation'}, 'error')
+            return
+        
+        yield sse_event({
+            'chat_id': chat_entry.id,
+            'ttft_ms': round(ttft * 1000, 1) if ttft is not None else None
+        }, 'done')
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
+
+@app.route('/api/chat/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_chat_job(job_id):
+    """Poll a chat job; ?wait=N long-polls for up to N seconds"""
+    user_id = session['user_id']
+    job = ChatJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if job is None:
+        return jsonify({'error': 'Chat job not found'}), 404
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0), app.config['CHAT_POLL_MAX_WAIT'])
+    deadline = time.monotonic() + wait
+    while job.status in ('queued', 'running'):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # Release the connection while blocked so the worker can commit
+        db.session.rollback()
+        chat_jobs.wait(job_id, min(remaining, 0.5))
+        db.session.refresh(job)
+    
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/api/chat/backend', methods=['GET'])
+@login_required
+def chat_backend_stats():
+    """Circuit breaker state and latency histogram of the inference client, and advice cache counters"""
+    return jsonify({
+        'success': True,
+        'inference': inference_client.stats(),
+        'advice_cache': advice_cache.stats(),
+        'stream_ttft': chat_stream_ttft.stats()
+    })
+
+@app.route('/api/chat/queue', methods=['GET'])
+@login_required
+def chat_queue_stats():
+    """Depth and worker count of this process's chat job queue"""
+    return jsonify({'success': True, 'chat_queue': chat_jobs.stats()})
+
+def encode_chat_cursor(chat) -> str:
+    """Opaque cursor pointing just past a chat turn in (created_at, id) order"""
+    position = [chat.created_at.isoformat(), chat.id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_chat_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, chat_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(chat_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+
+def estimated_chat_total(user_id: int) -> int:
+    """Live chat turns: all-time counter minus archived turns, no table scan"""
+    total = db.session.query(db.func.sum(ChatStat.count))\
+        .filter(ChatStat.user_id == user_id, ChatStat.kind == 'category').scalar() or 0
+    archived = db.session.query(db.func.sum(ChatArchive.message_count))\
+        .filter(ChatArchive.user_id == user_id).scalar() or 0
+    return max(int(total) - int(archived), 0)
+
 @app.route('/api/chat/history', methods=['GET'])
 @login_required
 def get_chat_history():
-    """Get user's chat history"""
+    """Get user's chat history, newest first, one keyset page at a time
+
+    Pass the previous page's `next_cursor` as `?cursor=` for the next page.
+    """
     try:
         user_id = session['user_id']
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        
+        query = ChatHistory.query.filter_by(user_id=user_id)
+        if request.args.get('cursor'):
+            try:
+                position = decode_chat_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(db.tuple_(ChatHistory.created_at, ChatHistory.id) < db.tuple_(*position))
         
-        # Get paginated chat history
-        chat_history = ChatHistory.query.filter_by(user_id=user_id)\
-            .order_by(ChatHistory.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        rows = query.order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc()).limit(per_page + 1).all()
+        next_cursor = encode_chat_cursor(rows[per_page - 1]) if len(rows) > per_page else None
         
         return jsonify({
             'success': True,
-            'chats': [chat.to_dict() for chat in chat_history.items],
+            'chats': [chat.to_dict() for chat in rows[:per_page]],
             'pagination': {
-                'page': page,
                 'per_page': per_page,
-                'total': chat_history.total,
-                'pages': chat_history.pages,
-                'has_next': chat_history.has_next,
-                'has_prev': chat_history.has_prev
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None,
+                'total': estimated_chat_total(user_id),
+                'total_is_estimate': True
             }
         })
         
@@ -1640,6 +5773,24 @@ def get_chat_history():
         print(f"Error getting chat history: {e}")
         return jsonify({'error': 'An error occurred while fetching chat history'}), 500
 
+@app.route('/api/chat/archives', methods=['GET'])
+@login_required
+def list_chat_archives():
+    """Archived chat batches, newest first, without their contents"""
+    user_id = session['user_id']
+    archives = ChatArchive.query.filter_by(user_id=user_id)\
+        .order_by(ChatArchive.last_created_at.desc()).limit(100).all()
+    return jsonify({'success': True, 'archives': [archive.to_dict() for archive in archives]})
+
+@app.route('/api/chat/archives/<int:archive_id>', methods=['GET'])
+@login_required
+def get_chat_archive(archive_id):
+    """One archived batch with its decompressed turns"""
+    archive = ChatArchive.query.filter_by(id=archive_id, user_id=session['user_id']).first()
+    if archive is None:
+        return jsonify({'error': 'Archive not found'}), 404
+    return jsonify({'success': True, 'archive': archive.to_dict(include_turns=True)})
+
 @app.route('/api/chat/clear', methods=['POST'])
 @login_required
 def clear_chat_history():
@@ -1649,6 +5800,12 @@ def clear_chat_history():
         
         # Delete all chat history for the user
         ChatHistory.query.filter_by(user_id=user_id).delete()
+        ChatSummary.query.filter_by(user_id=user_id).delete()
+        ChatJob.query.filter_by(user_id=user_id).update({'chat_id': None})
+        ChatArchive.query.filter_by(user_id=user_id).delete()
+        ChatStat.query.filter_by(user_id=user_id).delete()
+        ChatDailyStat.query.filter_by(user_id=user_id).delete()
+        bump_data_versions(db.session.connection(), [user_id], 'chat')
         db.session.commit()
         
         return jsonify({
@@ -1663,47 +5820,27 @@ def clear_chat_history():
 
 @app.route('/api/chat/insights', methods=['GET'])
 @login_required
+@cached_response(kind='chat')
 def get_chat_insights():
     """Get insights from user's chat history"""
     try:
         user_id = session['user_id']
         
-        # Get chat statistics
-        total_chats = ChatHistory.query.filter_by(user_id=user_id).count()
-        categories = db.session.query(
-            ChatHistory.category,
-            db.func.count(ChatHistory.id).label('count')
-        ).filter_by(user_id=user_id).group_by(ChatHistory.category).all()
-        
-        sentiments = db.session.query(
-            ChatHistory.sentiment,
-            db.func.count(ChatHistory.id).label('count')
-        ).filter_by(user_id=user_id).group_by(ChatHistory.sentiment).all()
-        
-        # Get recent topics
-        recent_topics = db.session.query(
-            ChatHistory.category,
-            db.func.count(ChatHistory.id).label('count')
-        ).filter_by(user_id=user_id)\
-            .filter(ChatHistory.created_at >= datetime.now() - timedelta(days=30))\
-            .group_by(ChatHistory.category)\
-            .order_by(db.func.count(ChatHistory.id).desc())\
-            .limit(5).all()
-        
         return jsonify({
             'success': True,
-            'insights': {
-                'total_chats': total_chats,
-                'categories': [{'category': c.category, 'count': c.count} for c in categories],
-                'sentiments': [{'sentiment': s.sentiment, 'count': s.count} for s in sentiments],
-                'recent_topics': [{'category': t.category, 'count': t.count} for t in recent_topics]
-            }
+            'insights': read_chat_insights(user_id)
         })
         
     except Exception as e:
         print(f"Error getting chat insights: {e}")
         return jsonify({'error': 'An error occurred while fetching chat insights'}), 500
 
+@app.route('/api/cache/stats')
+@login_required
+def cache_stats():
+    """Hit/miss counters for this worker's response cache"""
+    return jsonify({'success': True, 'response_cache': response_cache.stats()})
+
 @app.route('/api/parse-receipt', methods=['POST'])
 @login_required
 def parse_receipt():
@@ -1727,7 +5864,13 @@ def parse_receipt():
 def init_db():
     """Initialize database with sample data"""
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
+        
+        # Backfill rollups for databases created before the rollup table existed
+        if rollups_need_backfill():
+            rebuild_transaction_rollups()
+        if chat_stats_need_backfill():
+            rebuild_chat_stats()
         
         # Check if user exists
         if not User.query.first():
@@ -43,7 +43,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const fetchBudgets = async () => {
         try {
-            const response = await fetch(apiUrl);
+            const response = await fetchWithETag(apiUrl);
             const budgets = await response.json();
             renderBudgets(budgets);
         } catch (error) {
@@ -205,7 +205,7 @@ class Dashboard {
 
     async fetchAPI(endpoint, options = {}) {
         try {
-            const response = await fetch(`${this.apiUrl}${endpoint}`, {
+            const response = await fetchWithETag(`${this.apiUrl}${endpoint}`, {
                 headers: {
                     'Content-Type': 'application/json',
                     ...options.headers
@@ -1,4 +1,56 @@
 // Global JavaScript
+
+// Conditional GET: remember each response's ETag and body, revalidate with
+// If-None-Match and rebuild the response from the stored copy on 304.
+const etagStore = {
+    get(url) {
+        try {
+            return JSON.parse(sessionStorage.getItem(`etag:${url}`));
+        } catch (error) {
+            return null;
+        }
+    },
+    set(url, entry) {
+        try {
+            sessionStorage.setItem(`etag:${url}`, JSON.stringify(entry));
+        } catch (error) {
+            // Storage full or unavailable; the next request simply skips revalidation
+        }
+    }
+};
+
+async function fetchWithETag(url, options = {}) {
+    const method = (options.method || 'GET').toUpperCase();
+    if (method !== 'GET') {
+        return fetch(url, options);
+    }
+
+    const stored = etagStore.get(url);
+    const headers = { ...options.headers };
+    if (stored) {
+        headers['If-None-Match'] = stored.etag;
+    }
+
+    const response = await fetch(url, { ...options, headers });
+    if (response.status === 304 && stored) {
+        return new Response(stored.body, {
+            status: 200,
+            headers: { 'Content-Type': 'application/json', ...stored.headers }
+        });
+    }
+
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        const cursor = response.headers.get('X-Next-Cursor');
+        etagStore.set(url, {
+            etag,
+            body: await response.clone().text(),
+            headers: cursor ? { 'X-Next-Cursor': cursor } : {}
+        });
+    }
+    return response;
+}
+
 class FamilyFinanceApp {
     constructor() {
         this.apiUrl = '/api';
@@ -210,7 +262,7 @@ class FamilyFinanceApp {
     }
 
     async fetchAPI(endpoint, options = {}) {
-        const response = await fetch(`${this.apiUrl}${endpoint}`, {
+        const response = await fetchWithETag(`${this.apiUrl}${endpoint}`, {
             headers: {
                 'Content-Type': 'application/json',
                 ...options.headers
@@ -528,6 +580,61 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     async function sendChatMessage(text) {
+        const stream = { bubble: null };
+        try {
+            if (await streamChatMessage(text, stream)) return;
+        } catch (e) {
+            // Handled below
+        }
+        if (stream.bubble) {
+            // Part of the reply is on screen, so posting again would answer and save the message twice
+            appendMessage('bot', 'The connection dropped before the reply finished. Please try again.');
+            return;
+        }
+        await queueChatMessage(text);
+    }
+
+    // Render the reply token by token from the Server-Sent Events stream, keeping the bot
+    // bubble on `stream`. Returns true once the server reports the exchange saved (`done`)
+    // or not saved (`error`), false when the stream ended before either.
+    async function streamChatMessage(text, stream) {
+        const res = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify({ message: text })
+        });
+        if (!res.ok || !res.body) return false;
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const raw of events) {
+                const lines = raw.split('\n');
+                const name = (lines.find(line => line.startsWith('event:')) || 'event: message').slice(6).trim();
+                const data = lines.filter(line => line.startsWith('data:')).map(line => line.slice(5).trim()).join('\n');
+                if (!data) continue;
+                const payload = JSON.parse(data);
+                if (name === 'done') return true;
+                if (name === 'error') {
+                    appendMessage('bot', `${payload.error || 'Could not save this conversation'}. Please try again.`);
+                    return true;
+                }
+                if (name !== 'message') continue;
+                if (!stream.bubble) stream.bubble = appendMessage('bot', '');
+                stream.bubble.textContent += payload.text || '';
+                chatbotMessages.scrollTop = chatbotMessages.scrollHeight;
+            }
+        }
+        return false;
+    }
+
+    async function queueChatMessage(text) {
         try {
             const res = await fetch('/api/chat', {
                 method: 'POST',
@@ -536,12 +643,25 @@ document.addEventListener('DOMContentLoaded', () => {
             });
             if (!res.ok) {
                 const err = await res.json().catch(() => ({}));
-                throw new Error(err.error || `HTTP ${res.status}`);
+                throw new Error(res.status === 401 ? 'HTTP 401' : (err.error || `HTTP ${res.status}`));
             }
-            const data = await res.json();
-            appendMessage('bot', data.response || 'Sorry, I could not reply.');
+            const job = await waitForChatJob((await res.json()).status_url);
+            appendMessage('bot', job.response || 'Sorry, I could not reply.');
         } catch (e) {
-            appendMessage('bot', 'Please log in to use the chatbot.');
+            appendMessage('bot', e.message === 'HTTP 401' ? 'Please log in to use the chatbot.' : 'Sorry, I could not reply.');
+        }
+    }
+
+    // Long-poll the queued chat job until the advisor has answered
+    async function waitForChatJob(statusUrl) {
+        for (;;) {
+            const res = await fetch(`${statusUrl}?wait=15`);
+            if (!res.ok) {
+                throw new Error(`HTTP ${res.status}`);
+            }
+            const job = await res.json();
+            if (job.status === 'done') return job;
+            if (job.status === 'failed') throw new Error(job.error || 'Chat job failed');
         }
     }
 
@@ -580,5 +700,6 @@ document.addEventListener('DOMContentLoaded', () => {
         messageDiv.appendChild(messageBubble);
         chatbotMessages.appendChild(messageDiv);
         chatbotMessages.scrollTop = chatbotMessages.scrollHeight;
+        return messageBubble;
     }
 });
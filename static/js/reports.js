@@ -14,7 +14,7 @@ document.addEventListener('DOMContentLoaded', async function() {
 
     // Chart.js initialization
     try {
-        const resp = await fetch('/api/reports/data?period=this_month');
+        const resp = await fetchWithETag('/api/reports/data?period=this_month');
         if (!resp.ok) throw new Error('Failed to load');
         const data = await resp.json();
         const inc = data.charts.income_expenses;
@@ -9,7 +9,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const fetchSavings = async () => {
         try {
-            const response = await fetch(apiUrl);
+            const response = await fetchWithETag(apiUrl);
             const savings = await response.json();
             renderSavings(savings);
         } catch (error) {
@@ -1,19 +1,28 @@
 document.addEventListener('DOMContentLoaded', () => {
     const apiUrl = '/api/transactions';
     const tbody = document.getElementById('transactionsBody');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    let nextCursor = null;
 
-    const fetchTransactions = async () => {
+    const fetchTransactions = async (append = false) => {
         try {
-            const response = await fetch(apiUrl);
+            const url = append && nextCursor ? `${apiUrl}?cursor=${encodeURIComponent(nextCursor)}` : apiUrl;
+            const response = await fetchWithETag(url);
             const transactions = await response.json();
-            renderTransactions(transactions);
+            nextCursor = response.headers.get('X-Next-Cursor');
+            renderTransactions(transactions, append);
+            if (loadMoreBtn) {
+                loadMoreBtn.classList.toggle('hidden', !nextCursor);
+            }
         } catch (error) {
             console.error('Error fetching transactions:', error);
         }
     };
 
-    const renderTransactions = (transactions) => {
-        tbody.innerHTML = '';
+    const renderTransactions = (transactions, append = false) => {
+        if (!append) {
+            tbody.innerHTML = '';
+        }
         transactions.forEach(tx => {
             const tr = document.createElement('tr');
             tr.innerHTML = `
@@ -39,6 +48,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', () => fetchTransactions(true));
+    }
+
     fetchTransactions();
 
     document.addEventListener('transactionAdded', () => {
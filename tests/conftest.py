@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configuration is read from the environment at import time, so it is set
+# before the app module is loaded
+_database_dir = tempfile.mkdtemp(prefix='family-finance-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_database_dir, 'test.db')}")
+os.environ.setdefault('JOB_SCHEDULER', 'off')
+os.environ.setdefault('PASSWORD_HASH_EXECUTOR', 'inline')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('USER_CACHE_TTL', '0')
+os.environ.setdefault('LOGIN_IP_LIMIT', '100000')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as finance  # noqa: E402
+
+
+@pytest.fixture
+def database():
+    """Fresh schema and empty caches for every test"""
+    with finance.app.app_context():
+        finance.db.drop_all()
+        finance.db.create_all()
+    finance.response_cache.clear()
+    finance.advice_cache.clear()
+    finance.financial_context_cache.clear()
+
+
+@pytest.fixture
+def app_context(database):
+    """An application context for tests that talk to the models directly
+
+    Test client requests made while it is active would share its `g`, so
+    tests that use the client open a context only around direct model work.
+    """
+    with finance.app.app_context():
+        yield finance.app
+        finance.db.session.remove()
+
+
+@pytest.fixture
+def user_id(database):
+    with finance.app.app_context():
+        account = finance.User(email='member@example.com', name='Member')
+        account.set_password('secret123')
+        finance.db.session.add(account)
+        finance.db.session.commit()
+        return account.id
+
+
+@pytest.fixture
+def client(user_id):
+    test_client = finance.app.test_client()
+    response = test_client.post('/login', json={'email': 'member@example.com', 'password': 'secret123'})
+    assert response.status_code == 200
+    return test_client
@@ -0,0 +1,47 @@
+from conftest import finance
+
+
+def test_repeated_question_is_answered_from_the_advice_cache(app_context, user_id, monkeypatch):
+    calls = []
+    monkeypatch.setattr(finance, 'request_ai_response', lambda prompt: calls.append(prompt) or 'Build an emergency fund.')
+    context = finance.get_financial_context(user_id)
+
+    first = finance.get_ai_advice(user_id, 'How much should I save each month?', 'savings', context)
+    second = finance.get_ai_advice(user_id, 'how much should i save each month', 'savings', context)
+
+    assert first == second == 'Build an emergency fund.'
+    assert len(calls) == 1
+    assert finance.advice_cache.stats()['hits'] == 1
+
+
+def test_answers_shaped_by_a_conversation_are_not_shared(app_context, user_id, monkeypatch):
+    other = finance.User(email='other@example.com', name='Other')
+    other.set_password('secret123')
+    finance.db.session.add(other)
+    finance.db.session.add(finance.ChatHistory(user_id=user_id, message='My employer is Acme and I earn 90k',
+                                               response='Noted.', category='general_financial_advice'))
+    finance.db.session.commit()
+    prompts = []
+    monkeypatch.setattr(finance, 'request_ai_response', lambda prompt: prompts.append(prompt) or f'Answer {len(prompts)}')
+    question = 'How much should I save each month?'
+
+    first = finance.get_ai_advice(user_id, question, 'savings', '')
+    second = finance.get_ai_advice(other.id, question, 'savings', '')
+
+    assert 'Acme' in prompts[0]
+    assert (first, second) == ('Answer 1', 'Answer 2')
+    assert finance.advice_cache.stats()['hits'] == 0
+    # The other user's history-free answer may be shared, but not with a conversation in progress
+    assert finance.get_ai_advice(user_id, question, 'savings', '') == 'Answer 3'
+
+
+def test_advice_cache_stats_are_served_uncached(client, user_id, monkeypatch):
+    monkeypatch.setattr(finance, 'request_ai_response', lambda prompt: 'Build an emergency fund.')
+    assert 'advice_cache' not in client.get('/api/chat/insights').get_json()['insights']
+    before = client.get('/api/chat/backend').get_json()['advice_cache']
+
+    with finance.app.app_context():
+        finance.get_ai_advice(user_id, 'How much should I save each month?', 'savings', '')
+
+    after = client.get('/api/chat/backend').get_json()['advice_cache']
+    assert after['misses'] == before['misses'] + 1
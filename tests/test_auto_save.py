@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from conftest import finance
+
+db = finance.db
+SavingsGoal = finance.SavingsGoal
+Transaction = finance.Transaction
+
+
+def add_goal(user_id, frequency, last_auto_save, current='20', target='100'):
+    goal = SavingsGoal(user_id=user_id, name='Holiday', target_amount=Decimal(target),
+                       current_amount=Decimal(current), auto_save=True, auto_save_amount=Decimal('10'),
+                       auto_save_frequency=frequency, last_auto_save=last_auto_save)
+    db.session.add(goal)
+    db.session.commit()
+    return goal.id
+
+
+def saved(goal_id):
+    db.session.expire_all()
+    goal = db.session.get(SavingsGoal, goal_id)
+    transfers = Transaction.query.filter_by(user_id=goal.user_id, type='transfer',
+                                            category=finance.AUTO_SAVE_CATEGORY).count()
+    return goal.current_amount, transfers
+
+
+def test_overdue_goal_is_credited_once_per_period(app_context, user_id):
+    now = datetime(2026, 5, 20, 9, 0)
+    goal_id = add_goal(user_id, 'daily', last_auto_save=now - timedelta(days=5))
+
+    first = finance.run_savings_auto_save(now=now)
+    rerun = finance.run_savings_auto_save(now=now)
+    later_that_day = finance.run_savings_auto_save(now=now + timedelta(hours=6))
+
+    assert (first['goals'], rerun['goals'], later_that_day['goals']) == (1, 0, 0)
+    assert saved(goal_id) == (Decimal('30'), 1)
+
+    finance.run_savings_auto_save(now=now + timedelta(days=1))
+    assert saved(goal_id) == (Decimal('40'), 2)
+
+
+def test_contribution_stops_at_the_target(app_context, user_id):
+    now = datetime(2026, 5, 20, 9, 0)
+    goal_id = add_goal(user_id, 'weekly', last_auto_save=None, current='95')
+
+    for day in range(0, 21, 7):
+        finance.run_savings_auto_save(now=now + timedelta(days=day))
+
+    assert saved(goal_id) == (Decimal('100'), 1)
+    transfer = Transaction.query.filter_by(user_id=user_id, type='transfer').one()
+    assert transfer.amount == Decimal('5')
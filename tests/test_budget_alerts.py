@@ -0,0 +1,40 @@
+from datetime import date
+
+from conftest import finance
+
+db = finance.db
+
+
+def add_expense(user_id, amount):
+    with finance.app.app_context():
+        db.session.add(finance.Transaction(user_id=user_id, type='expense', amount=amount, category='dining',
+                                           date=date.today()))
+        db.session.commit()
+
+
+def alert_titles(user_id):
+    with finance.app.app_context():
+        return [notification.title for notification in
+                finance.Notification.query.filter_by(user_id=user_id, type='budget_alert')
+                .order_by(finance.Notification.id)]
+
+
+def test_changing_the_limit_re_evaluates_alerts(client, user_id):
+    budget = client.post('/api/budgets', json={'category': 'dining', 'limit_amount': 100, 'period': 'monthly'})
+    budget_id = budget.get_json()['budget']['id']
+    add_expense(user_id, 85)
+    assert alert_titles(user_id) == ['dining budget at 80%']
+
+    # Raising the limit rearms the 80% alert against the new limit
+    assert client.put(f'/api/budgets/{budget_id}', json={'limit_amount': 200}).status_code == 200
+    assert alert_titles(user_id) == ['dining budget at 80%']
+    add_expense(user_id, 80)
+    assert alert_titles(user_id) == ['dining budget at 80%', 'dining budget at 80%']
+
+    # Lowering it below what is already spent alerts straight away
+    assert client.put(f'/api/budgets/{budget_id}', json={'limit_amount': 150}).status_code == 200
+    assert alert_titles(user_id) == ['dining budget at 80%', 'dining budget at 80%', 'dining budget exceeded']
+
+    # Saving an unchanged limit does not repeat the alert
+    assert client.put(f'/api/budgets/{budget_id}', json={'limit_amount': 150}).status_code == 200
+    assert len(alert_titles(user_id)) == 3
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from conftest import finance
+
+db = finance.db
+ChatJob = finance.ChatJob
+
+
+def add_job(user_id, status, age, started_age=None):
+    now = datetime.utcnow()
+    job = ChatJob(user_id=user_id, message='Should I pay off my card first?', status=status,
+                  created_at=now - timedelta(seconds=age),
+                  started_at=now - timedelta(seconds=started_age) if started_age is not None else None)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_recovery_requeues_stranded_jobs_and_fails_stale_ones(app_context, user_id, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(finance.chat_jobs, 'submit', lambda job_id: submitted.append(job_id) or True)
+    monkeypatch.setattr(finance.chat_jobs, '_serving_pid', None)
+    timeout = finance.app.config['CHAT_JOB_TIMEOUT']
+    requeue_after = finance.app.config['CHAT_JOB_REQUEUE_AFTER']
+
+    fresh = add_job(user_id, 'queued', age=1)
+    stranded = add_job(user_id, 'queued', age=requeue_after + 5)
+    expired = add_job(user_id, 'queued', age=timeout + 5)
+    working = add_job(user_id, 'running', age=30, started_age=10)
+    stuck = add_job(user_id, 'running', age=timeout + 30, started_age=timeout + 5)
+
+    # A `flask run-jobs` process serves no requests, and its threads die when it exits
+    result = finance.recover_chat_jobs()
+    assert result == {'timed_out': 1, 'expired': 1, 'requeued': 0, 'left_queued': 1}
+    assert submitted == []
+
+    finance.chat_jobs.mark_serving()
+    result = finance.recover_chat_jobs()
+
+    assert result == {'timed_out': 0, 'expired': 0, 'requeued': 1, 'left_queued': 0}
+    assert submitted == [stranded]
+    db.session.expire_all()
+    statuses = {job_id: db.session.get(ChatJob, job_id).status for job_id in (fresh, stranded, expired, working, stuck)}
+    assert statuses == {fresh: 'queued', stranded: 'queued', expired: 'failed', working: 'running', stuck: 'failed'}
+    assert db.session.get(ChatJob, stuck).error
+
+
+def test_web_requests_mark_the_process_as_serving_chat(client, monkeypatch):
+    monkeypatch.setattr(finance.chat_jobs, '_serving_pid', None)
+    assert not finance.chat_jobs.serving
+
+    client.get('/api/chat/backend')
+
+    assert finance.chat_jobs.serving
+
+
+def test_claimed_job_is_not_processed_twice(app_context, user_id, monkeypatch):
+    calls = []
+    monkeypatch.setattr(finance, 'get_ai_advice', lambda *args: calls.append(args) or 'Pay the card first.')
+    job_id = add_job(user_id, 'queued', age=1)
+
+    finance.process_chat_job(job_id)
+    finance.process_chat_job(job_id)
+
+    assert len(calls) == 1
+    db.session.expire_all()
+    assert db.session.get(ChatJob, job_id).status == 'done'
+
+
+def test_second_message_reuses_cached_financial_context(app_context, user_id, monkeypatch):
+    builds = []
+    build = finance.build_financial_context
+    monkeypatch.setattr(finance, 'build_financial_context', lambda uid: builds.append(uid) or build(uid))
+    monkeypatch.setattr(finance, 'get_ai_advice', lambda *args: 'Keep going.')
+
+    for _ in range(3):
+        finance.process_chat_job(add_job(user_id, 'queued', age=0))
+    assert builds == [user_id]
+
+    db.session.add(finance.Transaction(user_id=user_id, type='expense', amount=20, category='dining',
+                                       date=datetime.utcnow().date()))
+    db.session.commit()
+    finance.process_chat_job(add_job(user_id, 'queued', age=0))
+    assert builds == [user_id, user_id]
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timedelta
+
+from conftest import finance
+
+db = finance.db
+
+
+def add_turns(user_id, count):
+    started = datetime.utcnow() - timedelta(hours=1)
+    for index in range(count):
+        db.session.add(finance.ChatHistory(user_id=user_id, message=f"Question {index} about savings",
+                                           response='Answer', category='savings_guidance',
+                                           created_at=started + timedelta(minutes=index)))
+    db.session.commit()
+
+
+def saved_summary(user_id):
+    with db.engine.connect() as connection:
+        return connection.execute(db.select(finance.ChatSummary.__table__)
+                                  .where(finance.ChatSummary.user_id == user_id)).first()
+
+
+def test_prompt_building_leaves_the_callers_transaction_alone(app_context, user_id):
+    add_turns(user_id, 8)
+    db.session.add(finance.Budget(user_id=user_id, category='dining', limit_amount=100, period='monthly'))
+
+    prompt = finance.build_chat_prompt(user_id, 'How am I doing?', '')
+    db.session.rollback()
+
+    assert 'Earlier, over 4 messages' in prompt.text
+    assert finance.Budget.query.filter_by(user_id=user_id).count() == 0
+    assert json.loads(saved_summary(user_id).state)['turns'] == 4
+
+
+def test_older_summary_does_not_overwrite_a_newer_one(app_context, user_id):
+    now = datetime.utcnow()
+    finance.save_chat_summary(user_id, {'turns': 5}, 'newer', now, 10)
+    finance.save_chat_summary(user_id, {'turns': 3}, 'older', now - timedelta(minutes=5), 6)
+
+    assert saved_summary(user_id).summary == 'newer'
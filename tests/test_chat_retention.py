@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from conftest import finance
+
+db = finance.db
+
+
+def counters(user_id):
+    stats = {(row.kind, row.key): row.count for row in finance.ChatStat.query.filter_by(user_id=user_id)}
+    daily = {(row.date, row.category): row.count for row in finance.ChatDailyStat.query.filter_by(user_id=user_id)}
+    return stats, daily
+
+
+def test_rebuild_keeps_archived_turns_in_the_counters(app_context, user_id):
+    now = datetime.utcnow()
+    for index in range(10):
+        age = timedelta(days=200 if index < 6 else 1, minutes=index)
+        db.session.add(finance.ChatHistory(user_id=user_id, message=f"Question {index}", response='Answer',
+                                           category='budget_help' if index % 2 else 'savings_guidance',
+                                           sentiment='neutral', created_at=now - age))
+    db.session.commit()
+
+    assert finance.compact_chat_history(retention_days=90)['archived'] == 6
+    before = counters(user_id)
+    assert finance.estimated_chat_total(user_id) == 4
+
+    finance.rebuild_chat_stats(user_id)
+
+    assert counters(user_id) == before
+    assert finance.estimated_chat_total(user_id) == 4
+
+
+def test_relabel_after_commit_moves_the_counters(app_context, user_id):
+    turn = finance.ChatHistory(user_id=user_id, message='Any tax tips?', response='Answer',
+                               category='budget_help', sentiment='neutral')
+    db.session.add(turn)
+    db.session.commit()
+
+    turn.category = 'tax_optimization'
+    db.session.commit()
+
+    stats, _ = counters(user_id)
+    assert stats == {('category', 'tax_optimization'): 1, ('sentiment', 'neutral'): 1}
@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import finance
+
+
+@pytest.mark.parametrize('message, category', [
+    ('How do I build a monthly budget?', 'budget_help'),
+    ('My budgetary failsafe keeps breaking', 'general_financial_advice'),
+    ('Should I pay off my loans first?', 'debt_management'),
+    ('Which tax deductions apply to me?', 'tax_optimization'),
+])
+def test_categories_match_whole_words(message, category):
+    assert finance.categorize_message(message) == category
+
+
+def test_sentiment_counts_distinct_words():
+    assert finance.analyze_sentiment('Things are great, really great, but I am worried') == 'neutral'
+    assert finance.analyze_sentiment('I am stressed and struggling') == 'negative'
+
+
+def test_substring_baseline_uses_the_legacy_word_lists():
+    # 'budgetary' contains 'budget' and 'failsafe' contains 'fail'
+    message = 'My budgetary failsafe keeps failing, any tips?'
+    assert finance._substring_category(message) == 'budget_help'
+    assert finance._substring_sentiment(message) == 'negative'
+    # 'plan' was added to the vocabulary; the legacy lists only had 'planning'
+    assert finance._substring_category('What is my plan?') == 'general_financial_advice'
+    assert 'plan' in finance.vocabulary_additions()['categories']['retirement_planning']
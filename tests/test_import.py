@@ -0,0 +1,28 @@
+import io
+
+from conftest import finance
+
+
+def run_import(user_id, text, batch_size=2):
+    return finance.import_transactions(user_id, io.BytesIO(text.encode()), 'csv', batch_size=batch_size)
+
+
+def test_duplicate_references_are_skipped_across_batches(app_context, user_id):
+    text = 'date,amount,type,category,reference_number\n' + ''.join(
+        f"2024-01-0{day},{day},expense,misc,ref-{day % 3}\n" for day in range(1, 8)
+    )
+    summary = run_import(user_id, text)
+    assert (summary['imported'], summary['duplicates']) == (3, 4)
+
+    again = run_import(user_id, text)
+    assert (again['imported'], again['duplicates']) == (0, 7)
+    assert finance.Transaction.query.filter_by(user_id=user_id).count() == 3
+
+
+def test_unknown_type_is_a_row_error(app_context, user_id):
+    text = 'date,amount,type,category\n2024-01-01,5,expense,misc\n2024-01-02,5,refund,misc\n2024-01-03,-5,,misc\n'
+    summary = run_import(user_id, text)
+    assert summary['imported'] == 2
+    assert summary['failed'] == 1
+    assert summary['errors'][0]['line'] == 3
+    assert 'refund' in summary['errors'][0]['error']
@@ -0,0 +1,180 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import finance
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    """Inference stub answering each POST with the next scripted (status, delay)"""
+    script = []
+    hits = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).hits += 1
+        status, delay = self.script.pop(0) if self.script else (200, 0)
+        time.sleep(delay)
+        body = json.dumps([{'generated_text': 'Stub advice'}] if status == 200 else {'error': 'busy'}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up after its read timeout
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    StubBackend.script = []
+    StubBackend.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBackend)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield StubBackend, f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(url, **overrides):
+    config = {
+        'INFERENCE_CONNECT_TIMEOUT': 0.5,
+        'INFERENCE_READ_TIMEOUT': 0.5,
+        'INFERENCE_MAX_RETRIES': 2,
+        'INFERENCE_RETRY_BACKOFF': 0,
+        'INFERENCE_BREAKER_THRESHOLD': 3,
+        'INFERENCE_BREAKER_RESET': 0.2,
+        **overrides
+    }
+    return finance.InferenceClient(url, 'test-key', config)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retryable_statuses_are_retried(backend, status):
+    stub, url = backend
+    stub.script = [(status, 0), (status, 0)]
+    client = make_client(url)
+
+    assert client.post({'inputs': 'hi'}) == [{'generated_text': 'Stub advice'}]
+    assert stub.hits == 3
+    assert client.outcomes['retry'] == 2
+
+
+def test_retries_are_bounded(backend):
+    stub, url = backend
+    stub.script = [(503, 0)] * 10
+    client = make_client(url, INFERENCE_MAX_RETRIES=2)
+
+    with pytest.raises(finance.InferenceUnavailable):
+        client.post({'inputs': 'hi'})
+    assert stub.hits == 3
+
+
+def test_client_errors_are_not_retried(backend):
+    stub, url = backend
+    stub.script = [(400, 0)]
+    client = make_client(url)
+
+    with pytest.raises(finance.InferenceUnavailable):
+        client.post({'inputs': 'hi'})
+    assert stub.hits == 1
+
+
+def test_connect_and_read_timeouts_are_separate(backend, monkeypatch):
+    stub, url = backend
+    client = make_client(url, INFERENCE_CONNECT_TIMEOUT=0.25, INFERENCE_READ_TIMEOUT=0.4, INFERENCE_MAX_RETRIES=0)
+    timeouts = []
+    post = client.session.post
+    monkeypatch.setattr(client.session, 'post', lambda *args, **kwargs: timeouts.append(kwargs['timeout']) or post(*args, **kwargs))
+
+    stub.script = [(200, 1.5)]
+    started = time.monotonic()
+    with pytest.raises(finance.InferenceUnavailable):
+        client.post({'inputs': 'slow'})
+    assert time.monotonic() - started < 1.2
+    assert timeouts == [(0.25, 0.4)]
+
+
+def test_connection_errors_are_retried_then_fail(backend):
+    client = make_client(f"http://127.0.0.1:{unused_port()}/", INFERENCE_MAX_RETRIES=1)
+
+    with pytest.raises(finance.InferenceUnavailable):
+        client.post({'inputs': 'hi'})
+    assert client.outcomes == {'success': 0, 'failure': 1, 'retry': 1, 'short_circuit': 0}
+
+
+def test_breaker_opens_after_threshold_and_short_circuits(backend):
+    stub, url = backend
+    stub.script = [(500, 0)] * 2
+    client = make_client(url, INFERENCE_MAX_RETRIES=0, INFERENCE_BREAKER_THRESHOLD=2)
+
+    for _ in range(2):
+        with pytest.raises(finance.InferenceUnavailable):
+            client.post({'inputs': 'hi'})
+    assert client.breaker.state == 'open'
+
+    with pytest.raises(finance.InferenceUnavailable, match='circuit breaker open'):
+        client.post({'inputs': 'hi'})
+    assert stub.hits == 2
+    assert client.outcomes['short_circuit'] == 1
+
+
+def test_half_open_trial_closes_on_success_and_reopens_on_failure(backend):
+    stub, url = backend
+    stub.script = [(500, 0), (500, 0)]
+    client = make_client(url, INFERENCE_MAX_RETRIES=0, INFERENCE_BREAKER_THRESHOLD=1, INFERENCE_BREAKER_RESET=0.1)
+
+    with pytest.raises(finance.InferenceUnavailable):
+        client.post({'inputs': 'hi'})
+    assert client.breaker.state == 'open'
+
+    # A failed trial reopens the breaker straight away
+    time.sleep(0.15)
+    with pytest.raises(finance.InferenceUnavailable, match='HTTP 500'):
+        client.post({'inputs': 'hi'})
+    assert client.breaker.state == 'open'
+
+    time.sleep(0.15)
+    assert client.post({'inputs': 'hi'}) == [{'generated_text': 'Stub advice'}]
+    assert client.breaker.state == 'closed'
+    assert stub.hits == 3
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = finance.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+
+def test_chat_falls_back_while_breaker_is_open(app_context, user_id, backend, monkeypatch):
+    stub, url = backend
+    client = make_client(url, INFERENCE_BREAKER_THRESHOLD=1, INFERENCE_BREAKER_RESET=60)
+    client.breaker.record_failure()
+    monkeypatch.setattr(finance, 'inference_client', client)
+
+    message = 'How should I budget for groceries?'
+    advice = finance.get_ai_advice(user_id, message, 'budgeting', '')
+
+    assert advice == finance.generate_fallback_response(message)
+    assert stub.hits == 0
+    assert client.outcomes['short_circuit'] == 1
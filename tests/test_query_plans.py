@@ -0,0 +1,12 @@
+from conftest import finance
+
+
+def test_hot_queries_use_an_index():
+    engine = finance.db.create_engine('sqlite://')
+    finance.db.metadata.create_all(engine)
+    with finance.app.app_context():
+        results = finance.explain_query_plans(engine)
+
+    assert results
+    regressions = {name: plan for name, plan, scans in results if scans}
+    assert not regressions, f"hot queries fall back to a full table scan: {regressions}"
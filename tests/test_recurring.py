@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from conftest import finance
+
+db = finance.db
+Transaction = finance.Transaction
+RecurringTransaction = finance.RecurringTransaction
+
+
+def add_rule(user_id, frequency, start):
+    rule = RecurringTransaction(user_id=user_id, name='Rent', type='expense', amount=Decimal('950'),
+                                category='Housing', frequency=frequency, start_date=start, next_due_date=start)
+    db.session.add(rule)
+    db.session.commit()
+    return rule.id
+
+
+def posted_dates(rule_id):
+    return [row.date for row in Transaction.query.filter_by(recurring_id=rule_id).order_by(Transaction.date)]
+
+
+def test_overdue_rule_catches_up_once(app_context, user_id):
+    rule_id = add_rule(user_id, 'monthly', date(2026, 1, 31))
+    through = date(2026, 4, 20)
+
+    first = finance.materialize_recurring_transactions(through=through)
+    second = finance.materialize_recurring_transactions(through=through)
+
+    assert (first['posted'], second['posted'], second['rules']) == (3, 0, 0)
+    assert posted_dates(rule_id) == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)]
+    db.session.expire_all()
+    assert db.session.get(RecurringTransaction, rule_id).next_due_date == date(2026, 4, 30)
+    rollup = db.session.query(db.func.sum(finance.TransactionRollup.count))\
+        .filter_by(user_id=user_id, category='Housing').scalar()
+    assert rollup == 3
+
+
+def test_rewound_rule_does_not_post_twice(app_context, user_id):
+    rule_id = add_rule(user_id, 'weekly', date(2026, 3, 2))
+    through = date(2026, 3, 25)
+    finance.materialize_recurring_transactions(through=through)
+
+    # An edit that moves the schedule back over posted dates, or a run that lost its advance
+    db.session.get(RecurringTransaction, rule_id).next_due_date = date(2026, 3, 2)
+    db.session.commit()
+    rerun = finance.materialize_recurring_transactions(through=through)
+
+    assert (rerun['posted'], rerun['duplicates']) == (0, 4)
+    assert posted_dates(rule_id) == [date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 16), date(2026, 3, 23)]
+    db.session.expire_all()
+    assert db.session.get(RecurringTransaction, rule_id).next_due_date == date(2026, 3, 30)
+
+    db.session.add(Transaction(user_id=user_id, type='expense', amount=Decimal('950'), category='Housing',
+                               date=date(2026, 3, 9), recurring_id=rule_id, is_recurring=True))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_long_downtime_is_caught_up_in_slices_within_one_pass(app_context, user_id, monkeypatch):
+    monkeypatch.setitem(finance.app.config, 'RECURRING_MAX_CATCHUP', 4)
+    start = date(2026, 6, 1)
+    rule_id = add_rule(user_id, 'daily', start)
+    through = start + timedelta(days=9)
+
+    first = finance.materialize_recurring_transactions(through=through, batch_size=1)
+    second = finance.materialize_recurring_transactions(through=through, batch_size=1)
+
+    assert (first['rules'], first['posted'], second['posted']) == (3, 10, 0)
+    assert posted_dates(rule_id) == [start + timedelta(days=n) for n in range(10)]
+    db.session.expire_all()
+    assert db.session.get(RecurringTransaction, rule_id).next_due_date == through + timedelta(days=1)
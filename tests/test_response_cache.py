@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from conftest import finance
+
+
+def add_expense(client, amount=10):
+    response = client.post('/api/transactions', json={
+        'type': 'expense', 'amount': amount, 'category': 'groceries',
+        'date': datetime.now().date().isoformat()
+    })
+    assert response.status_code == 201
+
+
+def data_version(user_id):
+    with finance.app.app_context():
+        return finance.get_data_version(user_id)
+
+
+def test_transaction_write_bumps_data_version(client, user_id):
+    before = data_version(user_id)
+    add_expense(client)
+    assert data_version(user_id) == before + 1
+
+
+def test_cached_dashboard_refreshes_after_write(client):
+    first = client.get('/api/dashboard').get_json()
+    assert client.get('/api/dashboard').get_json() == first
+
+    add_expense(client, 25)
+    second = client.get('/api/dashboard').get_json()
+    assert second['monthlyExpenses'] == first['monthlyExpenses'] + 25
+
+
+def test_etag_revalidation(client):
+    response = client.get('/api/dashboard')
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+    add_expense(client)
+    changed = client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def add_chat_turn(user_id):
+    with finance.app.app_context():
+        finance.db.session.add(finance.ChatHistory(user_id=user_id, message='How do I save more?',
+                                                   response='Start with a budget.', category='savings'))
+        finance.db.session.commit()
+
+
+def test_chat_write_leaves_financial_caches_valid(client, user_id):
+    response = client.get('/api/dashboard')
+    etag = response.headers['ETag']
+    financial_before = data_version(user_id)
+
+    add_chat_turn(user_id)
+
+    assert data_version(user_id) == financial_before
+    with finance.app.app_context():
+        assert finance.get_data_version(user_id, 'chat') == 1
+    assert client.get('/api/dashboard', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_chat_insights_refresh_after_chat_write(client, user_id):
+    assert client.get('/api/chat/insights').get_json()['insights']['total_chats'] == 0
+
+    add_chat_turn(user_id)
+    assert client.get('/api/chat/insights').get_json()['insights']['total_chats'] == 1
@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from conftest import finance
+
+db = finance.db
+Transaction = finance.Transaction
+
+
+def raw_sums(user_id):
+    rows = db.session.query(
+        Transaction.date, Transaction.type, Transaction.category,
+        db.func.sum(Transaction.amount), db.func.count(Transaction.id)
+    ).filter(Transaction.user_id == user_id)\
+        .group_by(Transaction.date, Transaction.type, Transaction.category).all()
+    return {(row[0], row[1], row[2]): (Decimal(str(row[3])), row[4]) for row in rows}
+
+
+def rollup_sums(user_id):
+    rows = finance.TransactionRollup.query.filter_by(user_id=user_id).all()
+    return {(row.date, row.type, row.category): (Decimal(str(row.total)), row.count)
+            for row in rows if row.count}
+
+
+def test_rollups_match_raw_sums_after_insert_update_and_delete(app_context, user_id):
+    day = date(2024, 3, 10)
+    rows = [
+        Transaction(user_id=user_id, type='expense', amount=Decimal('12.50'), category='groceries', date=day),
+        Transaction(user_id=user_id, type='expense', amount=Decimal('7.25'), category='groceries', date=day),
+        Transaction(user_id=user_id, type='income', amount=Decimal('1000'), category='salary', date=day),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    assert rollup_sums(user_id) == raw_sums(user_id)
+
+    rows[0].amount = Decimal('20')
+    rows[1].category = 'dining'
+    rows[1].date = day + timedelta(days=1)
+    rows[2].type = 'expense'
+    db.session.commit()
+    assert rollup_sums(user_id) == raw_sums(user_id)
+
+    db.session.delete(rows[0])
+    db.session.commit()
+    assert rollup_sums(user_id) == raw_sums(user_id)
+
+    totals = dict(db.session.query(finance.TransactionTotal.type, finance.TransactionTotal.total)
+                  .filter_by(user_id=user_id).all())
+    assert Decimal(str(totals['expense'])) == Decimal('1007.25')
+    assert finance.user_balance(user_id) == -Decimal('1007.25')
+
+
+def test_rebuild_rollups_matches_incremental_maintenance(app_context, user_id):
+    for offset in range(10):
+        db.session.add(Transaction(user_id=user_id, type='expense', amount=Decimal(offset + 1),
+                                   category=f"cat{offset % 3}", date=date(2024, 1, 1) + timedelta(days=offset % 4)))
+    db.session.commit()
+    incremental = rollup_sums(user_id)
+
+    finance.rebuild_transaction_rollups(user_id)
+    assert rollup_sums(user_id) == incremental == raw_sums(user_id)
+
+
+def test_series_totals_match_raw_sums(app_context, user_id):
+    amounts = {date(2024, 1, 31): 10, date(2024, 2, 1): 20, date(2024, 2, 29): 5, date(2024, 4, 2): 7}
+    for day, amount in amounts.items():
+        db.session.add(Transaction(user_id=user_id, type='expense', amount=amount, category='misc', date=day))
+    db.session.commit()
+
+    result = finance.aggregate_series(user_id, date(2024, 1, 1), date(2024, 4, 30), granularity='month')
+    assert result['buckets'] == [date(2024, month, 1) for month in range(1, 5)]
+    assert result['series']['expense'] == [10.0, 25.0, 0.0, 7.0]
+
+
+def test_series_rejects_too_many_buckets(client):
+    response = client.get('/api/reports/series?granularity=day&start_date=0001-01-01')
+    assert response.status_code == 400
+
+    response = client.get('/api/reports/series?granularity=month&start_date=2024-01-01&end_date=2024-12-31')
+    assert response.status_code == 200
+    assert len(response.get_json()['buckets']) == 12
+
+
+def test_budget_spent_matches_current_period_expenses(app_context, user_id):
+    today = datetime.now().date()
+    budget = finance.Budget(user_id=user_id, category='groceries', limit_amount=500, period='monthly')
+    db.session.add(budget)
+    db.session.add_all([
+        Transaction(user_id=user_id, type='expense', amount=40, category='groceries', date=today),
+        Transaction(user_id=user_id, type='expense', amount=60, category='groceries', date=today),
+        Transaction(user_id=user_id, type='expense', amount=99, category='groceries',
+                    date=today.replace(day=1) - timedelta(days=1)),
+        Transaction(user_id=user_id, type='expense', amount=5, category='dining', date=today),
+    ])
+    db.session.commit()
+
+    assert finance.compute_budget_spent([budget]) == {budget.id: 100.0}
+
+
+def test_cursor_pages_neither_overlap_nor_skip(client, user_id):
+    created_at = datetime(2024, 5, 1, 12, 0, 0)
+    with finance.app.app_context():
+        for index in range(45):
+            # Many rows share a date and created_at so the id tiebreaker matters
+            db.session.add(Transaction(user_id=user_id, type='expense', amount=index + 1, category='misc',
+                                       date=date(2024, 5, 1 + index % 3), created_at=created_at))
+        db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/transactions?limit=10' + (f"&cursor={cursor}" if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(row['id'] for row in response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    with finance.app.app_context():
+        expected = [row.id for row in Transaction.query.filter_by(user_id=user_id)
+                    .order_by(Transaction.date.desc(), Transaction.created_at.desc(), Transaction.id.desc())]
+    assert seen == expected
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/transactions?cursor=not-a-cursor').status_code == 400